@@ -1,6 +1,22 @@
+from django.db import connection
+
 from geotrek.altimetry.models import AltimetryMixin as BaseAltimetryMixin
 from geotrek.common.mixins import TimeStampedModelMixin
 
+from georiviere.utils.postgresql import session_setting
+
+
+def deferred_altimetry():
+    """Elevation triggers do not drape inserted or updated geometries within this block,
+    geom_3d is set to NULL instead. Call drape() or refresh_altimetry command afterwards."""
+    return session_setting('georiviere.defer_altimetry', 'on')
+
+
+def drape(model, pks):
+    """Compute altimetry of many objects in one statement"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT drape_objects(%s::regclass, %s)", [model._meta.db_table, list(pks)])
+
 
 class AltimetryMixin(BaseAltimetryMixin):
     def refresh(self):
@@ -5,3 +5,6 @@ from django.utils.translation import gettext_lazy as _
 class ContributionConfig(AppConfig):
     name = 'georiviere.contribution'
     verbose_name = _("Contribution")
+
+    def ready(self):
+        import georiviere.contribution.signals  # NOQA
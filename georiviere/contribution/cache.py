@@ -0,0 +1,34 @@
+import time
+
+from django.core.cache import caches
+
+JSON_SCHEMA_VERSION_KEY = "contribution-json-schema-version"
+
+
+def get_json_schema_version():
+    """Returns timestamp of the last change of referential lists used by the contribution json schema"""
+    cache = caches['default']
+    version = cache.get(JSON_SCHEMA_VERSION_KEY)
+    if version is None:
+        version = time.time()
+        # Keep another process version if set in between
+        if not cache.add(JSON_SCHEMA_VERSION_KEY, version, timeout=None):
+            version = cache.get(JSON_SCHEMA_VERSION_KEY, version)
+    return version
+
+
+def invalidate_json_schema():
+    """Change version of the contribution json schema, cached schemas are not used anymore"""
+    caches['default'].set(JSON_SCHEMA_VERSION_KEY, time.time(), timeout=None)
+
+
+def get_json_schema_cache_key(lang):
+    return f"contribution-json-schema-{lang}-{get_json_schema_version()}"
+
+
+def get_custom_type_json_schema_cache_key(pk):
+    return f"contribution-custom-type-json-schema-{pk}"
+
+
+def invalidate_custom_type_json_schema(pk):
+    caches['default'].delete(get_custom_type_json_schema_cache_key(pk))
@@ -0,0 +1,48 @@
+# Generated by Django 3.1.14 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contribution', '0020_customcontributiontype_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomContributionValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value_text', models.CharField(max_length=1000, null=True)),
+                ('value_number', models.FloatField(null=True)),
+                ('value_boolean', models.BooleanField(null=True)),
+                ('value_date', models.DateField(null=True)),
+                ('value_datetime', models.DateTimeField(null=True)),
+                ('contribution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='contribution.customcontribution')),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='contribution.customcontributiontypefield')),
+            ],
+            options={
+                'verbose_name': 'Custom contribution value',
+                'verbose_name_plural': 'Custom contribution values',
+                'unique_together': {('contribution', 'field')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='customcontributionvalue',
+            index=models.Index(fields=['field', 'value_text'], name='contribution_value_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customcontributionvalue',
+            index=models.Index(fields=['field', 'value_number'], name='contribution_value_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customcontributionvalue',
+            index=models.Index(fields=['field', 'value_date'], name='contribution_value_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customcontributionvalue',
+            index=models.Index(fields=['field', 'value_datetime'], name='contribution_value_dt_idx'),
+        ),
+    ]
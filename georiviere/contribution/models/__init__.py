@@ -5,6 +5,7 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
+from django.core.cache import caches
 from django.core.mail import mail_managers
 from django.template.loader import render_to_string
 from django.utils.text import slugify
@@ -23,7 +24,8 @@ from georiviere.proceeding.models import Proceeding
 from georiviere.river.models import Stream
 from georiviere.studies.models import Study
 from georiviere.watershed.mixins import WatershedPropertiesMixin
-from .managers import SelectableUserManager, CustomContributionManager
+from ..cache import get_custom_type_json_schema_cache_key
+from .managers import SelectableUserManager, CustomContributionManager, CustomContributionValueManager
 
 logger = logging.getLogger(__name__)
 
@@ -634,10 +636,10 @@ class CustomContributionType(models.Model):
     def __str__(self):
         return self.label
 
-    def get_json_schema_form(self):
+    def build_json_schema_form(self):
         linked_fields = self.fields.all()
         fields = {}
-        for field in self.fields.all():
+        for field in linked_fields:
             fields[field.key] = field.get_field_schema()
         return {
             # "title": self.label,
@@ -646,6 +648,18 @@ class CustomContributionType(models.Model):
             "required": [field.key for field in linked_fields if field.required],
         }
 
+    def get_json_schema_form(self):
+        """Json schema of the form, cached until the type or its fields change (see signals)"""
+        if not settings.API_CACHE_ENABLED or self.pk is None:
+            return self.build_json_schema_form()
+        cache = caches['default']
+        key = get_custom_type_json_schema_cache_key(self.pk)
+        schema = cache.get(key)
+        if schema is None:
+            schema = self.build_json_schema_form()
+            cache.set(key, schema, timeout=None)
+        return schema
+
     @property
     def json_schema_form(self):
         return self.get_json_schema_form()
@@ -920,3 +934,28 @@ class CustomContribution(TimeStampedModelMixin, models.Model):
 
     def __str__(self):
         return f"{self.custom_type.label} - {self.pk}"
+
+
+class CustomContributionValue(models.Model):
+    """Typed value of a field in data of a custom contribution, indexed to filter contributions by value.
+    Maintained by database when contributions are saved (see sql/post_10_triggers.sql)."""
+    contribution = models.ForeignKey(CustomContribution, on_delete=models.CASCADE, related_name="values")
+    field = models.ForeignKey(CustomContributionTypeField, on_delete=models.CASCADE, related_name="values")
+    value_text = models.CharField(max_length=1000, null=True)
+    value_number = models.FloatField(null=True)
+    value_boolean = models.BooleanField(null=True)
+    value_date = models.DateField(null=True)
+    value_datetime = models.DateTimeField(null=True)
+
+    objects = CustomContributionValueManager()
+
+    class Meta:
+        verbose_name = _("Custom contribution value")
+        verbose_name_plural = _("Custom contribution values")
+        unique_together = ("contribution", "field")
+        indexes = [
+            models.Index(fields=["field", "value_text"], name="contribution_value_text_idx"),
+            models.Index(fields=["field", "value_number"], name="contribution_value_number_idx"),
+            models.Index(fields=["field", "value_date"], name="contribution_value_date_idx"),
+            models.Index(fields=["field", "value_datetime"], name="contribution_value_dt_idx"),
+        ]
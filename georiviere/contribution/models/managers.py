@@ -1,17 +1,31 @@
 from django.contrib.gis.db import models
+from django.db import connection
 from django.db.models.fields.json import KeyTextTransform
 from django.db.models.functions import Cast
 
+# Column of CustomContributionValue storing values of each type of field, text fields are not typed
+VALUE_COLUMNS = {
+    'string': 'value_text',
+    'integer': 'value_number',
+    'float': 'value_number',
+    'boolean': 'value_boolean',
+    'date': 'value_date',
+    'datetime': 'value_datetime',
+}
+
+# Lookups available to filter custom contributions by value
+VALUE_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte')
+
 
 class SelectableUserManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(userprofile__isnull=False)
 
 
-class CustomContributionManager(models.Manager):
+class CustomContributionQuerySet(models.QuerySet):
     def with_type_values(self, custom_type):
         annotations = {}
-        qs = self.get_queryset()
+        qs = self
         for field in custom_type.fields.all():
             output_field = models.CharField()
             if field.value_type == 'integer':
@@ -28,3 +42,31 @@ class CustomContributionManager(models.Manager):
         if annotations:
             qs = qs.annotate(**annotations)
         return qs
+
+    def filter_value(self, field, lookup, value):
+        """
+        Filter contributions by value of a field of their type, on indexed typed values
+        (e.g. `filter_value(temperature_field, 'gte', 12)`).
+        """
+        values_model = self.model._meta.get_field('values').related_model
+        column = VALUE_COLUMNS[field.value_type]
+        return self.filter(pk__in=values_model.objects.filter(
+            field=field, **{f'{column}__{lookup}': value}
+        ).values('contribution'))
+
+
+class CustomContributionManager(models.Manager.from_queryset(CustomContributionQuerySet)):
+    pass
+
+
+class CustomContributionValueManager(models.Manager):
+    def refresh_for_field(self, field):
+        """Type values of a field again in data of contributions, e.g. when the type of the field changes"""
+        contribution_model = self.model._meta.get_field('contribution').related_model
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT refresh_custom_contribution_values(ARRAY(
+                    SELECT id FROM {connection.ops.quote_name(contribution_model._meta.db_table)}
+                    WHERE custom_type_id = %s AND data ? %s
+                ))
+            """, [field.custom_type_id, field.key])
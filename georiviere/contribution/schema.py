@@ -1,6 +1,13 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import translation
 from django.utils.translation import gettext as _
+from jsonschema.validators import validator_for
 
 from . import models
+from .cache import get_json_schema_cache_key, get_json_schema_version
 
 
 # The json schema is summarized on :
@@ -473,10 +480,41 @@ def get_contribution_allOf():
     return all_of_conditions
 
 
-def get_contribution_json_schema():
+def build_contribution_json_schema():
     return {
         "type": "object",
         "required": ["email_author", "date_observation", "category"],
         "properties": get_contribution_properties(),
         "allOf": get_contribution_allOf(),
     }
+
+
+def get_contribution_json_schema():
+    """
+    Json schema of contributions in current language. It is built once, then cached until
+    a referential list used by the schema changes (see signals).
+    """
+    if not settings.API_CACHE_ENABLED:
+        return build_contribution_json_schema()
+    cache = caches['default']
+    key = get_json_schema_cache_key(translation.get_language())
+    schema = cache.get(key)
+    if schema is None:
+        schema = build_contribution_json_schema()
+        cache.set(key, schema, timeout=None)
+    return schema
+
+
+@lru_cache(maxsize=32)
+def _compile_contribution_json_schema(lang, version):
+    # Arguments are the key of compiled validators, the schema is the one of current language and version
+    schema = get_contribution_json_schema()
+    return validator_for(schema)(schema)
+
+
+def get_contribution_json_schema_validator():
+    """Validator of contributions data, compiled once by process for each language and version of the schema"""
+    if not settings.API_CACHE_ENABLED:
+        schema = build_contribution_json_schema()
+        return validator_for(schema)(schema)
+    return _compile_contribution_json_schema(translation.get_language(), get_json_schema_version())
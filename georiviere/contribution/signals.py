@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from georiviere.contribution.cache import invalidate_custom_type_json_schema, invalidate_json_schema
+from georiviere.contribution.models import (CustomContributionType, CustomContributionTypeField,
+                                            CustomContributionValue, DeadSpecies, DiseaseType, FishSpecies,
+                                            HeritageObservation, HeritageSpecies, InvasiveSpecies, JamType,
+                                            LandingType, NaturePollution, SeverityType, TypePollution)
+
+# Referential lists whose values are listed in the contribution json schema
+JSON_SCHEMA_MODELS = (SeverityType, LandingType, JamType, DiseaseType, DeadSpecies, InvasiveSpecies,
+                      HeritageSpecies, HeritageObservation, FishSpecies, NaturePollution, TypePollution)
+
+
+@receiver(post_save, dispatch_uid="invalidate_contribution_json_schema_save")
+@receiver(post_delete, dispatch_uid="invalidate_contribution_json_schema_delete")
+def invalidate_contribution_json_schema(sender, instance, **kwargs):
+    if sender in JSON_SCHEMA_MODELS:
+        invalidate_json_schema()
+    elif sender is CustomContributionType:
+        invalidate_custom_type_json_schema(instance.pk)
+    elif sender is CustomContributionTypeField:
+        invalidate_custom_type_json_schema(instance.custom_type_id)
+
+
+@receiver(post_save, sender=CustomContributionTypeField, dispatch_uid="refresh_custom_contribution_values")
+def refresh_custom_contribution_values(sender, instance, **kwargs):
+    # Values of contributions are typed by database when they are saved, not when their fields change
+    CustomContributionValue.objects.refresh_for_field(instance)
@@ -0,0 +1,70 @@
+CREATE FUNCTION custom_contribution_value(value jsonb, value_type text,
+                                          OUT value_text text, OUT value_number double precision,
+                                          OUT value_boolean boolean, OUT value_date date,
+                                          OUT value_datetime timestamp with time zone) AS $$
+BEGIN
+    -- Typed value of a field of custom contributions, invalid values are kept untyped
+    IF value_type = 'string' AND length(value #>> '{}') <= 1000 THEN
+        value_text := value #>> '{}';
+    ELSIF value_type IN ('integer', 'float') THEN
+        value_number := (value #>> '{}')::double precision;
+    ELSIF value_type = 'boolean' THEN
+        value_boolean := (value #>> '{}')::boolean;
+    ELSIF value_type = 'date' THEN
+        value_date := (value #>> '{}')::date;
+    ELSIF value_type = 'datetime' THEN
+        value_datetime := (value #>> '{}')::timestamp with time zone;
+    END IF;
+EXCEPTION WHEN data_exception THEN
+    RETURN;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE FUNCTION refresh_custom_contribution_values(ids integer[]) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    -- One row by contribution and field of its type valued in data
+    DELETE FROM contribution_customcontributionvalue WHERE contribution_id = ANY(ids);
+    INSERT INTO contribution_customcontributionvalue
+        (contribution_id, field_id, value_text, value_number, value_boolean, value_date, value_datetime)
+    SELECT c.id, f.id, v.value_text, v.value_number, v.value_boolean, v.value_date, v.value_datetime
+    FROM contribution_customcontribution c
+    JOIN contribution_customcontributiontypefield f ON f.custom_type_id = c.custom_type_id
+    CROSS JOIN LATERAL custom_contribution_value(c.data -> f.key, f.value_type) v
+    WHERE c.id = ANY(ids) AND jsonb_typeof(c.data -> f.key) IN ('string', 'number', 'boolean');
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION custom_contribution_values() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    ids integer[];
+BEGIN
+    -- Statement level trigger, new_rows (and old_rows on update) are transition tables
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(n.id) FROM new_rows n INTO ids;
+    ELSE
+        SELECT array_agg(n.id) FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.data IS DISTINCT FROM o.data OR n.custom_type_id IS DISTINCT FROM o.custom_type_id INTO ids;
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM refresh_custom_contribution_values(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER contribution_customcontribution_10_values
+AFTER INSERT ON contribution_customcontribution
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE custom_contribution_values();
+
+CREATE TRIGGER contribution_customcontribution_10_values_update
+AFTER UPDATE ON contribution_customcontribution
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE custom_contribution_values();
+
+-- Type values of contributions saved before values were stored
+SELECT refresh_custom_contribution_values(ARRAY(
+    SELECT c.id FROM contribution_customcontribution c
+    WHERE c.data <> '{}'::jsonb
+      AND NOT EXISTS (SELECT 1 FROM contribution_customcontributionvalue v WHERE v.contribution_id = c.id)
+));
@@ -0,0 +1,3 @@
+DROP FUNCTION IF EXISTS custom_contribution_values() CASCADE;
+DROP FUNCTION IF EXISTS refresh_custom_contribution_values(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS custom_contribution_value(jsonb, text) CASCADE;
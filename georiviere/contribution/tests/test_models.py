@@ -1,5 +1,7 @@
 from django.core import mail
+from django.core.cache import caches
 from django.test import override_settings, TestCase
+from django.utils import translation
 
 from .factories import (
     ContributionFactory,
@@ -22,8 +24,11 @@ from .factories import (
     ContributionStatusFactory,
     CustomContributionTypeFactory,
     CustomContributionTypeFieldFactory,
+    CustomContributionFactory,
 )
-from ..models import CustomContributionTypeField
+from ..cache import get_json_schema_cache_key
+from ..models import CustomContribution, CustomContributionTypeField, CustomContributionValue
+from ..schema import get_contribution_json_schema, get_contribution_json_schema_validator
 
 
 @override_settings(
@@ -414,3 +419,89 @@ class CustomContributionTypeFieldTestCase(TestCase):
             'choices',
             field.get_field_schema(),
         )
+
+
+@override_settings(API_CACHE_ENABLED=True)
+class JsonSchemaCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.severity = SeverityTypeTypeFactory.create(label="Low")
+        cls.custom_type = CustomContributionTypeFactory.create()
+        cls.field = CustomContributionTypeFieldFactory.create(custom_type=cls.custom_type, label="Depth")
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_contribution_json_schema_cached(self):
+        schema = get_contribution_json_schema()
+        validator = get_contribution_json_schema_validator()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_contribution_json_schema(), schema)
+            self.assertIs(get_contribution_json_schema_validator(), validator)
+        self.assertEqual(schema["properties"]["severity"]["enum"], ["Low"])
+
+    def test_contribution_json_schema_by_language(self):
+        with translation.override('fr'):
+            get_contribution_json_schema()
+        self.assertIsNotNone(caches['default'].get(get_json_schema_cache_key('fr')))
+        self.assertIsNone(caches['default'].get(get_json_schema_cache_key('en')))
+        with translation.override('en'):
+            get_contribution_json_schema()
+        self.assertIsNotNone(caches['default'].get(get_json_schema_cache_key('en')))
+
+    def test_contribution_json_schema_invalidated(self):
+        get_contribution_json_schema()
+        validator = get_contribution_json_schema_validator()
+        SeverityTypeTypeFactory.create(label="High")
+        self.assertIn("High", get_contribution_json_schema()["properties"]["severity"]["enum"])
+        self.assertIsNot(get_contribution_json_schema_validator(), validator)
+
+    def test_custom_type_json_schema_cached(self):
+        schema = self.custom_type.get_json_schema_form()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.custom_type.get_json_schema_form(), schema)
+        self.assertListEqual(list(schema["properties"]), ["depth"])
+
+    def test_custom_type_json_schema_invalidated(self):
+        self.custom_type.get_json_schema_form()
+        CustomContributionTypeFieldFactory.create(custom_type=self.custom_type, label="Width", required=True)
+        self.assertListEqual(self.custom_type.get_json_schema_form()["required"], ["width"])
+        self.field.delete()
+        self.assertListEqual(list(self.custom_type.get_json_schema_form()["properties"]), ["width"])
+
+
+class CustomContributionValueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.custom_type = CustomContributionTypeFactory.create()
+        cls.temperature = CustomContributionTypeFieldFactory.create(custom_type=cls.custom_type, label="Temperature",
+                                                                    value_type="float")
+        cls.date = CustomContributionTypeFieldFactory.create(custom_type=cls.custom_type, label="Date",
+                                                             value_type="date")
+
+    def test_values_typed_on_save(self):
+        contribution = CustomContributionFactory.create(custom_type=self.custom_type,
+                                                        data={"temperature": 12.5, "date": "2024-05-02"})
+        value = CustomContributionValue.objects.get(contribution=contribution, field=self.temperature)
+        self.assertEqual(value.value_number, 12.5)
+        contribution.data = {"temperature": "cold"}
+        contribution.save()
+        # Invalid values are kept untyped, values removed from data are removed
+        value = CustomContributionValue.objects.get(contribution=contribution)
+        self.assertIsNone(value.value_number)
+        self.assertEqual(value.field, self.temperature)
+
+    def test_values_typed_on_field_change(self):
+        contribution = CustomContributionFactory.create(custom_type=self.custom_type, data={"depth": "3"})
+        self.assertFalse(CustomContributionValue.objects.filter(contribution=contribution).exists())
+        depth = CustomContributionTypeFieldFactory.create(custom_type=self.custom_type, label="Depth",
+                                                          value_type="integer")
+        self.assertEqual(CustomContributionValue.objects.get(contribution=contribution, field=depth).value_number, 3)
+
+    def test_filter_value(self):
+        warm = CustomContributionFactory.create(custom_type=self.custom_type, data={"temperature": 21})
+        CustomContributionFactory.create(custom_type=self.custom_type, data={"temperature": 8})
+        contributions = CustomContribution.objects.filter_value(self.temperature, 'gte', 20)
+        self.assertQuerysetEqual(contributions, [warm.pk], transform=lambda c: c.pk)
+        contributions = CustomContribution.objects.filter_value(self.date, 'exact', "2024-05-02")
+        self.assertFalse(contributions.exists())
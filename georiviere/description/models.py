@@ -13,6 +13,7 @@ from geotrek.zoning.mixins import ZoningPropertiesMixin
 
 from georiviere.main.models import AddPropertyBufferMixin
 from georiviere.watershed.mixins import WatershedPropertiesMixin
+from georiviere.river.managers import TopologyObjectQuerySet
 from georiviere.river.models import Stream, Topology, TopologyMixin
 from georiviere.observations.models import Station
 from georiviere.proceeding.models import Proceeding
@@ -196,6 +197,8 @@ class Morphology(AddPropertyBufferMixin, TopologyMixin, TimeStampedModelMixin,
     description = models.TextField(verbose_name=_("Description"), blank=True)
     geom = models.LineStringField(srid=settings.SRID, spatial_index=True)
 
+    objects = TopologyObjectQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Morphology")
         verbose_name_plural = _("Morphologies")
@@ -351,6 +354,8 @@ class Status(TopologyMixin, AddPropertyBufferMixin, TimeStampedModelMixin, Water
                                       verbose_name=_("Referencial"))
     description = models.TextField(verbose_name=_("Description"), blank=True)
 
+    objects = TopologyObjectQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Status")
         verbose_name_plural = _("Statuses")
@@ -1,15 +1,39 @@
 CREATE TRIGGER description_morphology_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON description_morphology
-FOR EACH ROW EXECUTE PROCEDURE elevation();
+AFTER INSERT ON description_morphology
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE TRIGGER description_morphology_10_elevation_update
+AFTER UPDATE ON description_morphology
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
 
 CREATE TRIGGER description_status_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON description_status
-FOR EACH ROW EXECUTE PROCEDURE elevation();
+AFTER INSERT ON description_status
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE TRIGGER description_status_10_elevation_update
+AFTER UPDATE ON description_status
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
 
 CREATE TRIGGER description_land_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON description_land
-FOR EACH ROW EXECUTE PROCEDURE elevation();
+AFTER INSERT ON description_land
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE TRIGGER description_land_10_elevation_update
+AFTER UPDATE ON description_land
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
 
 CREATE TRIGGER description_usage_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON description_usage
-FOR EACH ROW EXECUTE PROCEDURE elevation();
\ No newline at end of file
+AFTER INSERT ON description_usage
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE TRIGGER description_usage_10_elevation_update
+AFTER UPDATE ON description_usage
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
\ No newline at end of file
@@ -1,7 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import gettext_lazy as _
 
 
 class FinancesAdministrationConfig(AppConfig):
     name = 'georiviere.finances_administration'
     verbose_name = _("Finances and administration")
+
+    def ready(self):
+        from . import signals
+        from .managers import get_administrative_operation_models, get_geom_fallbacks
+        from .models import AdministrativeOperation
+        post_save.connect(signals.save_operation_refresh_geom, sender=AdministrativeOperation)
+        post_delete.connect(signals.save_operation_refresh_geom, sender=AdministrativeOperation)
+        # Geometries of administrative files follow their linked objects
+        for model in get_administrative_operation_models():
+            post_save.connect(signals.save_objects_refresh_administrative_files_geom, sender=model)
+            post_delete.connect(signals.save_objects_refresh_administrative_files_geom, sender=model)
+            # and objects giving their geometry to linked objects without one
+            for source, condition, params in get_geom_fallbacks(model):
+                post_save.connect(signals.save_geom_sources_refresh_administrative_files_geom, sender=source)
+                post_delete.connect(signals.save_geom_sources_refresh_administrative_files_geom, sender=source)
@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+
+from georiviere.finances_administration.models import AdministrativeFile
+
+
+class Command(BaseCommand):
+    help = "Refresh costs of administrative files by year, domain and funder, served to the finance dashboard"
+
+    def handle(self, *args, **options):
+        AdministrativeFile.objects.refresh_cost_rollup()
+        if options.get('verbosity') >= 1:
+            self.stdout.write(self.style.SUCCESS("Cost rollup refreshed"))
@@ -0,0 +1,220 @@
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection, models
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+
+from georiviere.main.managers import get_proximity_geom_field, refresh_spatial_relations
+from georiviere.main.models import DistanceToSource, DistanceToSourceJob
+
+
+def get_administrative_operation_models():
+    """Returns models with a stored geometry which can be linked to administrative files by operations"""
+    operation_model = apps.get_model('finances_administration', 'AdministrativeOperation')
+    return [
+        model for model in apps.get_models()
+        if get_proximity_geom_field(model) and any(
+            isinstance(field, GenericRelation) and field.related_model == operation_model
+            for field in model._meta.private_fields
+        )
+    ]
+
+
+# Objects without a stored geometry take the geometry of another object (see `geom` property of
+# interventions and follow-ups): name of the field to this object, by model
+GEOM_FALLBACK_FIELDS = {
+    'maintenance.intervention': 'target',
+    'knowledge.followup': 'knowledge',
+}
+
+
+def get_geom_fallbacks(model):
+    """
+    Returns (model giving its geometry, join condition, params) for objects of `model` without stored geometry.
+    Join conditions are written on `o` (object) and `{t}` (alias of the object giving its geometry).
+    """
+    name = GEOM_FALLBACK_FIELDS.get(model._meta.label_lower)
+    if name is None:
+        return []
+    qn = connection.ops.quote_name
+    field = model._meta.get_field(name)
+    if isinstance(field, GenericForeignKey):
+        ct_column = qn(model._meta.get_field(field.ct_field).column)
+        fk_column = qn(model._meta.get_field(field.fk_field).column)
+        # Models which can be targeted have a generic relation to this field
+        return [
+            (target, f'{{t}}.{qn(target._meta.pk.column)} = o.{fk_column} AND o.{ct_column} = ('
+                     f'SELECT id FROM {qn(ContentType._meta.db_table)} WHERE app_label = %s AND model = %s)',
+             [target._meta.app_label, target._meta.model_name])
+            for target in apps.get_models() if get_proximity_geom_field(target) and any(
+                isinstance(relation, GenericRelation) and relation.related_model == model
+                and relation.object_id_field_name == field.fk_field
+                for relation in target._meta.private_fields
+            )
+        ]
+    return [(field.related_model, f'{{t}}.{qn(field.related_model._meta.pk.column)} = o.{qn(field.column)}', [])]
+
+
+# Materialized view of costs by year and domain, and fundings by year and organism (see sql/post_10_views.sql)
+COST_ROLLUP_VIEW = 'finances_administration_costrollup'
+
+# Costs summed by `with_cost_totals`, as in AdministrativeFile.total_costs
+COST_TOTALS = {
+    'estimated': F('estimated_cost'),
+    'material': F('material_cost'),
+    'subcontract': F('subcontract_cost'),
+    'mandays': F('manday_cost'),
+    'actual': F('material_cost') + F('subcontract_cost') + F('manday_cost'),
+}
+
+
+class AdministrativeFileQuerySet(models.QuerySet):
+    def with_cost_totals(self):
+        """
+        Annotate total costs of operations (`total_estimated`, `total_material`, `total_subcontract`,
+        `total_mandays`, `total_actual`) and names of funders (`funder_names`) of each file, in the same query.
+        Used by `total_costs` and `funders_display`, e.g. for lists and exports.
+        """
+        operation_model = self.model._meta.get_field('operations').related_model
+        funding_model = self.model._meta.get_field('funders').remote_field.through
+        operations = operation_model.objects.filter(administrative_file=OuterRef('pk')).order_by()\
+            .values('administrative_file')
+        fundings = funding_model.objects.filter(administrative_file=OuterRef('pk')).order_by()\
+            .values('administrative_file')
+        return self.annotate(**{
+            f'total_{name}': Subquery(
+                operations.annotate(total=Sum(expression, output_field=DecimalField())).values('total')
+            )
+            for name, expression in COST_TOTALS.items()
+        }, funder_names=Subquery(fundings.annotate(names=ArrayAgg(
+            # Same as str(organism)
+            Case(When(organism__structure__isnull=True, then=F('organism__name')),
+                 default=Concat('organism__name', Value(' ('), 'organism__structure__name', Value(')'))),
+            ordering=('organism__name', 'organism__pk'),
+        )).values('names')))
+
+
+class AdministrativeFileManager(models.Manager.from_queryset(AdministrativeFileQuerySet)):
+    """Geometries of administrative files are collected from their linked objects, in database"""
+
+    def _geoms_sql(self, pks):
+        """SQL and params of (administrative file id, geometry) of objects linked to files, one part by model"""
+        qn = connection.ops.quote_name
+        operation_table = qn(self.model._meta.get_field('operations').related_model._meta.db_table)
+        parts, params = [], []
+        for model in get_administrative_operation_models():
+            geoms, joins = [f'o.{qn(get_proximity_geom_field(model).column)}'], []
+            for i, (source, condition, condition_params) in enumerate(get_geom_fallbacks(model)):
+                alias = f't{i}'
+                geoms.append(f'{alias}.{qn(get_proximity_geom_field(source).column)}')
+                joins.append(f'LEFT JOIN {qn(source._meta.db_table)} {alias} ON {condition.format(t=alias)}')
+                params += condition_params
+            parts.append(f"""
+                SELECT op.administrative_file_id AS id, COALESCE({', '.join(geoms)}) AS geom
+                FROM {operation_table} op
+                JOIN {qn(model._meta.db_table)} o ON o.{qn(model._meta.pk.column)} = op.object_id
+                {' '.join(joins)}
+                WHERE op.content_type_id = %s AND op.administrative_file_id = ANY(%s)
+            """)
+            params += [ContentType.objects.get_for_model(model).pk, list(pks)]
+        return ' UNION ALL '.join(parts) or 'SELECT NULL::integer AS id, NULL::geometry AS geom', params
+
+    def collect_geom(self, pk):
+        """Returns the collection of geometries of objects linked to an administrative file"""
+        geoms_sql, params = self._geoms_sql([pk])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT ST_ForceCollection(ST_Collect(geom)) FROM ({geoms_sql}) g", params)
+            geom = cursor.fetchone()[0]
+        return GEOSGeometry(geom) if geom else None
+
+    def refresh_geoms(self, pks):
+        """Collect geometries of many administrative files in one statement, refresh what depends on them"""
+        pks = list(pks)
+        if not pks:
+            return []
+        qn = connection.ops.quote_name
+        geoms_sql, params = self._geoms_sql(pks)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {qn(self.model._meta.db_table)} f SET geom = c.geom
+                FROM (
+                    SELECT a.id, ST_ForceCollection(ST_Collect(g.geom)) AS geom
+                    FROM {qn(self.model._meta.db_table)} a
+                    LEFT JOIN ({geoms_sql}) g ON g.id = a.id
+                    WHERE a.id = ANY(%s)
+                    GROUP BY a.id
+                ) c
+                WHERE f.id = c.id AND f.geom IS DISTINCT FROM c.geom
+                RETURNING f.id
+            """, params + [pks])
+            changed = [row[0] for row in cursor.fetchall()]
+        if changed:
+            # No signal is sent by the update
+            if settings.DISTANCE_TO_SOURCE_SYNCHRONOUS:
+                DistanceToSource.objects.refresh_for_objects(self.model, changed)
+            else:
+                DistanceToSourceJob.objects.enqueue_objects(self.model, changed)
+            refresh_spatial_relations(self.model, changed)
+        return changed
+
+    def refresh_geoms_for_objects(self, model, pks):
+        """Collect geometries of administrative files linked to objects of a model"""
+        operation_model = self.model._meta.get_field('operations').related_model
+        return self.refresh_geoms(operation_model.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id__in=pks
+        ).values_list('administrative_file_id', flat=True).distinct())
+
+    def refresh_geoms_for_geom_sources(self, model, pks):
+        """Collect geometries of administrative files linked to objects taking their geometry from objects of a model"""
+        operation_model = self.model._meta.get_field('operations').related_model
+        queries = []
+        for linked_model in get_administrative_operation_models():
+            for source, condition, params in get_geom_fallbacks(linked_model):
+                if source is not model:
+                    continue
+                qn = connection.ops.quote_name
+                linked_table = qn(linked_model._meta.db_table)
+                # Joined on primary keys only, objects giving their geometry may be deleted
+                queries.append(operation_model.objects.filter(
+                    content_type=ContentType.objects.get_for_model(linked_model),
+                    object_id__in=RawSQL(f"""
+                        SELECT o.{qn(linked_model._meta.pk.column)} FROM {linked_table} o
+                        JOIN (SELECT unnest(%s) AS {qn(model._meta.pk.column)}) t ON {condition.format(t='t')}
+                        WHERE o.{qn(get_proximity_geom_field(linked_model).column)} IS NULL
+                    """, [list(pks)] + params),
+                ).values_list('administrative_file_id', flat=True))
+        if not queries:
+            return []
+        return self.refresh_geoms(set(pk for query in queries for pk in query))
+
+    def refresh_cost_rollup(self):
+        """Refresh the materialized view of costs by year, domain and funder"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {COST_ROLLUP_VIEW}")
+
+    def get_cost_rollup(self, year=None):
+        """
+        Rows of costs by year and domain (`dimension` is 'domain') and of fundings by year and organism
+        (`dimension` is 'organism'), as of the last refresh of the rollup
+        """
+        qn = connection.ops.quote_name
+        domain_model = self.model._meta.get_field('domain').related_model
+        organism_model = self.model._meta.get_field('funders').related_model
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT r.dimension, r.year, r.domain_id, d.label AS domain, r.organism_id, o.name AS organism,
+                       r.file_count, r.global_cost, r.estimated_cost, r.material_cost, r.subcontract_cost,
+                       r.manday_cost, r.actual_cost, r.funding_amount
+                FROM {COST_ROLLUP_VIEW} r
+                LEFT JOIN {qn(domain_model._meta.db_table)} d ON d.id = r.domain_id
+                LEFT JOIN {qn(organism_model._meta.db_table)} o ON o.id = r.organism_id
+                WHERE %(year)s::integer IS NULL OR r.year = %(year)s
+                ORDER BY r.year, r.dimension, d.label, o.name
+            """, {'year': year})
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,83 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:00
+
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+# (app label, model, geometry column) of objects linked to administrative files
+LINKED_MODELS = (
+    ('observations', 'station', 'geom'),
+    ('studies', 'study', 'geom'),
+    ('maintenance', 'intervention', '_geom'),
+    ('knowledge', 'followup', '_geom'),
+)
+
+# Geometries taken by interventions and follow-ups without stored geometry: (app label, model, join condition)
+FALLBACK_GEOMS = {
+    'intervention': (
+        ('knowledge', 'knowledge', "{t}.id = o.target_id AND o.target_type_id = {knowledge}"),
+        ('observations', 'station', "{t}.id = o.target_id AND o.target_type_id = {station}"),
+    ),
+    'followup': (
+        ('knowledge', 'knowledge', "{t}.id = o.knowledge_id"),
+    ),
+}
+
+
+def collect_geoms(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_types = {
+        model_name: content_type.pk
+        for app_label, model_name in (('observations', 'station'), ('studies', 'study'),
+                                      ('maintenance', 'intervention'), ('knowledge', 'followup'),
+                                      ('knowledge', 'knowledge'))
+        for content_type in ContentType.objects.filter(app_label=app_label, model=model_name)
+    }
+    parts = []
+    for app_label, model_name, column in LINKED_MODELS:
+        if model_name not in content_types:
+            continue
+        geoms, joins = [f'o.{column}'], []
+        for i, (source_app_label, source_model_name, condition) in enumerate(FALLBACK_GEOMS.get(model_name, ())):
+            if source_model_name not in content_types:
+                continue
+            alias = f't{i}'
+            geoms.append(f'{alias}.geom')
+            joins.append(f"LEFT JOIN {source_app_label}_{source_model_name} {alias} "
+                         f"ON {condition.format(t=alias, **content_types)}")
+        parts.append(f"""
+            SELECT op.administrative_file_id AS id, COALESCE({', '.join(geoms)}) AS geom
+            FROM finances_administration_administrativeoperation op
+            JOIN {app_label}_{model_name} o ON o.id = op.object_id
+            {' '.join(joins)}
+            WHERE op.content_type_id = {content_types[model_name]}
+        """)
+    if not parts:
+        return
+    schema_editor.execute(f"""
+        UPDATE finances_administration_administrativefile f SET geom = c.geom
+        FROM (SELECT id, ST_ForceCollection(ST_Collect(geom)) AS geom
+              FROM ({' UNION ALL '.join(parts)}) g GROUP BY id) c
+        WHERE f.id = c.id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('finances_administration', '0009_auto_20230321_1458'),
+        ('knowledge', '0017_auto_20221215_0733'),
+        ('maintenance', '0004_intervention_length'),
+        ('observations', '0001_initial'),
+        ('studies', '0002_auto_20210412_1144'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='administrativefile',
+            name='geom',
+            field=django.contrib.gis.db.models.fields.GeometryCollectionField(blank=True, editable=False, null=True, srid=settings.SRID, verbose_name='Geometry'),
+        ),
+        migrations.RunPython(collect_geoms, migrations.RunPython.noop),
+    ]
@@ -5,16 +5,15 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
-from django.contrib.gis.geos import GeometryCollection, LineString
 from django.db.models import F, Sum
 from django.utils.translation import gettext_lazy as _
 
 from mapentity.models import MapEntityMixin
 from geotrek.authent.models import StructureRelated, StructureOrNoneRelated
 from geotrek.common.mixins import TimeStampedModelMixin
-from geotrek.common.utils import classproperty
 from geotrek.zoning.mixins import ZoningPropertiesMixin
 
+from georiviere.finances_administration.managers import COST_TOTALS, AdministrativeFileManager
 from georiviere.main.models import AddPropertyBufferMixin
 from georiviere.watershed.mixins import WatershedPropertiesMixin
 
@@ -119,19 +118,25 @@ class AdministrativeFile(TimeStampedModelMixin, WatershedPropertiesMixin, Zoning
                                       max_digits=19, decimal_places=2, default=0)
     eid = models.CharField(verbose_name=_("External id"), max_length=1024,
                            blank=True, null=True)
+    # Collection of geometries of linked objects, maintained when operations or linked objects are saved
+    geom = models.GeometryCollectionField(verbose_name=_("Geometry"), srid=settings.SRID,
+                                          null=True, blank=True, editable=False)
+
+    objects = AdministrativeFileManager()
 
     class Meta:
         verbose_name = _("Administrative file")
         verbose_name_plural = _("Administrative files")
         ordering = ['-begin_date', 'name']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._geom = None
-
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.pk:
+            self.geom = AdministrativeFile.objects.collect_geom(self.pk)
+        super().save(*args, **kwargs)
+
     @property
     def name_display(self):
         return '<a data-pk="{0}" href="{1}" title="{2}">{3}</a>'.format(
@@ -143,55 +148,24 @@ class AdministrativeFile(TimeStampedModelMixin, WatershedPropertiesMixin, Zoning
 
     @property
     def funders_display(self):
+        if hasattr(self, 'funder_names'):
+            # Annotated by AdministrativeFile.objects.with_cost_totals()
+            return self.funder_names or []
         return [str(f) for f in self.funders.all()]
 
     @classmethod
     def get_create_label(cls):
         return _("Add a new admin file")
 
-    @classproperty
-    def geomfield(cls):
-        # Fake field, TODO: still better than overkill code in views, but can do neater.
-        c = GeometryCollection([LineString((0, 0), (1, 1))], srid=settings.SRID)
-        c.name = 'geom'
-        return c
-
-    @property
-    def geom(self):
-        """ Merge all studies geometry into a collection
-        Warning: Postgis 2.5+ with st_intersects on Collect
-        """
-        if self._geom is None:
-            geoms = []
-            for operation in self.operations.all():
-                if getattr(operation.content_object, 'geom') is not None:
-                    geoms.append(operation.content_object.geom)
-            if geoms:
-                self._geom = GeometryCollection(*geoms, srid=settings.SRID)
-        return self._geom
-
-    @property
-    def api_geom(self):
-        if not self.geom:
-            return None
-        return self.geom.transform(settings.API_SRID, clone=True)
-
-    @geom.setter
-    def geom(self, value):
-        self._geom = value
-
     @property
     def total_costs(self):
         """Total costs for this administrative and financial file
         :return dict
         """
-        results = self.operations.all().aggregate(
-            estimated=Sum('estimated_cost'),
-            material=Sum('material_cost'),
-            subcontract=Sum('subcontract_cost'),
-            mandays=Sum('manday_cost'),
-            actual=Sum(F('material_cost') + F('subcontract_cost') + F('manday_cost')),
-        )
+        if hasattr(self, 'total_actual'):
+            # Annotated by AdministrativeFile.objects.with_cost_totals()
+            return {name: getattr(self, f'total_{name}') for name in COST_TOTALS}
+        results = self.operations.all().aggregate(**{name: Sum(expression) for name, expression in COST_TOTALS.items()})
         return results
 
 
@@ -0,0 +1,13 @@
+from georiviere.finances_administration.models import AdministrativeFile
+
+
+def save_operation_refresh_geom(sender, instance, **kwargs):
+    AdministrativeFile.objects.refresh_geoms([instance.administrative_file_id])
+
+
+def save_objects_refresh_administrative_files_geom(sender, instance, **kwargs):
+    AdministrativeFile.objects.refresh_geoms_for_objects(sender, [instance.pk])
+
+
+def save_geom_sources_refresh_administrative_files_geom(sender, instance, **kwargs):
+    AdministrativeFile.objects.refresh_geoms_for_geom_sources(sender, [instance.pk])
@@ -0,0 +1,42 @@
+-- Costs and fundings of administrative files by year (of begin date) and domain, and by year and funder.
+-- Refreshed with refresh_cost_rollup command.
+CREATE MATERIALIZED VIEW finances_administration_costrollup AS
+WITH operation AS (
+    SELECT administrative_file_id,
+           SUM(estimated_cost) AS estimated_cost,
+           SUM(material_cost) AS material_cost,
+           SUM(subcontract_cost) AS subcontract_cost,
+           SUM(manday_cost) AS manday_cost
+    FROM finances_administration_administrativeoperation
+    GROUP BY administrative_file_id
+),
+file AS (
+    SELECT f.id, EXTRACT(YEAR FROM f.begin_date)::integer AS year, f.domain_id, f.global_cost,
+           COALESCE(o.estimated_cost, 0) AS estimated_cost,
+           COALESCE(o.material_cost, 0) AS material_cost,
+           COALESCE(o.subcontract_cost, 0) AS subcontract_cost,
+           COALESCE(o.manday_cost, 0) AS manday_cost
+    FROM finances_administration_administrativefile f
+    LEFT JOIN operation o ON o.administrative_file_id = f.id
+)
+SELECT 'domain' AS dimension, year, domain_id, NULL::integer AS organism_id,
+       COUNT(*) AS file_count,
+       SUM(global_cost) AS global_cost,
+       SUM(estimated_cost) AS estimated_cost,
+       SUM(material_cost) AS material_cost,
+       SUM(subcontract_cost) AS subcontract_cost,
+       SUM(manday_cost) AS manday_cost,
+       SUM(material_cost + subcontract_cost + manday_cost) AS actual_cost,
+       NULL::numeric AS funding_amount
+FROM file
+GROUP BY year, domain_id
+UNION ALL
+SELECT 'organism', file.year, NULL, fu.organism_id,
+       COUNT(DISTINCT file.id),
+       NULL, NULL, NULL, NULL, NULL, NULL,
+       SUM(fu.amount)
+FROM finances_administration_funding fu
+JOIN file ON file.id = fu.administrative_file_id
+GROUP BY file.year, fu.organism_id;
+
+CREATE INDEX finances_administration_costrollup_year_idx ON finances_administration_costrollup (year);
@@ -0,0 +1 @@
+DROP MATERIALIZED VIEW IF EXISTS finances_administration_costrollup;
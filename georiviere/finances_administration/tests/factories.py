@@ -1,6 +1,7 @@
 import factory
 from django.contrib.contenttypes.models import ContentType
 from factory import fuzzy
+from georiviere.knowledge.tests.factories import FollowUpKnowledgeFactory
 from georiviere.maintenance.tests.factories import InterventionStatusFactory
 from georiviere.observations.tests.factories import StationFactory
 from georiviere.studies.tests.factories import StudyFactory
@@ -50,6 +51,7 @@ class AdministrativeFileFactory(factory.django.DjangoModelFactory):
         if not create or not with_stream:
             return
         StudyOperationFactory.create(administrative_file=obj)
+        obj.refresh_from_db(fields=['geom'])
         if with_stream and obj.geom:
             # Status / Morphology is already on a stream
             # It should not add this next stream in distance to source
@@ -97,6 +99,13 @@ class StationOperationFactory(AdministrativeFileOperationFactory):
     content_object = factory.SubFactory(StationFactory)
 
 
+class FollowUpOperationFactory(AdministrativeFileOperationFactory):
+    class Meta:
+        model = models.AdministrativeOperation
+
+    content_object = factory.SubFactory(FollowUpKnowledgeFactory)
+
+
 class FundingFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = models.Funding
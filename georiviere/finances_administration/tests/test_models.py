@@ -1,7 +1,9 @@
-from django.contrib.gis.geos import GeometryCollection
+from django.contrib.gis.geos import GeometryCollection, Point, Polygon
 from django.test import TestCase
 from geotrek.authent.tests.factories import StructureFactory
 
+from georiviere.finances_administration.models import AdministrativeFile
+from georiviere.knowledge.models import FollowUp
 from georiviere.observations.tests.factories import StationFactory
 from georiviere.studies.tests.factories import StudyFactory
 from . import factories
@@ -105,9 +107,20 @@ class AdministrativeFileTest(TestCase):
         self.assertEqual(self.admin_file1.funders_display,
                          ["Ma petite entreprise", "Ma petite entreprise 2 (Ma structure)"])
 
+    def test_with_cost_totals(self):
+        """Test costs and funders annotated in one query are the same as computed by file"""
+        factories.ManDayFactory.create(job_category=self.job_cat1, operation=self.operation_station2, nb_days=2)
+        with self.assertNumQueries(1):
+            admin_files = {admin_file.pk: (admin_file.total_costs, admin_file.funders_display)
+                           for admin_file in AdministrativeFile.objects.with_cost_totals()}
+        for admin_file in AdministrativeFile.objects.all():
+            self.assertEqual(admin_files[admin_file.pk], (admin_file.total_costs, admin_file.funders_display))
+        self.assertEqual(admin_files[self.admin_file2.pk][0]['actual'], 31000)
+
     def test_create_project_operations(self):
         """Test when operations are set to an AdministrativeFile
         administrative file geom"""
+        self.admin_file2.refresh_from_db()
         self.assertTrue(self.admin_file2.geom.equals(GeometryCollection(self.study1.geom.union(self.station1.geom))))
 
     def test_mandays(self):
@@ -145,3 +158,71 @@ class AdministrativeFileTest(TestCase):
         self.assertEqual(self.operation_station2.actual_cost, operation_total_costs)
         admin_file2_total_costs = self.admin_file2.total_costs
         self.assertEqual(admin_file2_total_costs['actual'], 31000)
+
+
+class AdministrativeFileGeomTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_file = factories.AdministrativeFileFactory.create()
+        cls.station = StationFactory.create(geom=Point(700000, 6600000))
+        cls.study = StudyFactory.create(geom=Polygon.from_bbox((700100, 6600100, 700200, 6600200)))
+
+    def test_geom_without_operation(self):
+        self.assertIsNone(self.admin_file.geom)
+
+    def test_geom_follows_operations(self):
+        operation = factories.StationOperationFactory.create(content_object=self.station,
+                                                             administrative_file=self.admin_file)
+        factories.StudyOperationFactory.create(content_object=self.study, administrative_file=self.admin_file)
+        self.admin_file.refresh_from_db()
+        self.assertEqual(self.admin_file.geom.geom_type, 'GeometryCollection')
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(self.station.geom, self.study.geom)))
+        operation.delete()
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(self.study.geom)))
+
+    def test_geom_follows_linked_objects(self):
+        factories.StationOperationFactory.create(content_object=self.station, administrative_file=self.admin_file)
+        self.station.geom = Point(710000, 6610000)
+        self.station.save()
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(Point(710000, 6610000))))
+
+    def test_geom_of_linked_objects_without_geom(self):
+        # Follow-ups without geometry take the one of their knowledge
+        operation = factories.FollowUpOperationFactory.create(administrative_file=self.admin_file,
+                                                              content_object__knowledge__geom=Point(720000, 6620000))
+        self.assertIsNone(FollowUp.objects.get(pk=operation.object_id)._geom)
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(Point(720000, 6620000))))
+        knowledge = operation.content_object.knowledge
+        knowledge.geom = Point(730000, 6630000)
+        knowledge.save()
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(Point(730000, 6630000))))
+
+    def test_geom_follows_deleted_objects(self):
+        factories.StationOperationFactory.create(content_object=self.station, administrative_file=self.admin_file)
+        factories.StudyOperationFactory.create(content_object=self.study, administrative_file=self.admin_file)
+        self.station.delete()
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(self.study.geom)))
+        # Follow-ups are deleted with the knowledge giving them their geometry
+        operation = factories.FollowUpOperationFactory.create(administrative_file=self.admin_file,
+                                                              content_object__knowledge__geom=Point(720000, 6620000))
+        operation.content_object.knowledge.delete()
+        self.admin_file.refresh_from_db()
+        self.assertTrue(self.admin_file.geom.equals(GeometryCollection(self.study.geom)))
+
+    def test_geom_kept_when_saved(self):
+        factories.StationOperationFactory.create(content_object=self.station, administrative_file=self.admin_file)
+        self.admin_file.name = "Renamed"
+        self.admin_file.save()
+        self.assertTrue(AdministrativeFile.objects.get(pk=self.admin_file.pk).geom.equals(
+            GeometryCollection(self.station.geom)))
+
+    def test_geom_filter(self):
+        factories.StationOperationFactory.create(content_object=self.station, administrative_file=self.admin_file)
+        area = Polygon.from_bbox((699900, 6599900, 700050, 6600050))
+        self.assertQuerysetEqual(AdministrativeFile.objects.filter(geom__intersects=area),
+                                 [self.admin_file], transform=lambda obj: obj)
@@ -4,11 +4,14 @@ from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.test import TestCase
 from geotrek.authent.tests.factories import StructureFactory, UserFactory
+from mapentity.tests.factories import SuperUserFactory
 
 from georiviere.finances_administration.models import AdministrativeFile
 from georiviere.finances_administration.tests.factories import (AdministrativeFileFactory,
+                                                                AdministrativeFileDomainFactory,
                                                                 StudyOperationFactory,
                                                                 AdministrativeFilePhaseFactory,
+                                                                FundingFactory,
                                                                 OrganismFactory)
 from georiviere.tests import CommonRiverTest
 from georiviere.maintenance.tests.factories import InterventionStatusFactory, InterventionFactory
@@ -76,6 +79,48 @@ class AdministrativeOperationViewTestCase(TestCase):
         self.assertEquals(self.administrative_operation.name, "New name")
 
 
+class AdministrativeFileCostRollupViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.domain = AdministrativeFileDomainFactory.create(label="Water")
+        cls.organism = OrganismFactory.create(name="Agency")
+        admin_file = AdministrativeFileFactory.create(domain=cls.domain, begin_date='2023-03-01')
+        StudyOperationFactory.create(administrative_file=admin_file, estimated_cost=1000, material_cost=200,
+                                     subcontract_cost=300)
+        StudyOperationFactory.create(administrative_file=admin_file, estimated_cost=500, material_cost=0,
+                                     subcontract_cost=100)
+        FundingFactory.create(administrative_file=admin_file, organism=cls.organism, amount=800)
+        AdministrativeFileFactory.create(domain=cls.domain, begin_date='2024-01-01')
+        AdministrativeFile.objects.refresh_cost_rollup()
+
+    def setUp(self):
+        self.client.force_login(SuperUserFactory.create())
+
+    def test_cost_rollup(self):
+        response = self.client.get(reverse('finances_administration:administrativefile_cost_rollup'),
+                                   {'year': 2023})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['dimension'], 'domain')
+        self.assertEqual(results[0]['domain'], "Water")
+        self.assertEqual(results[0]['file_count'], 1)
+        self.assertEqual(float(results[0]['estimated_cost']), 1500)
+        self.assertEqual(float(results[0]['actual_cost']), 600)
+        self.assertEqual(results[1]['dimension'], 'organism')
+        self.assertEqual(results[1]['organism'], "Agency")
+        self.assertEqual(float(results[1]['funding_amount']), 800)
+
+    def test_cost_rollup_all_years(self):
+        response = self.client.get(reverse('finances_administration:administrativefile_cost_rollup'))
+        self.assertEqual([result['year'] for result in response.json()['results']], [2023, 2023, 2024])
+
+    def test_cost_rollup_bad_year(self):
+        response = self.client.get(reverse('finances_administration:administrativefile_cost_rollup'),
+                                   {'year': 'last'})
+        self.assertEqual(response.status_code, 400)
+
+
 class AdministrativeFileViewTestCase(CommonRiverTest):
     model = AdministrativeFile
     modelfactory = AdministrativeFileFactory
@@ -417,7 +462,7 @@ class AdministrativeFileViewTestCase(CommonRiverTest):
         }
 
     def _check_update_geom_permission(self, response):
-        """Pass check geom permission, AdministrativeFile has no geom"""
+        """Pass check geom permission, AdministrativeFile geom is not editable"""
         pass
 
     def test_crud_with_operations(self):
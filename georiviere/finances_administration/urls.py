@@ -2,7 +2,8 @@ from django.urls import path
 from mapentity.registry import registry
 
 from georiviere.finances_administration.models import AdministrativeFile
-from georiviere.finances_administration.views import AdministrativeOperationUpdate, AdministrativePhaseUpdate
+from georiviere.finances_administration.views import (AdministrativeFileCostRollupView, AdministrativeOperationUpdate,
+                                                      AdministrativePhaseUpdate)
 
 
 app_name = 'finances_administration'
@@ -10,5 +11,7 @@ urlpatterns = registry.register(AdministrativeFile)
 
 urlpatterns += [
     path('administrativeoperation/edit/<int:pk>', AdministrativeOperationUpdate.as_view(), name="administrativeoperation-update"),
-    path('administrativephase/edit/<int:pk>', AdministrativePhaseUpdate.as_view(), name="administrativephase-update")
+    path('administrativephase/edit/<int:pk>', AdministrativePhaseUpdate.as_view(), name="administrativephase-update"),
+    path('api/administrativefile/cost_rollup.json', AdministrativeFileCostRollupView.as_view(),
+         name="administrativefile_cost_rollup"),
 ]
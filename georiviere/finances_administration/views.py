@@ -1,4 +1,7 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
 from django.db.models import Count
+from django.http import JsonResponse
 from django.views import generic as generic_views
 from django.utils.translation import gettext_lazy as _
 
@@ -92,7 +95,7 @@ class AdministrativeFileFormsetMixin:
 
 
 class AdministrativeFileList(mapentity_views.MapEntityList):
-    queryset = AdministrativeFile.objects.all()
+    queryset = AdministrativeFile.objects.with_cost_totals()
     filterform = AdministrativeFileFilterSet
     columns = ['id', 'name']
 
@@ -111,7 +114,7 @@ class AdministrativeFileJsonList(mapentity_views.MapEntityJsonList, Administrati
 
 
 class AdministrativeFileFormat(mapentity_views.MapEntityFormat, AdministrativeFileList):
-    queryset = AdministrativeFile.objects.all()
+    queryset = AdministrativeFile.objects.with_cost_totals()
 
 
 class AdministrativeFileDocumentOdt(mapentity_views.MapEntityDocumentOdt):
@@ -123,7 +126,7 @@ class AdministrativeFileDocumentWeasyprint(mapentity_views.MapEntityDocumentWeas
 
 
 class AdministrativeFileDetail(mapentity_views.MapEntityDetail):
-    queryset = AdministrativeFile.objects.all()
+    queryset = AdministrativeFile.objects.with_cost_totals()
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
@@ -166,10 +169,6 @@ class AdministrativeFileViewSet(mapentity_views.MapEntityViewSet):
     geojson_serializer_class = AdministrativeFileGeojsonSerializer
     permission_classes = [rest_permissions.DjangoModelPermissionsOrAnonReadOnly]
 
-    def get_queryset(self):
-        # Override annotation done by MapEntityViewSet.get_queryset()
-        return AdministrativeFile.objects.all()
-
 
 class ManDayFormSet(FormsetMixin):
     context_name = "manday_formset"
@@ -206,3 +205,16 @@ class AdministrativePhaseUpdate(generic_views.UpdateView):
         context = super().get_context_data(**kwargs)
         context['title'] = self.get_title()
         return context
+
+
+class AdministrativeFileCostRollupView(LoginRequiredMixin, generic_views.View):
+    """Costs by year and domain, and fundings by year and funder, from the rollup refreshed by refresh_cost_rollup"""
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.has_perm('finances_administration.read_administrativefile'):
+            raise PermissionDenied
+        year = request.GET.get('year')
+        if year is not None and not year.isdigit():
+            return JsonResponse({'year': [_("Year must be a number")]}, status=400)
+        return JsonResponse({'results': AdministrativeFile.objects.get_cost_rollup(int(year) if year else None)})
@@ -19,6 +19,11 @@ class GeometryType(GeoFunc):
     function = 'GeometryType'
 
 
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """ ST_SimplifyPreserveTopology postgis function """
+    geom_param_pos = (0, )
+
+
 class ElevationInfos(GeoFunc):
     function = 'ft_elevation_infos'
     geom_param_pos = (0, )
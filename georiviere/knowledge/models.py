@@ -471,9 +471,7 @@ class FollowUp(TimeStampedModelMixin, WatershedPropertiesMixin, ZoningProperties
 
     @classmethod
     def within_buffer_without_knowledge(cls, topology):
-        area = topology.geom.buffer(settings.BASE_INTERSECTION_MARGIN)
-        qs = cls.objects.filter(_geom__intersects=area).filter(knowledge__isnull=True)
-        return qs
+        return cls.within_buffer(topology).filter(knowledge__isnull=True)
 
     @classmethod
     def get_create_label(cls):
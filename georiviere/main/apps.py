@@ -2,7 +2,7 @@ from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 from django.apps import apps
 
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_init, post_save
 
 
 class MainConfig(AppConfig):
@@ -12,8 +12,16 @@ class MainConfig(AppConfig):
     def ready(self):
         from . import signals
         from mapentity.models import MapEntityMixin
+        from geotrek.zoning.models import City, District
         from georiviere.river.models import Stream
+        from georiviere.watershed.models import Watershed
         for model in apps.get_models():
             if issubclass(model, MapEntityMixin) and model != Stream:
                 post_save.connect(signals.save_objects_generate_distance_to_source, sender=model)
                 post_delete.connect(signals.delete_objects_remove_distance_to_source, sender=model)
+        for model in signals.get_spatial_relation_models():
+            post_init.connect(signals.init_objects_keep_geom, sender=model)
+            post_save.connect(signals.save_objects_refresh_spatial_relations, sender=model)
+            post_delete.connect(signals.delete_objects_remove_spatial_relations, sender=model)
+        for model in (Watershed, City, District):
+            post_save.connect(signals.save_area_refresh_memberships, sender=model)
@@ -30,3 +30,6 @@ class Command(BaseCommand):
                 pass
         call_command('sync_translation_fields', '--noinput')
         call_command('update_translation_fields')
+        # Memberships and proximities are then maintained when objects or areas are saved
+        call_command('update_area_memberships', '--if-empty', verbosity=options.get('verbosity'))
+        call_command('update_proximities', '--if-empty', verbosity=options.get('verbosity'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management import BaseCommand
+
+from georiviere.main.models import DistanceToSourceJob
+
+
+class Command(BaseCommand):
+    help = 'Compute distances to source of queued objects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', type=int, default=500,
+                            help="Number of objects processed by batch. Default is 500.")
+        parser.add_argument('--loop', '-l', action='store_true', dest='loop', default=False,
+                            help="Keep waiting for new objects once the queue is empty.")
+        parser.add_argument('--sleep', '-s', action='store', dest='sleep', type=float, default=5,
+                            help="Seconds to wait between two checks of an empty queue with --loop. Default is 5.")
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        verbosity = options.get('verbosity')
+        total = 0
+        while True:
+            count = DistanceToSourceJob.objects.process(batch_size)
+            total += count
+            if count and verbosity >= 2:
+                self.stdout.write(f"{count} objects processed")
+            if count < batch_size:
+                if not options.get('loop'):
+                    break
+                time.sleep(options.get('sleep'))
+        if verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(f"Distances to source computed for {total} objects"))
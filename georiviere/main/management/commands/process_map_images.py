@@ -0,0 +1,37 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from georiviere.main.models import MapImage
+
+
+class Command(BaseCommand):
+    help = 'Capture queued map images of document reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', type=int, default=20,
+                            help="Number of images captured by batch. Default is 20.")
+        parser.add_argument('--workers', '-w', action='store', dest='workers', type=int, default=4,
+                            help="Number of images captured in parallel. Default is 4.")
+        parser.add_argument('--loop', '-l', action='store_true', dest='loop', default=False,
+                            help="Keep waiting for new images once the queue is empty.")
+        parser.add_argument('--sleep', '-s', action='store', dest='sleep', type=float, default=5,
+                            help="Seconds to wait between two checks of an empty queue with --loop. Default is 5.")
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        verbosity = options.get('verbosity')
+        total = 0
+        while True:
+            count = MapImage.objects.process(batch_size, options.get('workers'))
+            total += count
+            if count and verbosity >= 2:
+                self.stdout.write(f"{count} images processed")
+            if count < batch_size:
+                if not options.get('loop'):
+                    break
+                time.sleep(options.get('sleep'))
+                close_old_connections()
+        if verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(f"{total} map images captured"))
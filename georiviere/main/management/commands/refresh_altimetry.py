@@ -0,0 +1,50 @@
+import time
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from geotrek.altimetry.models import AltimetryMixin
+
+from georiviere.altimetry import drape
+
+
+class Command(BaseCommand):
+    help = "Compute altimetry of objects not draped yet (imported with deferred altimetry)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='app_label.ModelName',
+                            help="Models to refresh. Default is all models with altimetry.")
+        parser.add_argument('--all', '-a', action='store_true', dest='all', default=False,
+                            help="Refresh all objects, not only objects without altimetry.")
+        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', type=int, default=1000,
+                            help="Number of objects draped by statement. Default is 1000.")
+
+    def get_models(self, labels):
+        if not labels:
+            return [model for model in apps.get_models() if issubclass(model, AltimetryMixin)]
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Unknown model {label}")
+            if not issubclass(model, AltimetryMixin):
+                raise CommandError(f"{label} has no altimetry")
+            models.append(model)
+        return models
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        verbosity = options.get('verbosity')
+        for model in self.get_models(options.get('models')):
+            qs = model.objects.all() if options.get('all') else model.objects.filter(geom_3d__isnull=True)
+            pks = list(qs.exclude(geom__isnull=True).order_by('pk').values_list('pk', flat=True))
+            start = time.perf_counter()
+            for i in range(0, len(pks), batch_size):
+                drape(model, pks[i:i + batch_size])
+                if verbosity >= 2:
+                    self.stdout.write(f"{model._meta.label}: {min(i + batch_size, len(pks))} / {len(pks)}")
+            if verbosity >= 1:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{model._meta.label}: {len(pks)} objects draped in {time.perf_counter() - start:.1f}s"
+                ))
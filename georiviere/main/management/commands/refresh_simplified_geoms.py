@@ -0,0 +1,48 @@
+import time
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from georiviere.main.models import SimplifiedGeometryMixin
+
+
+class Command(BaseCommand):
+    help = "Simplify again geometries of portal maps, after a change of API_SIMPLIFY_ZOOM_BANDS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='app_label.ModelName',
+                            help="Models to refresh. Default is all models with simplified geometries.")
+        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', type=int, default=1000,
+                            help="Number of objects simplified by statement. Default is 1000.")
+
+    def get_models(self, labels):
+        if not labels:
+            return [model for model in apps.get_models() if issubclass(model, SimplifiedGeometryMixin)]
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Unknown model {label}")
+            if not issubclass(model, SimplifiedGeometryMixin):
+                raise CommandError(f"{label} has no simplified geometries")
+            models.append(model)
+        return models
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        verbosity = options.get('verbosity')
+        for model in self.get_models(options.get('models')):
+            pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            start = time.perf_counter()
+            for i in range(0, len(pks), batch_size):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT simplify_objects(%s::regclass, %s)",
+                                   [model._meta.db_table, pks[i:i + batch_size]])
+                if verbosity >= 2:
+                    self.stdout.write(f"{model._meta.label}: {min(i + batch_size, len(pks))} / {len(pks)}")
+            if verbosity >= 1:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{model._meta.label}: {len(pks)} objects simplified in {time.perf_counter() - start:.1f}s"
+                ))
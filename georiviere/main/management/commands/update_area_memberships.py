@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from georiviere.main.models import CityMembership, DistrictMembership, WatershedMembership
+
+
+class Command(BaseCommand):
+    help = "Compute memberships of all objects in watersheds, cities and districts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-empty', action='store_true', dest='if_empty', default=False,
+                            help="Only compute memberships of kinds of areas without any membership yet.")
+
+    def handle(self, *args, **options):
+        verbosity = options.get('verbosity')
+        for model in (WatershedMembership, CityMembership, DistrictMembership):
+            if options.get('if_empty') and model.objects.exists():
+                continue
+            model.objects.rebuild()
+            if verbosity >= 1:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{model._meta.verbose_name_plural}: {model.objects.count()}"
+                ))
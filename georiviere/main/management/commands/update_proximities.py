@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from georiviere.main.models import Proximity
+
+
+class Command(BaseCommand):
+    help = "Compute proximities of all objects, used by properties of objects within a buffer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-empty', action='store_true', dest='if_empty', default=False,
+                            help="Only compute proximities if none is stored yet.")
+
+    def handle(self, *args, **options):
+        if options.get('if_empty') and Proximity.objects.exists():
+            return
+        Proximity.objects.rebuild()
+        if options.get('verbosity') >= 1:
+            self.stdout.write(self.style.SUCCESS(f"{Proximity._meta.verbose_name_plural}: {Proximity.objects.count()}"))
@@ -0,0 +1,476 @@
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, reduce
+from hashlib import md5
+from operator import or_
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import Distance, Length, LineLocatePoint
+from django.db import connection, connections, models, transaction
+from django.db.models import Case, Count, F, FloatField, Max, Q, When
+from django.utils import timezone
+
+from georiviere.functions import ClosestPoint, LineSubString
+
+logger = logging.getLogger(__name__)
+
+# Distance along the stream from its source to the point of the stream closest to the object,
+# plus the distance from the object to the stream and from the stream to its source location.
+# Stream is aliased `s`, object `o`, and LOCATE_SQL provides `l`.
+DISTANCE_SQL = """
+    ST_Length(ST_LineSubstring(s.geom,
+                               LEAST(l.locate_source, l.locate_object),
+                               GREATEST(l.locate_source, l.locate_object)))
+    + ST_Distance(o.geom, s.geom) + ST_Distance(s.geom, s.source_location)
+"""
+
+LOCATE_SQL = """
+    LATERAL (SELECT ST_LineLocatePoint(s.geom, s.source_location) AS locate_source,
+                    ST_LineLocatePoint(s.geom, ST_ClosestPoint(s.geom, o.geom)) AS locate_object) l
+"""
+
+
+def get_distance_to_source_models():
+    """Returns models with a geometry for which a distance to source is computed from the stream.
+    Stream topologies (status, morphology) are excluded, they are linked to their own stream."""
+    from mapentity.models import MapEntityMixin
+
+    stream_model = apps.get_model('river', 'Stream')
+    return [
+        model for model in apps.get_models()
+        if issubclass(model, MapEntityMixin) and model != stream_model and not hasattr(model, 'get_topology')
+        and 'geom' in [field.name for field in model._meta.get_fields()]
+    ]
+
+
+def annotate_distance_to_source(streams, instance):
+    if streams:
+        streams = streams.annotate(
+            locate_source=LineLocatePoint(F('geom'), F('source_location')),
+            locate_object=LineLocatePoint(F('geom'), ClosestPoint(F('geom'), instance.geom)),
+            locate=Length(LineSubString(F('geom'),
+                                        Case(
+                                            When(locate_source__gte=F('locate_object'), then=F('locate_object')),
+                                            default=F('locate_source')),
+                                        Case(
+                                            When(locate_source__gte=F('locate_object'), then=F('locate_source')),
+                                            default=F('locate_object')))) + Distance(
+                instance.geom,
+                F('geom'),
+                output_field=FloatField()) + Distance(
+                F('geom'),
+                F('source_location'),
+                output_field=FloatField())
+        )
+    return streams
+
+
+class DistanceToSourceManager(models.Manager):
+    """Compute distances to source set-wise, in database"""
+
+    def _upsert(self, distances_sql, content_type_ids, params, object_ids=None, stream_id=None):
+        """
+        Upsert distances returned by `distances_sql` (content_type_id, object_id, stream_id, distance)
+        on (content_type, object_id, stream), and delete other rows of the given objects or stream.
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        where = ["content_type_id = ANY(%(content_types)s)"]
+        if object_ids is not None:
+            where.append("object_id = ANY(%(object_ids)s)")
+        if stream_id is not None:
+            where.append("stream_id = %(stream)s")
+        sql = f"""
+            WITH distances AS (
+                {distances_sql}
+            ),
+            upserted AS (
+                INSERT INTO {table} (distance, stream_id, content_type_id, object_id)
+                SELECT distance, stream_id, content_type_id, object_id FROM distances
+                ON CONFLICT (content_type_id, object_id, stream_id) DO UPDATE SET distance = EXCLUDED.distance
+                RETURNING id
+            )
+            DELETE FROM {table}
+            WHERE {' AND '.join(where)} AND id NOT IN (SELECT id FROM upserted)
+        """
+        params.update({'content_types': content_type_ids, 'object_ids': object_ids, 'stream': stream_id})
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def refresh_for_stream(self, stream):
+        """
+        Compute distances to source of all objects around the stream in one statement.
+        Distances are upserted on (content_type, object_id, stream), rows of objects
+        not around the stream anymore are deleted.
+        """
+        content_types = ContentType.objects.get_for_models(*get_distance_to_source_models())
+        if not content_types:
+            return
+        qn = connection.ops.quote_name
+        stream_table = qn(apps.get_model('river', 'Stream')._meta.db_table)
+        objects_sql = " UNION ALL ".join(
+            f"SELECT {content_type.pk} AS content_type_id, o.{qn(model._meta.pk.column)} AS object_id, "
+            f"o.{qn(model._meta.get_field('geom').column)} AS geom "
+            f"FROM {qn(model._meta.db_table)} o, {stream_table} s "
+            f"WHERE s.id = %(stream)s AND ST_Intersects(o.{qn(model._meta.get_field('geom').column)}, "
+            f"ST_Buffer(s.geom, %(margin)s))"
+            for model, content_type in content_types.items()
+        )
+        distances_sql = f"""
+            SELECT o.content_type_id, o.object_id, s.id AS stream_id, {DISTANCE_SQL} AS distance
+            FROM ({objects_sql}) o, {stream_table} s, {LOCATE_SQL}
+            WHERE s.id = %(stream)s
+        """
+        self._upsert(distances_sql, [content_type.pk for content_type in content_types.values()],
+                     {'margin': settings.BASE_INTERSECTION_MARGIN}, stream_id=stream.pk)
+
+    def refresh_for_objects(self, model, pks):
+        """
+        Compute distances to source of objects of one model, for all their streams, in one statement.
+        Rows of deleted objects or of streams not around objects anymore are deleted.
+        """
+        pks = list(pks)
+        if not pks:
+            return
+        field_names = [field.name for field in model._meta.get_fields()]
+        if 'geom' not in field_names:
+            # Geometry is not stored (administrative files), compute object by object
+            for instance in model.objects.filter(pk__in=pks):
+                self.refresh_for_instance(instance)
+            self.filter(content_type=ContentType.objects.get_for_model(model),
+                        object_id__in=pks).exclude(object_id__in=model.objects.filter(pk__in=pks)).delete()
+            return
+        qn = connection.ops.quote_name
+        stream_table = qn(apps.get_model('river', 'Stream')._meta.db_table)
+        content_type = ContentType.objects.get_for_model(model)
+        objects_sql = (
+            f"SELECT {qn(model._meta.pk.column)} AS object_id, {qn(model._meta.get_field('geom').column)} AS geom"
+            f"{', ' + qn(model._meta.get_field('topology').column) + ' AS topology_id' if 'topology' in field_names else ''} "
+            f"FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} = ANY(%(object_ids)s)"
+        )
+        if hasattr(model, 'get_topology'):
+            # Status and morphologies are only related to their own stream
+            topology_table = qn(apps.get_model('river', 'Topology')._meta.db_table)
+            join_sql = f"JOIN {topology_table} t ON t.id = o.topology_id JOIN {stream_table} s ON s.id = t.stream_id"
+        else:
+            join_sql = f"JOIN {stream_table} s ON ST_Intersects(s.geom, ST_Buffer(o.geom, %(margin)s))"
+        distances_sql = f"""
+            SELECT {content_type.pk} AS content_type_id, o.object_id, s.id AS stream_id, {DISTANCE_SQL} AS distance
+            FROM ({objects_sql}) o {join_sql}, {LOCATE_SQL}
+        """
+        self._upsert(distances_sql, [content_type.pk],
+                     {'margin': settings.BASE_INTERSECTION_MARGIN}, object_ids=pks)
+
+    def get_distances(self, streams, elements):
+        """
+        Distances to source of many elements, of any models, from many streams, in one query.
+        Returns {(stream pk, content type pk, element pk): distance}
+        """
+        stream_ids = [stream.pk for stream in streams]
+        object_ids = defaultdict(set)
+        for element in elements:
+            object_ids[ContentType.objects.get_for_model(element).pk].add(element.pk)
+        if not stream_ids or not object_ids:
+            return {}
+        condition = reduce(or_, (Q(content_type_id=content_type_id, object_id__in=pks)
+                                 for content_type_id, pks in object_ids.items()))
+        return {
+            (stream_id, content_type_id, object_id): distance
+            for stream_id, content_type_id, object_id, distance in self.filter(condition, stream_id__in=stream_ids)
+            .values_list('stream_id', 'content_type_id', 'object_id', 'distance')
+        }
+
+    def refresh_for_instance(self, instance):
+        """Compute distances to source of one object through its `streams` property"""
+        content_type = ContentType.objects.get_for_model(instance._meta.model)
+        streams = annotate_distance_to_source(instance.streams, instance)
+        for stream in streams:
+            self.update_or_create(
+                object_id=instance.pk,
+                content_type=content_type,
+                stream=stream,
+                defaults={"distance": stream.locate.m}
+            )
+        self.filter(object_id=instance.pk, content_type=content_type).exclude(stream__in=streams).delete()
+
+
+class DistanceToSourceJobManager(models.Manager):
+    """Queue of objects whose distances to source have to be computed"""
+
+    def enqueue(self, instance):
+        """Add an object to the queue, an object already waiting is not queued twice"""
+        self.enqueue_objects(instance._meta.model, [instance.pk])
+
+    def enqueue_objects(self, model, pks):
+        """Add objects of a model to the queue, e.g. after a bulk import which sends no signal"""
+        content_type = ContentType.objects.get_for_model(model)
+        self.bulk_create([self.model(content_type=content_type, object_id=pk) for pk in pks], ignore_conflicts=True)
+
+    def process(self, batch_size=500):
+        """
+        Compute distances to source of a batch of queued objects, one statement by model.
+        Returns the number of processed objects.
+        """
+        with transaction.atomic():
+            jobs = list(self.select_related('content_type').select_for_update(skip_locked=True, of=('self', ))
+                        .order_by('date_insert')[:batch_size])
+            object_ids = {}
+            for job in jobs:
+                object_ids.setdefault(job.content_type, []).append(job.object_id)
+            for content_type, pks in object_ids.items():
+                model = content_type.model_class()
+                if model is not None:
+                    apps.get_model('main', 'DistanceToSource').objects.refresh_for_objects(model, pks)
+            self.filter(pk__in=[job.pk for job in jobs]).delete()
+        return len(jobs)
+
+
+def get_area_membership_models():
+    """Returns models with a stored geometry whose memberships in areas (watersheds, cities, districts) are stored"""
+    from mapentity.models import MapEntityMixin
+
+    return [
+        model for model in apps.get_models()
+        if issubclass(model, MapEntityMixin) and 'geom' in [field.name for field in model._meta.concrete_fields]
+    ]
+
+
+def refresh_area_memberships(model, pks):
+    """Refresh memberships of objects in all kinds of areas"""
+    for membership_model in ('WatershedMembership', 'CityMembership', 'DistrictMembership'):
+        apps.get_model('main', membership_model).objects.refresh_for_objects(model, pks)
+
+
+def refresh_spatial_relations(model, pks):
+    """Refresh memberships in areas and proximities of objects, once their geometries are saved"""
+    if model in get_area_membership_models():
+        refresh_area_memberships(model, pks)
+    apps.get_model('main', 'Proximity').objects.refresh_for_objects(model, pks)
+
+
+class AreaMembershipManager(models.Manager):
+    """Compute memberships of objects in areas set-wise, in database"""
+
+    def _refresh(self, model, object_ids=None, area_ids=None):
+        """Replace memberships of the given objects of a model, or of the given areas, by intersections"""
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        area_field = self.model._meta.get_field('area')
+        area_model = area_field.related_model
+        where = ["content_type_id = %(content_type)s"]
+        join_where = []
+        if object_ids is not None:
+            where.append("object_id = ANY(%(object_ids)s)")
+            join_where.append(f"o.{qn(model._meta.pk.column)} = ANY(%(object_ids)s)")
+        if area_ids is not None:
+            where.append(f"{qn(area_field.column)} = ANY(%(area_ids)s)")
+            join_where.append(f"a.{qn(area_model._meta.pk.column)} = ANY(%(area_ids)s)")
+        params = {
+            'content_type': ContentType.objects.get_for_model(model).pk,
+            'object_ids': object_ids,
+            'area_ids': area_ids,
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {' AND '.join(where)}", params)
+            cursor.execute(f"""
+                INSERT INTO {table} (content_type_id, object_id, {qn(area_field.column)})
+                SELECT %(content_type)s, o.{qn(model._meta.pk.column)}, a.{qn(area_model._meta.pk.column)}
+                FROM {qn(model._meta.db_table)} o
+                JOIN {qn(area_model._meta.db_table)} a
+                ON ST_Intersects(o.{qn(model._meta.get_field('geom').column)},
+                                 a.{qn(area_model._meta.get_field('geom').column)})
+                {'WHERE ' + ' AND '.join(join_where) if join_where else ''}
+                ON CONFLICT DO NOTHING
+            """, params)
+
+    def refresh_for_objects(self, model, pks):
+        """Compute areas of objects of one model in one statement"""
+        pks = list(pks)
+        if pks:
+            self._refresh(model, object_ids=pks)
+
+    def refresh_for_areas(self, pks):
+        """Compute objects of areas, one statement by model"""
+        pks = list(pks)
+        if pks:
+            for model in get_area_membership_models():
+                self._refresh(model, area_ids=pks)
+
+    def rebuild(self):
+        """Compute all memberships, one statement by model"""
+        for model in get_area_membership_models():
+            self._refresh(model)
+
+
+def get_proximity_geom_field(model):
+    """Returns the stored geometry field of a model (`geom` or `_geom`), or None"""
+    names = [field.name for field in model._meta.concrete_fields]
+    for name in ('geom', '_geom'):
+        if name in names:
+            return model._meta.get_field(name)
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_proximity_relations():
+    """
+    Returns (source model, target model) of properties added with a `within_buffer` method of the target
+    (see AddPropertyBufferMixin), if both models store their geometry.
+    """
+    relations = set()
+    for model in apps.get_models():
+        for attribute in vars(model).values():
+            if not isinstance(attribute, property):
+                continue
+            target = getattr(attribute.fget, '__self__', None)
+            if (isinstance(target, type) and attribute.fget.__name__.startswith('within_buffer')
+                    and get_proximity_geom_field(model) and get_proximity_geom_field(target)):
+                relations.add((model, target))
+    return frozenset(relations)
+
+
+class ProximityManager(models.Manager):
+    """Compute objects within BASE_INTERSECTION_MARGIN of each other set-wise, in database"""
+
+    def _refresh(self, source, target, source_ids=None, target_ids=None):
+        """Replace proximities from sources to targets of the given objects (or all objects) by computed ones"""
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        source_geom, target_geom = get_proximity_geom_field(source).column, get_proximity_geom_field(target).column
+        where = ["source_content_type_id = %(source_type)s", "target_content_type_id = %(target_type)s"]
+        join_where = []
+        if source_ids is not None:
+            where.append("source_id = ANY(%(source_ids)s)")
+            join_where.append(f"s.{qn(source._meta.pk.column)} = ANY(%(source_ids)s)")
+        if target_ids is not None:
+            where.append("target_id = ANY(%(target_ids)s)")
+            join_where.append(f"t.{qn(target._meta.pk.column)} = ANY(%(target_ids)s)")
+        params = {
+            'source_type': ContentType.objects.get_for_model(source).pk,
+            'target_type': ContentType.objects.get_for_model(target).pk,
+            'source_ids': source_ids,
+            'target_ids': target_ids,
+            'margin': settings.BASE_INTERSECTION_MARGIN,
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {' AND '.join(where)}", params)
+            cursor.execute(f"""
+                INSERT INTO {table} (source_content_type_id, source_id, target_content_type_id, target_id)
+                SELECT %(source_type)s, s.{qn(source._meta.pk.column)}, %(target_type)s, t.{qn(target._meta.pk.column)}
+                FROM {qn(source._meta.db_table)} s
+                JOIN {qn(target._meta.db_table)} t ON ST_DWithin(s.{qn(source_geom)}, t.{qn(target_geom)}, %(margin)s)
+                {'WHERE ' + ' AND '.join(join_where) if join_where else ''}
+                ON CONFLICT DO NOTHING
+            """, params)
+
+    def refresh_for_objects(self, model, pks):
+        """Compute proximities of objects of one model, as source and as target, one statement by relation"""
+        pks = list(pks)
+        if not pks:
+            return
+        for source, target in get_proximity_relations():
+            if source == model:
+                self._refresh(source, target, source_ids=pks)
+            if target == model:
+                self._refresh(source, target, target_ids=pks)
+
+    def rebuild(self):
+        """Compute all proximities, one statement by relation"""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(self.model._meta.db_table)}")
+            for source, target in get_proximity_relations():
+                self._refresh(source, target)
+
+
+def get_map_image_path(instance, properties=()):
+    """Path of the map image of an object, alone or with other objects around it (properties, e.g. `usages`)"""
+    if properties:
+        return instance.get_map_image_path_with_other_objects(properties)
+    return instance.get_map_image_path()
+
+
+def get_map_image_version(instance, properties=()):
+    """
+    Version of the map image of an object, it changes when the object changes,
+    or when objects around it are changed, added or removed
+    """
+    values = [instance.get_date_update().isoformat()]
+    for prop in properties:
+        aggregate = getattr(instance, prop).aggregate(count=Count('pk'), date_update=Max('date_update'))
+        values.append(f"{aggregate['count']}-{aggregate['date_update'].isoformat() if aggregate['count'] else ''}")
+    return md5('-'.join(values).encode()).hexdigest()
+
+
+def capture_map_image(instance, rooturl, properties=()):
+    if properties:
+        instance.capture_map_image_with_other_objects(rooturl, properties)
+    else:
+        instance.prepare_map_image(rooturl)
+
+
+class MapImageManager(models.Manager):
+    """Map images of objects captured in background, with the version of objects they were captured from"""
+
+    def get_path(self, instance, rooturl, properties=()):
+        """
+        Returns path of the last map image captured for an object, None if not captured yet.
+        Capture of an up-to-date image is queued if needed, or done at once with MAP_IMAGE_SYNCHRONOUS.
+        """
+        properties = sorted(properties)
+        path = get_map_image_path(instance, properties)
+        if settings.MAP_IMAGE_SYNCHRONOUS:
+            if properties:
+                instance.prepare_map_image_with_other_objects(rooturl, properties)
+            else:
+                instance.prepare_map_image(rooturl)
+            return path
+        image, created = self.get_or_create(content_type=ContentType.objects.get_for_model(instance._meta.model),
+                                            object_id=instance.pk, properties=','.join(properties))
+        exists = os.path.exists(path)
+        if not exists or image.version != get_map_image_version(instance, properties):
+            self.filter(pk=image.pk, date_queued__isnull=True).update(date_queued=timezone.now(), rooturl=rooturl)
+        return path if exists else None
+
+    def process(self, batch_size=20, workers=4):
+        """
+        Capture a batch of queued map images, in parallel by a pool of workers.
+        Images are claimed in a short transaction, no lock is held during captures.
+        Version of an image is only recorded once it is captured, images which were not are captured again
+        when asked next time.
+        Returns the number of processed images.
+        """
+        with transaction.atomic():
+            images = list(self.select_related('content_type').select_for_update(skip_locked=True, of=('self', ))
+                          .filter(date_queued__isnull=False).order_by('date_queued')[:batch_size])
+            captures = []
+            for image in images:
+                instance = image.content_object
+                if instance is None:
+                    image.delete()
+                    continue
+                properties = image.properties.split(',') if image.properties else []
+                # Objects may change during capture, image is captured again next time
+                version = get_map_image_version(instance, properties)
+                image.date_queued = None
+                captures.append((image, instance, properties, version))
+            self.bulk_update([capture[0] for capture in captures], ['date_queued'])
+
+        def capture(args):
+            image, instance, properties, version = args
+            try:
+                capture_map_image(instance, image.rooturl, properties)
+                image.version = version
+            except Exception:
+                logger.exception("Map image of %s %s could not be captured", instance._meta.label, instance.pk)
+                image.version = ''
+            finally:
+                # Connections opened by workers are not reused, e.g. by the next batch with --loop
+                connections.close_all()
+            return image
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self.bulk_update(list(executor.map(capture, captures)), ['version'])
+        return len(images)
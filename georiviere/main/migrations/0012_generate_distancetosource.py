@@ -8,7 +8,7 @@ from django.db import migrations
 def generate_distancetosource(apps, schema_editor):
     Stream = apps.get_model('river', 'Stream')
     DistanceToSource = apps.get_model('main', 'DistanceToSource')
-    from georiviere.main.signals import annotate_distance_to_source
+    from georiviere.main.managers import annotate_distance_to_source
     for model in apps.get_models():
         field_names = [field.name for field in model._meta.get_fields()]
         if any(i in field_names for i in ['topology', 'geom']) and model._meta.model_name != "stream":
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('main', '0013_auto_20231027_1116'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistanceToSourceJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('date_insert', models.DateTimeField(auto_now_add=True, verbose_name='Insertion date')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Distance to source job',
+                'verbose_name_plural': 'Distance to source jobs',
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.1.14 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('zoning', '0001_initial'),
+        ('watershed', '0004_watershed_geom_simplified'),
+        ('main', '0014_distancetosourcejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatershedMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='watershed.watershed')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Watershed membership',
+                'verbose_name_plural': 'Watershed memberships',
+                'abstract': False,
+                'unique_together': {('content_type', 'object_id', 'area')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DistrictMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='zoning.district')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'District membership',
+                'verbose_name_plural': 'District memberships',
+                'abstract': False,
+                'unique_together': {('content_type', 'object_id', 'area')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CityMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='zoning.city')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'City membership',
+                'verbose_name_plural': 'City memberships',
+                'abstract': False,
+                'unique_together': {('content_type', 'object_id', 'area')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='watershedmembership',
+            index=models.Index(fields=['area', 'content_type', 'object_id'], name='main_wsmember_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='districtmembership',
+            index=models.Index(fields=['area', 'content_type', 'object_id'], name='main_distmember_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citymembership',
+            index=models.Index(fields=['area', 'content_type', 'object_id'], name='main_citymember_area_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('main', '0015_areamembership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Proximity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.PositiveIntegerField()),
+                ('target_id', models.PositiveIntegerField()),
+                ('source_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('target_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Proximity',
+                'verbose_name_plural': 'Proximities',
+                'unique_together': {('source_content_type', 'source_id', 'target_content_type', 'target_id')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='proximity',
+            index=models.Index(fields=['target_content_type', 'target_id'], name='main_proximity_target_idx'),
+        ),
+    ]
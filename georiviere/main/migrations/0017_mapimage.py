@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('main', '0016_proximity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('properties', models.CharField(blank=True, max_length=250, verbose_name='Other objects')),
+                ('version', models.CharField(blank=True, max_length=32, verbose_name='Version')),
+                ('rooturl', models.CharField(blank=True, max_length=250, verbose_name='Root URL')),
+                ('date_queued', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Queuing date')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Map image',
+                'verbose_name_plural': 'Map images',
+                'unique_together': {('content_type', 'object_id', 'properties')},
+            },
+        ),
+    ]
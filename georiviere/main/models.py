@@ -1,12 +1,16 @@
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models import GeometryField
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from paperclip.models import FileType as BaseFileType, Attachment as BaseAttachment
 from geotrek.authent.models import StructureOrNoneRelated
 from geotrek.common.mixins import AddPropertyMixin
 
+from georiviere.main.managers import (AreaMembershipManager, DistanceToSourceManager, DistanceToSourceJobManager,
+                                      MapImageManager, ProximityManager, get_proximity_relations)
+
 
 class FileType(StructureOrNoneRelated, BaseFileType):
     class Meta(BaseFileType.Meta):
@@ -52,6 +56,13 @@ class AddPropertyBufferMixin(AddPropertyMixin):
         qs = cls.objects.none()
         if not topology.geom:
             return qs
+        if topology.pk is not None and (topology._meta.model, cls) in get_proximity_relations():
+            # Stored proximities, maintained when objects are saved
+            return cls.objects.filter(pk__in=Proximity.objects.filter(
+                source_content_type=ContentType.objects.get_for_model(topology._meta.model),
+                source_id=topology.pk,
+                target_content_type=ContentType.objects.get_for_model(cls),
+            ).values('target_id'))
         geom = topology.geom
         area = geom.buffer(settings.BASE_INTERSECTION_MARGIN)
         qs = cls.objects.all()
@@ -62,6 +73,19 @@ class AddPropertyBufferMixin(AddPropertyMixin):
         return qs
 
 
+class SimplifiedGeometryMixin(models.Model):
+    """Geometries simplified for portal maps, one by zoom band of API_SIMPLIFY_ZOOM_BANDS.
+    They are maintained by database triggers (simplify_geom)."""
+    geom_simplified_low = GeometryField(srid=settings.API_SRID, null=True, editable=False)
+    geom_simplified_medium = GeometryField(srid=settings.API_SRID, null=True, editable=False)
+    geom_simplified_high = GeometryField(srid=settings.API_SRID, null=True, editable=False)
+
+    simplified_geom_fields = ('geom_simplified_low', 'geom_simplified_medium', 'geom_simplified_high')
+
+    class Meta:
+        abstract = True
+
+
 class DistanceToSource(models.Model):
     distance = models.FloatField(verbose_name=_("Distance"), default=0)
     stream = models.ForeignKey('river.Stream', on_delete=models.CASCADE)
@@ -69,7 +93,101 @@ class DistanceToSource(models.Model):
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
 
+    objects = DistanceToSourceManager()
+
     class Meta:
         verbose_name = _("Distance to source")
         verbose_name_plural = _("Distance to sources")
         unique_together = ('content_type', 'object_id', 'stream')
+
+
+class DistanceToSourceJob(models.Model):
+    """Object waiting for its distances to source to be computed"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    date_insert = models.DateTimeField(auto_now_add=True, verbose_name=_("Insertion date"))
+
+    objects = DistanceToSourceJobManager()
+
+    class Meta:
+        verbose_name = _("Distance to source job")
+        verbose_name_plural = _("Distance to source jobs")
+        unique_together = ('content_type', 'object_id')
+
+
+class MapImage(models.Model):
+    """Map image of an object, alone or with other objects around it, captured in background"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    properties = models.CharField(max_length=250, blank=True, verbose_name=_("Other objects"))
+    version = models.CharField(max_length=32, blank=True, verbose_name=_("Version"))
+    rooturl = models.CharField(max_length=250, blank=True, verbose_name=_("Root URL"))
+    date_queued = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name=_("Queuing date"))
+
+    objects = MapImageManager()
+
+    class Meta:
+        verbose_name = _("Map image")
+        verbose_name_plural = _("Map images")
+        unique_together = ('content_type', 'object_id', 'properties')
+
+
+class AreaMembership(models.Model):
+    """Object intersecting an area, maintained when the object or the area is saved"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    objects = AreaMembershipManager()
+
+    class Meta:
+        abstract = True
+        unique_together = ('content_type', 'object_id', 'area')
+
+
+class WatershedMembership(AreaMembership):
+    area = models.ForeignKey('watershed.Watershed', on_delete=models.CASCADE, related_name='memberships')
+
+    class Meta(AreaMembership.Meta):
+        verbose_name = _("Watershed membership")
+        verbose_name_plural = _("Watershed memberships")
+        indexes = [models.Index(fields=['area', 'content_type', 'object_id'], name='main_wsmember_area_idx')]
+
+
+class CityMembership(AreaMembership):
+    area = models.ForeignKey('zoning.City', on_delete=models.CASCADE, related_name='memberships')
+
+    class Meta(AreaMembership.Meta):
+        verbose_name = _("City membership")
+        verbose_name_plural = _("City memberships")
+        indexes = [models.Index(fields=['area', 'content_type', 'object_id'], name='main_citymember_area_idx')]
+
+
+class DistrictMembership(AreaMembership):
+    area = models.ForeignKey('zoning.District', on_delete=models.CASCADE, related_name='memberships')
+
+    class Meta(AreaMembership.Meta):
+        verbose_name = _("District membership")
+        verbose_name_plural = _("District memberships")
+        indexes = [models.Index(fields=['area', 'content_type', 'object_id'], name='main_distmember_area_idx')]
+
+
+class Proximity(models.Model):
+    """Target object within BASE_INTERSECTION_MARGIN of a source object, for properties added with
+    AddPropertyBufferMixin.within_buffer. Maintained when objects are saved."""
+    source_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    source_id = models.PositiveIntegerField()
+    source = GenericForeignKey('source_content_type', 'source_id')
+    target_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    target_id = models.PositiveIntegerField()
+    target = GenericForeignKey('target_content_type', 'target_id')
+
+    objects = ProximityManager()
+
+    class Meta:
+        verbose_name = _("Proximity")
+        verbose_name_plural = _("Proximities")
+        unique_together = ('source_content_type', 'source_id', 'target_content_type', 'target_id')
+        indexes = [models.Index(fields=['target_content_type', 'target_id'], name='main_proximity_target_idx')]
@@ -1,6 +1,17 @@
-from rest_framework.renderers import JSONRenderer
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 
 
 class GeoJSONRenderer(JSONRenderer):
     format = 'geojson'
     media_type = 'application/geo+json'
+
+
+class MVTRenderer(BaseRenderer):
+    """ Vector tiles are rendered by database """
+    format = 'pbf'
+    media_type = 'application/vnd.mapbox-vector-tile'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
@@ -1,59 +1,76 @@
-from django.contrib.gis.db.models.functions import Distance, Length, LineLocatePoint
+from django.apps import apps
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import F, FloatField, Case, When
-
-from georiviere.functions import ClosestPoint, LineSubString
-from georiviere.river.models import Stream
-from georiviere.main.models import DistanceToSource
-
-
-def annotate_distance_to_source(streams, instance):
-    if streams:
-        streams = streams.annotate(
-            locate_source=LineLocatePoint(F('geom'), F('source_location')),
-            locate_object=LineLocatePoint(F('geom'), ClosestPoint(F('geom'), instance.geom)),
-            locate=Length(LineSubString(F('geom'),
-                                        Case(
-                                            When(locate_source__gte=F('locate_object'), then=F('locate_object')),
-                                            default=F('locate_source')),
-                                        Case(
-                                            When(locate_source__gte=F('locate_object'), then=F('locate_source')),
-                                            default=F('locate_object')))) + Distance(
-                instance.geom,
-                F('geom'),
-                output_field=FloatField()) + Distance(
-                F('geom'),
-                F('source_location'),
-                output_field=FloatField())
-        )
-    return streams
+
+from django.db.models import Q
+
+from georiviere.main.managers import (get_area_membership_models, get_proximity_geom_field, get_proximity_relations,
+                                      refresh_spatial_relations)
+from georiviere.main.models import (CityMembership, DistanceToSource, DistanceToSourceJob, DistrictMembership,
+                                    Proximity, WatershedMembership)
 
 
 def save_objects_generate_distance_to_source(sender, instance, **kwargs):
-    if not hasattr(instance, 'get_topology'):
-        streams = annotate_distance_to_source(instance.streams, instance)
-        for stream in streams:
-            DistanceToSource.objects.update_or_create(
-                object_id=instance.pk,
-                content_type=ContentType.objects.get_for_model(instance._meta.model),
-                stream=stream,
-                defaults={"distance": stream.locate.m}
-            )
-        if not kwargs.get('created'):
-            DistanceToSource.objects.filter(object_id=instance.pk,
-                                            content_type=ContentType.objects.get_for_model(instance._meta.model),
-                                            ).exclude(stream__in=streams).delete()
-
-    elif hasattr(instance, 'topology'):
-        stream = annotate_distance_to_source(Stream.objects.all(), instance).get(pk=instance.topology.stream_id)
-        DistanceToSource.objects.update_or_create(
-            object_id=instance.pk,
-            content_type=ContentType.objects.get_for_model(instance._meta.model),
-            stream=stream,
-            defaults={"distance": stream.locate.m}
-        )
+    if settings.DISTANCE_TO_SOURCE_SYNCHRONOUS:
+        DistanceToSource.objects.refresh_for_objects(sender, [instance.pk])
+    else:
+        DistanceToSourceJob.objects.enqueue(instance)
 
 
 def delete_objects_remove_distance_to_source(sender, instance, **kwargs):
     content_type = ContentType.objects.get_for_model(instance._meta.model)
     DistanceToSource.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+    DistanceToSourceJob.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+
+def get_spatial_relation_models():
+    """Returns models whose memberships in areas or proximities are stored"""
+    models = set(get_area_membership_models())
+    for source, target in get_proximity_relations():
+        models.update((source, target))
+    return models
+
+
+# Geometry of an instance was not loaded (deferred field)
+NOT_LOADED = object()
+
+
+def init_objects_keep_geom(sender, instance, **kwargs):
+    # Stored geometry as loaded, spatial relations are refreshed only if it changes
+    instance._loaded_geom = instance.__dict__.get(get_proximity_geom_field(sender).attname, NOT_LOADED)
+
+
+def save_objects_refresh_spatial_relations(sender, instance, created=False, **kwargs):
+    geom = instance.__dict__.get(get_proximity_geom_field(sender).attname, NOT_LOADED)
+    loaded_geom = getattr(instance, '_loaded_geom', NOT_LOADED)
+    instance._loaded_geom = geom
+    if not created and geom is not NOT_LOADED and loaded_geom is not NOT_LOADED and geom == loaded_geom:
+        return
+    refresh_spatial_relations(sender, [instance.pk])
+    if sender == apps.get_model('river', 'Stream'):
+        # Geometries of status and morphologies follow their stream (database triggers)
+        refresh_stream_topologies_spatial_relations([instance.pk])
+
+
+def refresh_stream_topologies_spatial_relations(stream_pks):
+    for model in get_spatial_relation_models():
+        if hasattr(model, 'get_topology'):
+            refresh_spatial_relations(model, model.objects.filter(topology__stream_id__in=stream_pks)
+                                      .values_list('pk', flat=True))
+
+
+def delete_objects_remove_spatial_relations(sender, instance, **kwargs):
+    content_type = ContentType.objects.get_for_model(instance._meta.model)
+    for model in (WatershedMembership, CityMembership, DistrictMembership):
+        model.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+    Proximity.objects.filter(Q(source_content_type=content_type, source_id=instance.pk)
+                             | Q(target_content_type=content_type, target_id=instance.pk)).delete()
+
+
+def save_area_refresh_memberships(sender, instance, **kwargs):
+    membership_model = {
+        'watershed.watershed': WatershedMembership,
+        'zoning.city': CityMembership,
+        'zoning.district': DistrictMembership,
+    }[sender._meta.label_lower]
+    membership_model.objects.refresh_for_areas([instance.pk])
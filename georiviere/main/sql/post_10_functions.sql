@@ -1,16 +1,72 @@
+CREATE FUNCTION drape_objects(relation regclass, ids integer[]) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    -- Compute altimetry of many objects of an altimetry table in one statement
+    EXECUTE format('
+        UPDATE %1$s t
+        SET geom_3d = (e.infos).draped,
+            length = ST_3DLength((e.infos).draped),
+            slope = (e.infos).slope,
+            min_elevation = (e.infos).min_elevation,
+            max_elevation = (e.infos).max_elevation,
+            ascent = (e.infos).positive_gain,
+            descent = (e.infos).negative_gain
+        FROM (SELECT id, ft_elevation_infos(geom, {{ ALTIMETRIC_PROFILE_STEP }}) AS infos
+              FROM %1$s WHERE id = ANY($1)) e
+        WHERE t.id = e.id', relation) USING ids;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE FUNCTION elevation() RETURNS trigger SECURITY DEFINER AS $$
 DECLARE
-    elevation elevation_infos;
+    ids integer[];
 BEGIN
-    SELECT * FROM ft_elevation_infos(NEW.geom, {{ ALTIMETRIC_PROFILE_STEP }}) INTO elevation;
-    -- Update path geometry
-    NEW.geom_3d := elevation.draped;
-    NEW.length := ST_3DLength(elevation.draped);
-    NEW.slope := elevation.slope;
-    NEW.min_elevation := elevation.min_elevation;
-    NEW.max_elevation := elevation.max_elevation;
-    NEW.ascent := elevation.positive_gain;
-    NEW.descent := elevation.negative_gain;
+    -- Altimetry is sliced from already draped geometries, see slice_topologies()
+    IF current_setting('georiviere.sliced_altimetry', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    -- Statement level trigger, new_rows (and old_rows on update) are transition tables.
+    -- Transition tables cannot be used with a column list (UPDATE OF geom): the trigger fires on every update,
+    -- and returns below without draping when no geometry changed.
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(n.id) FROM new_rows n INTO ids;
+    ELSE
+        SELECT array_agg(n.id) FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.geom IS DISTINCT FROM o.geom INTO ids;
+    END IF;
+    -- Nothing to drape, it also stops the recursion of updates made below
+    IF ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+    -- Draping is deferred during mass imports, see refresh_altimetry command
+    IF current_setting('georiviere.defer_altimetry', true) = 'on' THEN
+        IF TG_OP = 'UPDATE' THEN
+            EXECUTE format('UPDATE %s SET geom_3d = NULL WHERE id = ANY($1)', TG_RELID::regclass) USING ids;
+        END IF;
+        RETURN NULL;
+    END IF;
+    PERFORM drape_objects(TG_RELID::regclass, ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION simplify_geom() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    -- Geometries of portal maps, simplified for each zoom band of API_SIMPLIFY_ZOOM_BANDS
+    NEW.geom_simplified_low := ST_Transform(ST_SimplifyPreserveTopology(NEW.geom, {{ API_SIMPLIFY_ZOOM_BANDS.0.1 }}), {{ API_SRID }});
+    NEW.geom_simplified_medium := ST_Transform(ST_SimplifyPreserveTopology(NEW.geom, {{ API_SIMPLIFY_ZOOM_BANDS.1.1 }}), {{ API_SRID }});
+    NEW.geom_simplified_high := ST_Transform(ST_SimplifyPreserveTopology(NEW.geom, {{ API_SIMPLIFY_ZOOM_BANDS.2.1 }}), {{ API_SRID }});
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
+
+CREATE FUNCTION simplify_objects(relation regclass, ids integer[]) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    -- Simplify again geometries of many objects in one statement, e.g. after a change of API_SIMPLIFY_ZOOM_BANDS
+    EXECUTE format('
+        UPDATE %s
+        SET geom_simplified_low = ST_Transform(ST_SimplifyPreserveTopology(geom, {{ API_SIMPLIFY_ZOOM_BANDS.0.1 }}), {{ API_SRID }}),
+            geom_simplified_medium = ST_Transform(ST_SimplifyPreserveTopology(geom, {{ API_SIMPLIFY_ZOOM_BANDS.1.1 }}), {{ API_SRID }}),
+            geom_simplified_high = ST_Transform(ST_SimplifyPreserveTopology(geom, {{ API_SIMPLIFY_ZOOM_BANDS.2.1 }}), {{ API_SRID }})
+        WHERE id = ANY($1)', relation) USING ids;
+END;
+$$ LANGUAGE plpgsql;
@@ -1 +1,4 @@
-DROP FUNCTION IF EXISTS elevation() CASCADE;
\ No newline at end of file
+DROP FUNCTION IF EXISTS elevation() CASCADE;
+DROP FUNCTION IF EXISTS drape_objects(regclass, integer[]) CASCADE;
+DROP FUNCTION IF EXISTS simplify_geom() CASCADE;
+DROP FUNCTION IF EXISTS simplify_objects(regclass, integer[]) CASCADE;
@@ -1,6 +1,9 @@
 from django import template
+from django.contrib.contenttypes.models import ContentType
 from mapentity.helpers import alphabet_enumeration
 
+from georiviere.main.models import DistanceToSource
+
 register = template.Library()
 
 
@@ -23,18 +26,19 @@ def valuelist_source(items, stream, field=None, enumeration=False):
         if hasattr(oneitem, '_meta'):
             modelname = oneitem._meta.object_name.lower()
 
+    # Distances of all items in one query
+    distances_to_source = stream.distances_to_source(items) if items else []
     valuelist = []
     for i, item in enumerate(items):
         if field:
             text = getattr(item, '%s_display' % field, getattr(item, field))
         else:
             text = item
-        distance_to_source = stream.distance_to_source(item)
         valuelist.append({
             'enumeration': letters[i] if enumeration else False,
             'pk': getattr(items[i], 'pk', None),
             'text': text,
-            'distance_to_source': distance_to_source,
+            'distance_to_source': distances_to_source[i],
         })
 
     return {
@@ -48,13 +52,15 @@ def valuelist_streams(streams, element):
     """
     Template tag to show a list of stream with object distance to source in detail pages.
     """
+    # Distances from all streams in one query
+    distances = DistanceToSource.objects.get_distances(streams, [element])
+    content_type = ContentType.objects.get_for_model(element)
     valuelist = []
     for stream in streams:
-        distance_to_source = stream.distance_to_source(element)
         valuelist.append({
             'pk': stream.pk,
             'text': stream.name_display,
-            'distance_to_source': distance_to_source,
+            'distance_to_source': distances.get((stream.pk, content_type.pk, element.pk)),
         })
 
     return {
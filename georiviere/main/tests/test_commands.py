@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.gis.geos import LineString
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from georiviere.altimetry import deferred_altimetry
+from georiviere.river.models import Stream
+from georiviere.river.tests.factories import StreamFactory
+
+
+class RefreshAltimetryTest(TestCase):
+    def test_deferred_altimetry(self):
+        with deferred_altimetry():
+            stream = StreamFactory.create(geom=LineString((0, 0), (0, 1000)))
+        self.assertIsNone(stream.geom_3d)
+        call_command('refresh_altimetry', 'river.Stream', stdout=StringIO())
+        stream.refresh_from_db()
+        self.assertIsNotNone(stream.geom_3d)
+        self.assertAlmostEqual(stream.length, 1000)
+
+    def test_deferred_altimetry_update(self):
+        stream = StreamFactory.create(geom=LineString((0, 0), (0, 1000)))
+        with deferred_altimetry():
+            Stream.objects.filter(pk=stream.pk).update(geom=LineString((0, 0), (0, 2000)))
+        stream.refresh_from_db()
+        self.assertIsNone(stream.geom_3d)
+        call_command('refresh_altimetry', stdout=StringIO())
+        stream.refresh_from_db()
+        self.assertAlmostEqual(stream.length, 2000)
+
+    def test_update_without_geom_change_is_not_draped(self):
+        stream = StreamFactory.create(geom=LineString((0, 0), (0, 1000)))
+        with deferred_altimetry():
+            Stream.objects.filter(pk=stream.pk).update(geom=LineString((0, 0), (0, 2000)))
+        Stream.objects.filter(pk=stream.pk).update(name="Renamed")
+        stream.refresh_from_db()
+        self.assertIsNone(stream.geom_3d)
+
+    def test_bulk_update_is_draped(self):
+        streams = StreamFactory.create_batch(3, geom=LineString((0, 0), (0, 1000)))
+        Stream.objects.filter(pk__in=[stream.pk for stream in streams]).update(geom=LineString((0, 0), (0, 3000)))
+        for stream in streams:
+            stream.refresh_from_db()
+            self.assertAlmostEqual(stream.length, 3000)
+
+    def test_unknown_model(self):
+        with self.assertRaisesRegex(CommandError, "Unknown model"):
+            call_command('refresh_altimetry', 'river.Unknown', stdout=StringIO())
+        with self.assertRaisesRegex(CommandError, "has no altimetry"):
+            call_command('refresh_altimetry', 'main.DataSource', stdout=StringIO())
+
+
+class RefreshSimplifiedGeomsTest(TestCase):
+    def test_refresh_simplified_geoms(self):
+        stream = StreamFactory.create(geom=LineString((0, 0), (0, 1000)))
+        Stream.objects.filter(pk=stream.pk).update(geom_simplified_low=None, geom_simplified_medium=None,
+                                                   geom_simplified_high=None)
+        call_command('refresh_simplified_geoms', stdout=StringIO())
+        stream.refresh_from_db()
+        for field in Stream.simplified_geom_fields:
+            self.assertIsNotNone(getattr(stream, field))
+
+    def test_unknown_model(self):
+        with self.assertRaisesRegex(CommandError, "Unknown model"):
+            call_command('refresh_simplified_geoms', 'river.Unknown', stdout=StringIO())
+        with self.assertRaisesRegex(CommandError, "has no simplified geometries"):
+            call_command('refresh_simplified_geoms', 'main.DataSource', stdout=StringIO())
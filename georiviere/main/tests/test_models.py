@@ -1,7 +1,21 @@
-from django.test import TestCase
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.contrib.gis.geos import LineString, MultiPolygon, Point, Polygon
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from geotrek.authent.tests.factories import StructureFactory, UserFactory
 
+from georiviere.description.tests.factories import UsageFactory
+from georiviere.main.managers import get_map_image_path
+from georiviere.main.models import DistanceToSourceJob, MapImage, Proximity, WatershedMembership
+from georiviere.observations.models import Station
+from georiviere.observations.tests.factories import StationFactory
+from georiviere.river.models import Stream
+from georiviere.river.tests.factories import StreamFactory
 from georiviere.valorization.tests.factories import POIFactory
+from georiviere.watershed.tests.factories import WatershedFactory
 from .factories import AttachmentFactory, DataSourceFactory
 
 
@@ -28,3 +42,194 @@ class AttachmentTest(TestCase):
 
         attachment_without_creator = AttachmentFactory(content_object=poi, creator=None)
         self.assertNotIn('attached', str(attachment_without_creator))
+
+
+@override_settings(DISTANCE_TO_SOURCE_SYNCHRONOUS=False)
+class DistanceToSourceJobTest(TestCase):
+    """Test distances to source computed by the queue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((10000, 10000), (50000, 50000)))
+
+    def test_edits_are_queued_once(self):
+        usage = UsageFactory.create(geom=Point(10000, 10020))
+        usage.save()
+        self.assertEqual(DistanceToSourceJob.objects.count(), 1)
+        self.assertIsNone(self.stream.distance_to_source(usage))
+
+    def test_process_queue(self):
+        usage = UsageFactory.create(geom=Point(10000, 10020))
+        call_command('process_distance_to_source', verbosity=0)
+        self.assertEqual(DistanceToSourceJob.objects.count(), 0)
+        self.assertAlmostEqual(self.stream.distance_to_source(usage), 28.2842712)
+
+    def test_process_queue_object_moved(self):
+        usage = UsageFactory.create(geom=Point(10000, 10020))
+        call_command('process_distance_to_source', verbosity=0)
+        usage.geom = Point(90000, 10020)
+        usage.save()
+        call_command('process_distance_to_source', verbosity=0)
+        self.assertIsNone(self.stream.distance_to_source(usage))
+
+    def test_delete_object_removes_job(self):
+        usage = UsageFactory.create(geom=Point(10000, 10020))
+        usage.delete()
+        self.assertEqual(DistanceToSourceJob.objects.count(), 0)
+
+
+class AreaMembershipTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.watershed = WatershedFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 1000, 1000))))
+        cls.stream = StreamFactory.create(geom=LineString((100, 100), (500, 500)))
+
+    def test_object_saved(self):
+        self.assertListEqual(list(self.stream.watersheds), [self.watershed])
+        status = self.stream.topologies.first().status
+        self.assertListEqual(list(status.watersheds), [self.watershed])
+        self.stream.geom = LineString((2000, 2000), (3000, 3000))
+        self.stream.save()
+        self.assertListEqual(list(self.stream.watersheds), [])
+        status.refresh_from_db()
+        self.assertListEqual(list(status.watersheds), [])
+
+    def test_object_saved_without_geom_change(self):
+        stream = Stream.objects.get(pk=self.stream.pk)
+        with mock.patch('georiviere.main.signals.refresh_spatial_relations') as mocked:
+            stream.name = "Renamed"
+            stream.save()
+            mocked.assert_not_called()
+            stream.geom = LineString((2000, 2000), (3000, 3000))
+            stream.save()
+            mocked.assert_any_call(Stream, [stream.pk])
+
+    def test_area_saved(self):
+        self.watershed.geom = MultiPolygon(Polygon.from_bbox((2000, 2000, 3000, 3000)))
+        self.watershed.save()
+        self.assertListEqual(list(self.stream.watersheds), [])
+        watershed = WatershedFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 200, 200))))
+        self.assertListEqual(list(self.stream.watersheds), [watershed])
+
+    def test_object_deleted(self):
+        content_type = ContentType.objects.get_for_model(Stream)
+        self.assertTrue(WatershedMembership.objects.filter(content_type=content_type, object_id=self.stream.pk).exists())
+        self.stream.delete()
+        self.assertFalse(WatershedMembership.objects.filter(content_type=content_type, object_id=self.stream.pk).exists())
+
+    def test_rebuild(self):
+        WatershedMembership.objects.all().delete()
+        call_command('update_area_memberships', verbosity=0)
+        self.assertListEqual(list(self.stream.watersheds), [self.watershed])
+
+
+def fake_capture(instance, rooturl, properties=()):
+    open(get_map_image_path(instance, properties), 'wb').close()
+
+
+@override_settings(MAP_IMAGE_SYNCHRONOUS=False, MEDIA_ROOT=TemporaryDirectory().name)
+@mock.patch('georiviere.main.managers.capture_map_image', side_effect=fake_capture)
+class MapImageTest(TestCase):
+    """Test map images captured by the queue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((10000, 10000), (50000, 50000)))
+
+    def test_image_is_queued_until_captured(self, mocked_capture):
+        self.assertIsNone(MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages']))
+        self.assertIsNone(MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages']))
+        self.assertEqual(MapImage.objects.filter(date_queued__isnull=False).count(), 1)
+        mocked_capture.assert_not_called()
+
+        call_command('process_map_images', verbosity=0)
+        mocked_capture.assert_called_once_with(self.stream, 'http://testserver/', ['usages'])
+        path = MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        self.assertEqual(path, self.stream.get_map_image_path_with_other_objects(['usages']))
+        self.assertFalse(MapImage.objects.filter(date_queued__isnull=False).exists())
+
+    def test_image_is_captured_again_when_objects_change(self, mocked_capture):
+        MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        call_command('process_map_images', verbosity=0)
+        UsageFactory.create(geom=Point(10000, 10020))
+        # Last captured image is used while a new one is captured
+        self.assertIsNotNone(MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages']))
+        self.assertTrue(MapImage.objects.filter(date_queued__isnull=False).exists())
+        call_command('process_map_images', verbosity=0)
+        self.assertEqual(mocked_capture.call_count, 2)
+
+    def test_capture_failure(self, mocked_capture):
+        mocked_capture.side_effect = Exception("Screamshotter is down")
+        MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        with self.assertLogs('georiviere.main.managers', level='ERROR'):
+            call_command('process_map_images', verbosity=0)
+        self.assertEqual(MapImage.objects.get().version, '')
+        self.assertFalse(MapImage.objects.filter(date_queued__isnull=False).exists())
+
+    def test_capture_interrupted(self, mocked_capture):
+        mocked_capture.side_effect = KeyboardInterrupt
+        MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        with self.assertRaises(KeyboardInterrupt):
+            call_command('process_map_images', verbosity=0)
+        # Version is not recorded, image is queued again when asked
+        self.assertEqual(MapImage.objects.get().version, '')
+        MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        self.assertTrue(MapImage.objects.filter(date_queued__isnull=False).exists())
+
+    def test_deleted_object(self, mocked_capture):
+        MapImage.objects.get_path(self.stream, 'http://testserver/', ['usages'])
+        Stream.objects.filter(pk=self.stream.pk).delete()
+        call_command('process_map_images', verbosity=0)
+        self.assertFalse(MapImage.objects.exists())
+        mocked_capture.assert_not_called()
+
+
+class ProximityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((100, 100), (500, 500)))
+        cls.station_near = StationFactory.create(geom=Point(300, 400))
+        cls.station_far = StationFactory.create(geom=Point(5000, 5000))
+
+    def test_within_buffer_stored(self):
+        ContentType.objects.get_for_model(Station)
+        ContentType.objects.get_for_model(Stream)
+        with self.assertNumQueries(1):
+            self.assertListEqual(list(self.stream.stations), [self.station_near])
+        self.assertListEqual(list(self.station_near.streams), [self.stream])
+        self.assertListEqual(list(self.station_far.streams), [])
+
+    def test_within_buffer_unsaved(self):
+        stream = Stream(geom=LineString((4900, 4900), (5100, 5100)))
+        self.assertListEqual(list(Station.within_buffer(stream)), [self.station_far])
+
+    def test_object_saved(self):
+        self.station_far.geom = Point(500, 600)
+        self.station_far.save()
+        self.assertSetEqual(set(self.stream.stations), {self.station_near, self.station_far})
+        self.stream.geom = LineString((4000, 4000), (4500, 4500))
+        self.stream.save()
+        self.assertListEqual(list(self.stream.stations), [])
+        self.assertListEqual(list(self.station_near.streams), [])
+
+    def test_object_saved_without_geom_change(self):
+        station = Station.objects.get(pk=self.station_near.pk)
+        with mock.patch.object(Proximity.objects, 'refresh_for_objects') as mocked:
+            station.label = "Renamed"
+            station.save()
+            mocked.assert_not_called()
+            station.geom = Point(500, 600)
+            station.save()
+            mocked.assert_called_once_with(Station, [station.pk])
+
+    def test_object_deleted(self):
+        content_type = ContentType.objects.get_for_model(Station)
+        self.assertTrue(Proximity.objects.filter(target_content_type=content_type, target_id=self.station_near.pk).exists())
+        self.station_near.delete()
+        self.assertFalse(Proximity.objects.filter(target_content_type=content_type, target_id=self.station_near.pk).exists())
+        self.assertListEqual(list(self.stream.stations), [])
+
+    def test_rebuild(self):
+        Proximity.objects.all().delete()
+        call_command('update_proximities', verbosity=0)
+        self.assertListEqual(list(self.stream.stations), [self.station_near])
@@ -1,8 +1,11 @@
 from unittest import mock
+from django.contrib.contenttypes.models import ContentType
 from django.template import Template, Context
 from django.test import TestCase
 from django.utils import translation
 
+from georiviere.main.models import DistanceToSource
+from georiviere.observations.tests.factories import StationFactory
 from georiviere.river.tests.factories import StreamFactory
 from georiviere.knowledge.tests.factories import KnowledgeFactory
 
@@ -25,9 +28,9 @@ class ValueListTest(TestCase):
         }))
         self.assertHTMLEqual(out.strip(), '<span class="none">None</span>')
 
-    @mock.patch('georiviere.river.models.Stream.distance_to_source')
-    def test_obj_list_with_distance_to_source_related_to_stream(self, mock_distance_to_source):
-        mock_distance_to_source.return_value = 42.63
+    @mock.patch('georiviere.river.models.Stream.distances_to_source')
+    def test_obj_list_with_distance_to_source_related_to_stream(self, mock_distances_to_source):
+        mock_distances_to_source.return_value = [42.63]
         out = Template(
             '{% load georiviere_tags %}'
             '{% valuelist_source items stream %}'
@@ -40,9 +43,9 @@ class ValueListTest(TestCase):
         (42.6&nbsp;m)</li>
         </ul>""")
 
-    @mock.patch('georiviere.river.models.Stream.distance_to_source')
-    def test_obj_list_with_distance_to_source_related_to_stream_with_field(self, mock_distance_to_source):
-        mock_distance_to_source.return_value = 42.63
+    @mock.patch('georiviere.river.models.Stream.distances_to_source')
+    def test_obj_list_with_distance_to_source_related_to_stream_with_field(self, mock_distances_to_source):
+        mock_distances_to_source.return_value = [42.63]
         out = Template(
             '{% load georiviere_tags %}'
             '{% valuelist_source items stream "name" %}'
@@ -57,9 +60,11 @@ class ValueListTest(TestCase):
         (42.6&nbsp;m)</li>
         </ul>""")
 
-    @mock.patch('georiviere.river.models.Stream.distance_to_source')
-    def test_stream_list_with_distance_to_source_related_to_object(self, mock_distance_to_source):
-        mock_distance_to_source.return_value = 42.63
+    def test_stream_list_with_distance_to_source_related_to_object(self):
+        DistanceToSource.objects.update_or_create(
+            stream=self.stream, content_type=ContentType.objects.get_for_model(self.knowledge),
+            object_id=self.knowledge.pk, defaults={'distance': 42.63}
+        )
         out = Template(
             '{% load georiviere_tags %}'
             '{% valuelist_streams streams object %}'
@@ -73,3 +78,16 @@ class ValueListTest(TestCase):
         {self.stream.name}</a>
         (42.6&nbsp;m)</li>
         </ul>""")
+
+    def test_obj_list_distances_to_source_in_one_query(self):
+        stream = StreamFactory.create()
+        items = KnowledgeFactory.create_batch(5) + StationFactory.create_batch(5)
+        for i, item in enumerate(items):
+            DistanceToSource.objects.update_or_create(
+                stream=stream, content_type=ContentType.objects.get_for_model(item),
+                object_id=item.pk, defaults={'distance': i * 10}
+            )
+        template = Template('{% load georiviere_tags %}{% valuelist_source items stream %}')
+        with self.assertNumQueries(1):
+            out = template.render(Context({'stream': stream, 'items': items}))
+        self.assertIn('(90&nbsp;m)', out)
@@ -77,11 +77,9 @@ class Intervention(TimeStampedModelMixin, WatershedPropertiesMixin, ZoningProper
 
     @classmethod
     def within_buffer_without_knowledge(cls, topology):
-        area = topology.geom.buffer(settings.BASE_INTERSECTION_MARGIN)
         from georiviere.description.models import Knowledge
         target_type = Knowledge.get_content_type_id()
-        qs = cls.objects.filter(_geom__intersects=area).exclude(target_type=target_type)
-        return qs
+        return cls.within_buffer(topology).exclude(target_type=target_type)
 
     @property
     def name_display(self):
@@ -1,31 +1,107 @@
 import json
-import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
 
+import requests
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from georiviere.main.managers import refresh_spatial_relations
+from georiviere.main.models import DistanceToSource, DistanceToSourceJob
+from georiviere.observations.models import (Parameter, ParameterTracking, Station, StationImport, StationProfile,
+                                            StationSync, Unit)
+from georiviere.portal.cache import invalidate_data_version
+
+# Parameter tracked by a station, from a measure of Hub'Eau API.
+# `unit` and `parameter` are dicts of fields with their `code` (or None), `tracking` the fields of a new tracking,
+# `date` the date of the measure (or None).
+Measure = namedtuple('Measure', ['unit', 'parameter', 'tracking', 'date'])
+
+
+def get_content_hash(station):
+    """Returns hash of a station payload, to find changes between imports"""
+    return md5(json.dumps(station, sort_keys=True).encode()).hexdigest()
+
+
+def get_hubeau_session(concurrency, retries, backoff_factor):
+    """Returns a session keeping connections open for concurrent requests,
+    retried with exponential backoff when Hub'Eau throttles (429) or is unavailable"""
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']), raise_on_status=False)
+    adapter = HTTPAdapter(pool_maxsize=concurrency, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 
 class BaseImportCommand(BaseCommand):
     help = "Import whatever stations from Hub'Eau API"
     api_url = ""
     operations_url = "https://naiades.eaufrance.fr/acces-donnees#/physicochimie/operations"
+    station_profile_code = ""
+    timeout = 60
+    retries = 5
+    backoff_factor = 1
+    batch_size = 1000
+    # Query parameter of fetch_parameters requests to get measures since a date, if available
+    measures_since = None
 
     def add_arguments(self, parser):
         parser.add_argument('--department', nargs='+', help="Department code")
         parser.add_argument('-p', '--with-parameters', action='store_true',
                             help="Get also parameter tracked by the station")
         parser.add_argument('--size', help="Results per page")
+        parser.add_argument('--sync', '-s', action='store_true', dest='sync', default=False,
+                            help="Only write stations whose data changed since the previous import, request only new "
+                                 "measures of other stations, and remove the station profile of stations not "
+                                 "returned anymore.")
+        parser.add_argument('--concurrency', '-c', action='store', dest='concurrency', type=int, default=4,
+                            help="Number of parameters requests sent at the same time. Default is 4.")
 
-    def create_or_update_stations(self, *args, **kwargs):
-        """Create or update stations from results"""
+    def get_station_code(self, station):
+        """Returns code of a station from results"""
+        return station['code_station']
+
+    def get_station_defaults(self, station):
+        """Returns fields of a station from results"""
         raise NotImplementedError()
 
+    def fetch_parameters(self, station, since=None):
+        """Request data about parameters tracked by a station, called concurrently.
+        Only measures since a date are requested if `since` is given (see measures_since).
+        Default is no request."""
+        return None
+
+    def get_measures(self, station, data):
+        """Returns Measure list of a station from data of fetch_parameters"""
+        return []
+
+    def check_response(self, response):
+        """Raises requests.HTTPError if Hub'Eau answered with an error, once retries are exhausted"""
+        if response.status_code not in [200, 206]:
+            raise requests.HTTPError("Failed to fetch {}. Status code : {}.".format(response.url, response.status_code),
+                                     response=response)
+
+    def get_json(self, url, params=None):
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        self.check_response(response)
+        return response.json()
+
     def handle(self, *args, **options):
         """Import stations from API Hub'eau"""
         # Get args
         department = options.get('department')
-        verbosity = options.get('verbosity')
+        self.verbosity = options.get('verbosity')
         with_parameters = options.get('with_parameters')
         size = options.get('size')
+        concurrency = max(options.get('concurrency'), 1)
+        self.sync = options.get('sync')
 
         # Build query
         payload = {
@@ -37,7 +113,13 @@ class BaseImportCommand(BaseCommand):
         if department:
             payload.update({'code_departement': options['department']})
 
-        response = requests.get(self.api_url, params=payload)
+        self.unit_ids, self.parameter_ids = {}, {}
+        self.session = get_hubeau_session(concurrency, self.retries, self.backoff_factor)
+        start = timezone.now()
+        try:
+            response = self.session.get(self.api_url, params=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise CommandError("Failed to fetch {}. {}".format(self.api_url, e))
 
         if response.status_code not in [200, 206]:
             message = "Failed to fetch {}. Status code : {}.".format(
@@ -46,27 +128,233 @@ class BaseImportCommand(BaseCommand):
             )
             raise CommandError(message)
 
-        if verbosity >= 2:
+        if self.verbosity >= 2:
             self.stdout.write('Get station from API {0}'.format(response.url))
         try:
             response_content = response.json()
         except json.JSONDecodeError:
             self.stdout.write('Response is not a json')
             return
-        if verbosity >= 1:
-            self.stdout.write('Import {1} stations from API {0}'.format(response.url, response_content['count']))
-
-        # Update or create stations
-        results = response_content['data']
-        self.create_or_update_stations(results, verbosity, with_parameters)
-        while response_content['next']:
-            response = requests.get(response_content['next'])
-            if verbosity >= 2:
-                self.stdout.write('Import next page from {0}'.format(response.url))
-            try:
-                response_content = response.json()
-            except json.JSONDecodeError:
-                self.stdout.write('Response is not a json')
-                return
-            results = response_content['data']
-            self.create_or_update_stations(results, verbosity, with_parameters)
+        if 'data' not in response_content:
+            raise CommandError("Failed to fetch {}. No stations in response.".format(self.api_url))
+        if self.verbosity >= 1:
+            self.stdout.write('Import {1} stations from API {0}'.format(response.url, response_content.get('count')))
+
+        self.station_profile, station_profile_created = StationProfile.objects.get_or_create(
+            code=self.station_profile_code
+        )
+        if self.verbosity >= 2 and station_profile_created:
+            self.stdout.write('Created station profile {0}'.format(self.station_profile))
+        # Stations are compared to payloads of the previous import,
+        # measures of unchanged stations are only requested since the previous synchronisation with parameters
+        self.scope = ','.join(department or [])
+        self.known_hashes = dict(StationImport.objects.filter(station_profile=self.station_profile)
+                                 .values_list('station__code', 'content_hash')) if self.sync else {}
+        last_sync = StationSync.objects.filter(station_profile=self.station_profile, scope=self.scope).first()
+        self.since = last_sync.last_sync.date() if self.sync and with_parameters and last_sync else None
+        self.summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        self.seen_codes = set()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Update or create stations
+            self.import_stations(response_content['data'], with_parameters, executor)
+            while response_content.get('next'):
+                # Stations of previous pages are kept, the import stops without synchronisation
+                try:
+                    response = self.session.get(response_content['next'], timeout=self.timeout)
+                    self.check_response(response)
+                except requests.RequestException as e:
+                    self.stderr.write('Failed to fetch next page {0}: {1}'.format(response_content['next'], e))
+                    return
+                if self.verbosity >= 2:
+                    self.stdout.write('Import next page from {0}'.format(response.url))
+                try:
+                    response_content = response.json()
+                except json.JSONDecodeError:
+                    self.stdout.write('Response is not a json')
+                    return
+                if 'data' not in response_content:
+                    self.stderr.write('No stations in next page {0}'.format(response.url))
+                    return
+                self.import_stations(response_content['data'], with_parameters, executor)
+
+        if self.sync:
+            self.remove_stations()
+            # Measures are only complete up to now if parameters were requested
+            if with_parameters:
+                StationSync.objects.update_or_create(station_profile=self.station_profile, scope=self.scope,
+                                                     defaults={'last_sync': start})
+        if self.verbosity >= 1:
+            self.stdout.write("{created} stations created, {updated} updated, {unchanged} unchanged, "
+                              "{removed} removed".format(**self.summary))
+
+    def import_stations(self, results, with_parameters, executor):
+        """Create or update stations of a page of results, and their parameters.
+        Parameters are requested concurrently while stations are written.
+        In sync mode, unchanged stations are not written and only their new measures are requested."""
+        hashes = {self.get_station_code(station): get_content_hash(station) for station in results}
+        self.seen_codes.update(hashes)
+        changed, unchanged = [], []
+        for station in results:
+            code = self.get_station_code(station)
+            if self.sync and self.known_hashes.get(code) == hashes[code]:
+                unchanged.append(station)
+            else:
+                changed.append(station)
+        self.summary['unchanged'] += len(unchanged)
+        unchanged_parameters = unchanged if self.since and self.measures_since else []
+        if with_parameters:
+            # Whole history is requested for stations without tracked parameters yet
+            tracked = set(ParameterTracking.objects.filter(
+                station__code__in=[self.get_station_code(station) for station in unchanged_parameters]
+            ).values_list('station__code', flat=True).distinct()) if unchanged_parameters else set()
+            futures = [executor.submit(self.fetch_parameters, station) for station in changed]
+            futures += [executor.submit(self.fetch_parameters, station,
+                                        self.since if self.get_station_code(station) in tracked else None)
+                        for station in unchanged_parameters]
+        with transaction.atomic():
+            stations = self.create_or_update_stations(changed)
+            self.save_hashes(stations, hashes)
+            if with_parameters:
+                existing = Station.objects.in_bulk([self.get_station_code(station) for station in unchanged_parameters],
+                                                   field_name='code')
+                stations_parameters = stations + [existing.get(self.get_station_code(station))
+                                                  for station in unchanged_parameters]
+                measures, failed = [], []
+                for station, station_obj, future in zip(changed + unchanged_parameters, stations_parameters, futures):
+                    code = self.get_station_code(station)
+                    try:
+                        data = future.result()
+                    except json.JSONDecodeError:
+                        self.stdout.write('Response is not a json')
+                        failed.append(code)
+                        continue
+                    except requests.RequestException as e:
+                        self.stderr.write(f'Failed to fetch parameters of station {code}: {e}')
+                        failed.append(code)
+                        continue
+                    if station_obj is not None:
+                        measures.extend((station_obj, measure) for measure in self.get_measures(station, data))
+                self.create_or_update_parameters(measures)
+                # Stations whose parameters are missing are imported again at next synchronisation
+                StationImport.objects.filter(station_profile=self.station_profile, station__code__in=failed) \
+                    .update(content_hash='')
+        self.refresh_stations(sorted({station.pk for station in stations}))
+
+    def create_or_update_stations(self, results):
+        """Create or update stations from results, in bulk. Returns stations in order of results."""
+        codes = [self.get_station_code(station) for station in results]
+        existing = Station.objects.in_bulk(codes, field_name='code')
+        stations, created, updated, fields = {}, [], [], {'date_update'}
+        for code, station in zip(codes, results):
+            defaults = self.get_station_defaults(station)
+            fields.update(defaults)
+            station_obj = stations.get(code)
+            if station_obj is None:
+                station_obj = existing.get(code)
+                if station_obj is None:
+                    station_obj = Station(code=code)
+                    created.append(station_obj)
+                else:
+                    updated.append(station_obj)
+                stations[code] = station_obj
+            for field, value in defaults.items():
+                setattr(station_obj, field, value)
+
+        Station.objects.bulk_create(created, batch_size=self.batch_size)
+        now = timezone.now()
+        for station_obj in updated:
+            station_obj.date_update = now
+        Station.objects.bulk_update(updated, fields, batch_size=self.batch_size)
+        Station.station_profiles.through.objects.bulk_create([
+            Station.station_profiles.through(station_id=station_obj.pk, stationprofile_id=self.station_profile.pk)
+            for station_obj in stations.values()
+        ], batch_size=self.batch_size, ignore_conflicts=True)
+
+        self.summary['created'] += len(created)
+        self.summary['updated'] += len(updated)
+        if self.verbosity >= 2:
+            for station_obj in created:
+                self.stdout.write('Created station {0}'.format(station_obj))
+            for station_obj in updated:
+                self.stdout.write('Updated station {0}'.format(station_obj))
+        return [stations[code] for code in codes]
+
+    def save_hashes(self, stations, hashes):
+        """Keep payloads hashes of imported stations, to find changes at next synchronisation"""
+        stations = {station.pk: station for station in stations}
+        StationImport.objects.filter(station_profile=self.station_profile, station_id__in=stations).delete()
+        StationImport.objects.bulk_create([
+            StationImport(station=station, station_profile=self.station_profile, scope=self.scope,
+                          content_hash=hashes[station.code])
+            for station in stations.values()
+        ], batch_size=self.batch_size)
+
+    def remove_stations(self):
+        """Stations imported before in the same scope, and not returned anymore, lose the station profile"""
+        removed = StationImport.objects.filter(station_profile=self.station_profile, scope=self.scope) \
+            .exclude(station__code__in=self.seen_codes)
+        station_ids = list(removed.values_list('station_id', flat=True))
+        if not station_ids:
+            return
+        Station.station_profiles.through.objects.filter(stationprofile_id=self.station_profile.pk,
+                                                        station_id__in=station_ids).delete()
+        removed.delete()
+        self.summary['removed'] = len(station_ids)
+        invalidate_data_version(Station)
+        if self.verbosity >= 2:
+            for station in Station.objects.filter(pk__in=station_ids):
+                self.stdout.write('Removed station {0}'.format(station))
+
+    def create_or_update_parameters(self, measures):
+        """Create units, parameters and parameter trackings of (station, Measure) list, in bulk.
+        Dates of measures widen measure dates of trackings."""
+        units = {measure.unit['code']: measure.unit for station, measure in measures if measure.unit}
+        # Units and parameters ids are kept from one page to another
+        self.unit_ids.update(Unit.objects.filter(code__in=set(units) - set(self.unit_ids)).values_list('code', 'pk'))
+        new_units = Unit.objects.bulk_create([
+            Unit(**fields) for code, fields in units.items() if code not in self.unit_ids and 'label' in fields
+        ], batch_size=self.batch_size)
+        self.unit_ids.update((unit.code, unit.pk) for unit in new_units)
+        if self.verbosity >= 2:
+            for unit in new_units:
+                self.stdout.write('Added unit {0}'.format(unit))
+
+        parameters = {}
+        for station, measure in measures:
+            if measure.parameter:
+                parameters.setdefault(measure.parameter['code'], (measure.parameter, measure.unit))
+        self.parameter_ids.update(Parameter.objects.filter(code__in=set(parameters) - set(self.parameter_ids))
+                                  .values_list('code', 'pk'))
+        new_parameters = Parameter.objects.bulk_create([
+            Parameter(unit_id=self.unit_ids.get(unit['code']) if unit else None, **fields)
+            for code, (fields, unit) in parameters.items() if code not in self.parameter_ids
+        ], batch_size=self.batch_size)
+        self.parameter_ids.update((parameter.code, parameter.pk) for parameter in new_parameters)
+
+        # Tracking fields and measure date range by station and parameter
+        trackings = {}
+        for station, measure in measures:
+            if not measure.parameter:
+                continue
+            key = (station.pk, self.parameter_ids[measure.parameter['code']])
+            fields, start, end = trackings.get(key, (measure.tracking, measure.date, measure.date))
+            if measure.date:
+                start = min(start or measure.date, measure.date)
+                end = max(end or measure.date, measure.date)
+            trackings[key] = (fields, start, end)
+
+        for label in ParameterTracking.objects.merge(trackings, self.batch_size):
+            if self.verbosity >= 2:
+                self.stdout.write('Added parameter {0}'.format(label))
+
+    def refresh_stations(self, pks):
+        """Stations written in bulk send no signal, compute what signals would"""
+        if not pks:
+            return
+        if settings.DISTANCE_TO_SOURCE_SYNCHRONOUS:
+            DistanceToSource.objects.refresh_for_objects(Station, pks)
+        else:
+            DistanceToSourceJob.objects.enqueue_objects(Station, pks)
+        refresh_spatial_relations(Station, pks)
+        invalidate_data_version(Station)
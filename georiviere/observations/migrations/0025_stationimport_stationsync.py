@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observations', '0024_auto_20240514_0849'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationSync',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(blank=True, default='', help_text='Filters of the import', max_length=200, verbose_name='Scope')),
+                ('last_sync', models.DateTimeField(verbose_name='Last synchronisation')),
+                ('station_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='observations.stationprofile', verbose_name='Station profile')),
+            ],
+            options={
+                'verbose_name': 'Station synchronisation',
+                'verbose_name_plural': 'Station synchronisations',
+                'unique_together': {('station_profile', 'scope')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StationImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(blank=True, default='', help_text='Filters of the import', max_length=200, verbose_name='Scope')),
+                ('content_hash', models.CharField(max_length=32, verbose_name='Content hash')),
+                ('date_update', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='observations.station', verbose_name='Station')),
+                ('station_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='observations.stationprofile', verbose_name='Station profile')),
+            ],
+            options={
+                'verbose_name': 'Station import',
+                'verbose_name_plural': 'Station imports',
+                'unique_together': {('station', 'station_profile')},
+            },
+        ),
+    ]
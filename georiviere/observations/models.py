@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.gis.db import models
+from django.db import connection
 from django.utils.translation import gettext_lazy as _
 
 from mapentity.models import MapEntityMixin
@@ -22,6 +23,44 @@ class ParameterManager(models.Manager):
         return super().get_queryset().select_related('unit')
 
 
+class ParameterTrackingManager(models.Manager):
+    def merge(self, trackings, batch_size=1000):
+        """
+        Create or update trackings from {(station_id, parameter_id): (fields, start date, end date)}, one statement
+        by batch. Dates of existing trackings are widened (GREATEST / LEAST), fields are only set on new trackings.
+        Returns new trackings labels.
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        rows = [(station_id, parameter_id, fields.get('label', ""), fields.get('data_availability'), start, end)
+                for (station_id, parameter_id), (fields, start, end) in trackings.items()]
+        created = []
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    WITH v (station_id, parameter_id, label, data_availability, start_date, end_date) AS (
+                        VALUES {', '.join(['(%s::integer, %s::integer, %s::varchar, %s::integer, %s::date, %s::date)'] * len(batch))}
+                    ),
+                    updated AS (
+                        UPDATE {table} t
+                        SET measure_start_date = LEAST(t.measure_start_date, v.start_date),
+                            measure_end_date = GREATEST(t.measure_end_date, v.end_date)
+                        FROM v
+                        WHERE t.station_id = v.station_id AND t.parameter_id = v.parameter_id
+                        RETURNING t.station_id, t.parameter_id
+                    )
+                    INSERT INTO {table} (station_id, parameter_id, label, measure_frequency, transmission_frequency,
+                                         data_availability, measure_start_date, measure_end_date)
+                    SELECT v.station_id, v.parameter_id, v.label, '', '', v.data_availability, v.start_date, v.end_date
+                    FROM v
+                    WHERE NOT EXISTS (SELECT 1 FROM updated u
+                                      WHERE u.station_id = v.station_id AND u.parameter_id = v.parameter_id)
+                    RETURNING label
+                """, [value for row in batch for value in row])
+                created.extend(row[0] for row in cursor.fetchall())
+        return created
+
+
 class StationProfile(StructureOrNoneRelated):
     """Station profile
     ex : Physico-chemical station, Hydrometric station…
@@ -224,6 +263,8 @@ class ParameterTracking(StructureOrNoneRelated):
     measure_start_date = models.DateField(verbose_name=_("Measure start date"), blank=True, null=True)
     measure_end_date = models.DateField(verbose_name=_("Measure end date"), blank=True, null=True)
 
+    objects = ParameterTrackingManager()
+
     def __str__(self):
         return self.label
 
@@ -235,3 +276,31 @@ class ParameterTracking(StructureOrNoneRelated):
     @property
     def data_availability_display(self):
         return self.get_data_availability_display()
+
+
+class StationImport(models.Model):
+    """Station payload last imported from Hub'Eau for a station profile, used to import only changes"""
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='imports', verbose_name=_("Station"))
+    station_profile = models.ForeignKey(StationProfile, on_delete=models.CASCADE, verbose_name=_("Station profile"))
+    scope = models.CharField(max_length=200, blank=True, default="", verbose_name=_("Scope"),
+                             help_text=_("Filters of the import"))
+    content_hash = models.CharField(max_length=32, verbose_name=_("Content hash"))
+    date_update = models.DateTimeField(auto_now=True, verbose_name=_("Update date"))
+
+    class Meta:
+        verbose_name = _("Station import")
+        verbose_name_plural = _("Station imports")
+        unique_together = ('station', 'station_profile')
+
+
+class StationSync(models.Model):
+    """High-water mark of synchronisations of a station profile from Hub'Eau"""
+    station_profile = models.ForeignKey(StationProfile, on_delete=models.CASCADE, verbose_name=_("Station profile"))
+    scope = models.CharField(max_length=200, blank=True, default="", verbose_name=_("Scope"),
+                             help_text=_("Filters of the import"))
+    last_sync = models.DateTimeField(verbose_name=_("Last synchronisation"))
+
+    class Meta:
+        verbose_name = _("Station synchronisation")
+        verbose_name_plural = _("Station synchronisations")
+        unique_together = ('station_profile', 'scope')
@@ -1,14 +1,22 @@
 import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import StringIO
 from unittest import mock
+from urllib.parse import urlparse, parse_qs
 
 import requests
 from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from georiviere.observations.models import Station, StationProfile, Unit, ParameterTracking
+from georiviere.observations.management.commands import import_pcquality_stations
+from georiviere.observations.models import Station, StationImport, StationProfile, StationSync, Unit, ParameterTracking
+from georiviere.observations.tests.factories import StationFactory
 
 TEST_DATA_PATH = settings.PROJECT_DIR / 'observations' / 'tests' / 'data'
 
@@ -153,7 +161,7 @@ class ImportReferentielTest(TestCase):
         self.assertIn('Created unit mg(Cl2)/L', out.getvalue())
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response_error_initial_url)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response_error_initial_url)
 class ImportStationErrorTest(TestCase):
     """Test import_station command
     Test datas are from LABERGEMENT-STE-MARIE
@@ -224,7 +232,7 @@ class ImportStationErrorTest(TestCase):
         self.assertEqual(stations.count(), 1)
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
 class ImportStationTest(TestCase):
     """Test import_station command
     Test datas are from LABERGEMENT-STE-MARIE
@@ -297,7 +305,7 @@ class ImportStationTest(TestCase):
         self.assertEqual(station.station_uri, "http://id.eaufrance.fr/STQ/06017200")
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
 class ImportStationVerboseTest(TestCase):
     """Test import_station command with verbosity
     Test datas are from LABERGEMENT-STE-MARIE
@@ -312,7 +320,7 @@ class ImportStationVerboseTest(TestCase):
         self.assertIn('Import 2 stations from API', out.getvalue())
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response_500)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response_500)
 class ImportStationServerDownTest(TestCase):
     """Test import_station command with verbosity
     Test datas are from LABERGEMENT-STE-MARIE
@@ -326,7 +334,7 @@ class ImportStationServerDownTest(TestCase):
             call_command('import_temperature_stations', verbosity=2, stdout=out)
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
 class ImportStationAllRedoTest(TestCase):
     """Test import_station command
     Test datas are from LABERGEMENT-STE-MARIE
@@ -413,7 +421,7 @@ class ImportStationAllRedoTest(TestCase):
         self.assertIn('Updated station VIREMONT A VALZIN-EN-PETITE-MONTAGNE 1 (06000874)', out.getvalue())
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
 class ImportStationWithParametersTest(TestCase):
     """Test import_station command with parameters
     Test datas are from LABERGEMENT-STE-MARIE
@@ -471,6 +479,24 @@ class ImportStationWithParametersTest(TestCase):
         # Check output
         self.assertIn("Added parameter Potentiel en Hydrogène (pH)", out.getvalue())
 
+    def test_import_pcquality_stations_with_parameters_merge_dates(self, mock_get):
+        """Test dates of existing parameters tracked are only widened"""
+        call_command('import_pcquality_stations', with_parameters=True, stdout=StringIO())
+        ph_parameter_tracked = ParameterTracking.objects.get(station__code="05134550",
+                                                             parameter__label='Potentiel en Hydrogène (pH)')
+        ph_parameter_tracked.label = "pH"
+        ph_parameter_tracked.measure_start_date = date(2000, 1, 1)
+        ph_parameter_tracked.measure_end_date = date(2015, 1, 1)
+        ph_parameter_tracked.save()
+
+        call_command('import_pcquality_stations', with_parameters=True, stdout=StringIO())
+
+        ph_parameter_tracked.refresh_from_db()
+        self.assertEqual(ph_parameter_tracked.label, "pH")
+        self.assertEqual(ph_parameter_tracked.measure_start_date, date(2000, 1, 1))
+        self.assertEqual(ph_parameter_tracked.measure_end_date, date(2020, 11, 17))
+        self.assertEqual(ParameterTracking.objects.filter(station__code="05134550").count(), 16)
+
     def test_import_pcquality_stations_with_parameters_fail(self, mock_get):
         """Test import PC Quality stations with parameters which fail
         """
@@ -542,7 +568,7 @@ class ImportStationWithParametersTest(TestCase):
         self.assertEqual(parameters_tracked.count(), 0)
 
 
-@mock.patch.object(requests, 'get', side_effect=requests_get_mock_response)
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
 class ImportHydrobioWithParametersTest(TestCase):
     """
     Test import_station command with parameters
@@ -611,3 +637,171 @@ class ImportHydrobioWithParametersTest(TestCase):
         station = stations.get(code="06000874")
         parameters_tracked = station.parametertracking_set.all()
         self.assertEqual(parameters_tracked.count(), 0)
+
+
+class HubeauStubHandler(BaseHTTPRequestHandler):
+    """Serve recorded Hub'Eau responses, after some throttled (429) responses"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(self.path)
+        with self.server.lock:
+            throttle = self.server.throttled > 0
+            self.server.throttled -= 1
+        if throttle:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if url.path.endswith('station_pc'):
+            filename = 'response_api_pcquality_stations_page3.json' if 'page' in query else 'response_api_pcquality_stations.json'
+        else:
+            filename = 'response_api_pcquality_analyse_desc.json' if 'sort' in query else 'response_api_pcquality_analyse.json'
+        with open(TEST_DATA_PATH / filename, 'rb') as f:
+            content = f.read().replace(b'https://hubeau.eaufrance.fr', self.server.url.encode())
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImportStationStubServerTest(TestCase):
+    """Test import_station command against a local server with recorded responses"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), HubeauStubHandler)
+        self.server.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.server.requests = []
+        self.server.throttled = 0
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        command = import_pcquality_stations.Command
+        for attribute, path in (('api_url', '/api/v2/qualite_rivieres/station_pc'),
+                                ('api_analyse_pc_url', '/api/v2/qualite_rivieres/analyse_pc')):
+            patcher = mock.patch.object(command, attribute, self.server.url + path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(command, 'backoff_factor', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_pcquality_stations_concurrently(self):
+        call_command('import_pcquality_stations', with_parameters=True, concurrency=8, stdout=StringIO())
+        self.assertEqual(Station.objects.count(), 28)
+        station = Station.objects.get(code="05134550")
+        ph_parameter_tracked = station.parametertracking_set.get(parameter__label='Potentiel en Hydrogène (pH)')
+        self.assertEqual(ph_parameter_tracked.measure_start_date.strftime('%Y-%m-%d'), "2012-02-20")
+        self.assertEqual(ph_parameter_tracked.measure_end_date.strftime('%Y-%m-%d'), "2020-11-17")
+        # 2 pages of stations, first and last measures of each station
+        self.assertEqual(len(self.server.requests), 2 + 28 * 2)
+
+    def test_import_pcquality_stations_throttled(self):
+        self.server.throttled = 3
+        call_command('import_pcquality_stations', with_parameters=True, stdout=StringIO())
+        self.assertEqual(Station.objects.count(), 28)
+        self.assertEqual(Station.objects.get(code="05134550").parametertracking_set.count(), 16)
+        self.assertEqual(len(self.server.requests), 3 + 2 + 28 * 2)
+
+    def test_import_pcquality_stations_writes_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_pcquality_stations', with_parameters=True, stdout=StringIO())
+        # Queries do not depend on the number of stations and measures
+        sqls = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in sqls if sql.startswith('INSERT INTO "observations_station" ')]), 1)
+        self.assertEqual(len([sql for sql in sqls if '"observations_unit"' in sql]), 2)
+        self.assertEqual(len([sql for sql in sqls if 'INTO "observations_parameter" ' in sql]), 1)
+        self.assertEqual(len([sql for sql in sqls if '"observations_parametertracking"' in sql]), 1)
+
+
+@mock.patch.object(requests.Session, 'get', side_effect=requests_get_mock_response)
+class ImportStationSyncTest(TestCase):
+    """Test import_station command in sync mode"""
+
+    def test_sync_unchanged_stations(self, mock_get):
+        out = StringIO()
+        call_command('import_pcquality_stations', sync=True, stdout=out)
+        self.assertIn("28 stations created, 0 updated, 0 unchanged, 0 removed", out.getvalue())
+        self.assertEqual(StationImport.objects.count(), 28)
+        self.assertTrue(StationSync.objects.filter(station_profile__code='PCQUAL', scope='').exists())
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_pcquality_stations', sync=True, stdout=out)
+        self.assertIn("0 stations created, 0 updated, 28 unchanged, 0 removed", out.getvalue())
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('UPDATE "observations_station" ')])
+
+    def test_sync_changed_station(self, mock_get):
+        call_command('import_pcquality_stations', sync=True, stdout=StringIO())
+
+        def requests_get_mock_response_changed(*args, **kwargs):
+            response = requests_get_mock_response(*args, **kwargs)
+            for station in response.json.return_value['data']:
+                if station.get('code_station') == "05134550":
+                    station['libelle_station'] = "Le Laudot"
+            return response
+
+        mock_get.side_effect = requests_get_mock_response_changed
+        out = StringIO()
+        call_command('import_pcquality_stations', sync=True, stdout=out)
+        self.assertIn("0 stations created, 1 updated, 27 unchanged, 0 removed", out.getvalue())
+        self.assertEqual(Station.objects.get(code="05134550").label, "Le Laudot")
+
+    def test_sync_removed_station(self, mock_get):
+        call_command('import_pcquality_stations', sync=True, stdout=StringIO())
+        station_profile = StationProfile.objects.get(code='PCQUAL')
+        station = StationFactory.create(code="00000000", station_profiles=[station_profile])
+        StationImport.objects.create(station=station, station_profile=station_profile, content_hash="")
+
+        out = StringIO()
+        call_command('import_pcquality_stations', sync=True, stdout=out)
+        self.assertIn("0 stations created, 0 updated, 28 unchanged, 1 removed", out.getvalue())
+        self.assertNotIn(station_profile, station.station_profiles.all())
+        self.assertFalse(StationImport.objects.filter(station=station).exists())
+
+    def test_sync_new_measures(self, mock_get):
+        call_command('import_pcquality_stations', sync=True, with_parameters=True, stdout=StringIO())
+        mock_get.reset_mock()
+        call_command('import_pcquality_stations', sync=True, with_parameters=True, stdout=StringIO())
+        analyse_params = [call[1]['params'] for call in mock_get.call_args_list if 'analyse_pc' in call[0][0]]
+        self.assertTrue(analyse_params)
+        self.assertTrue(all('date_debut_prelevement' in params for params in analyse_params))
+
+    def test_sync_parameters_after_sync_without_parameters(self, mock_get):
+        call_command('import_pcquality_stations', sync=True, stdout=StringIO())
+        self.assertFalse(StationSync.objects.exists())
+        mock_get.reset_mock()
+        call_command('import_pcquality_stations', sync=True, with_parameters=True, stdout=StringIO())
+        analyse_params = [call[1]['params'] for call in mock_get.call_args_list if 'analyse_pc' in call[0][0]]
+        self.assertTrue(analyse_params)
+        # Whole history of parameters is requested
+        self.assertFalse(any('date_debut_prelevement' in params for params in analyse_params))
+        self.assertEqual(Station.objects.get(code="05134550").parametertracking_set.count(), 16)
+        self.assertTrue(StationSync.objects.exists())
+
+    def test_sync_failed_parameters(self, mock_get):
+        def requests_get_mock_response_analyse_500(*args, **kwargs):
+            if kwargs.get('params', {}).get('code_station') == "05134550":
+                if 'analyse_pc' in args[0]:
+                    return requests_get_mock_response_500(*args, **kwargs)
+            return requests_get_mock_response(*args, **kwargs)
+
+        mock_get.side_effect = requests_get_mock_response_analyse_500
+        err = StringIO()
+        call_command('import_pcquality_stations', sync=True, with_parameters=True, stdout=StringIO(), stderr=err)
+        self.assertIn("Failed to fetch parameters of station 05134550", err.getvalue())
+        self.assertEqual(Station.objects.count(), 28)
+        station = Station.objects.get(code="05134550")
+        self.assertEqual(station.parametertracking_set.count(), 0)
+
+        mock_get.side_effect = requests_get_mock_response
+        out = StringIO()
+        call_command('import_pcquality_stations', sync=True, with_parameters=True, stdout=out)
+        self.assertIn("0 stations created, 1 updated, 27 unchanged, 0 removed", out.getvalue())
+        self.assertEqual(station.parametertracking_set.count(), 16)
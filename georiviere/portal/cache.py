@@ -0,0 +1,39 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_data_version(model):
+    """Returns timestamp of the last change of data published in portal API for a model"""
+    cache = caches['default']
+    key = f"portal-api-version-{model._meta.label_lower}"
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        # Keep another process version if set in between
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_data_version(model):
+    """
+    Change version of data published in portal API for a model, cached responses are not used anymore.
+    Version changes once the current transaction is committed, responses built in between would be cached
+    with the new version from data read before the commit.
+    """
+    transaction.on_commit(lambda: caches['default'].set(f"portal-api-version-{model._meta.label_lower}",
+                                                        time.time(), timeout=None))
+
+
+def get_response_cache():
+    return caches[settings.API_CACHE_BACKEND]
+
+
+def get_response_cache_key(prefix, lang, format, version, path):
+    """Cache key of an API response, depends on the full path to keep query parameters"""
+    digest = md5(f"{lang}-{format}-{version}-{path}".encode()).hexdigest()
+    return f"portal-api-{prefix}-{digest}"
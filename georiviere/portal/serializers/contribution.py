@@ -10,9 +10,8 @@ from django.db.models import ForeignKey
 from django.utils.translation import gettext as _
 
 from georiviere.contribution.schema import (
-    get_contribution_properties,
-    get_contribution_allOf,
     get_contribution_json_schema,
+    get_contribution_json_schema_validator,
 )
 from georiviere.contribution.models import (
     Contribution,
@@ -73,7 +72,7 @@ class ContributionSerializer(serializers.ModelSerializer):
 
     def validate_properties(self, data):
         new_data = deepcopy(data)
-        validate_json_schema_data(new_data, get_contribution_json_schema())
+        validate_json_schema_data(new_data, get_contribution_json_schema_validator())
         return new_data
 
     def create(self, validated_data):
@@ -168,10 +167,10 @@ class ContributionSchemaSerializer(serializers.Serializer):
         return ["email_author", "date_observation", "category"]
 
     def get_properties(self, obj):
-        return get_contribution_properties()
+        return get_contribution_json_schema()["properties"]
 
     def get_allOf(self, obj):
-        return get_contribution_allOf()
+        return get_contribution_json_schema()["allOf"]
 
     class Meta:
         geo_field = "geom"
@@ -0,0 +1,9 @@
+from rest_framework_gis.serializers import GeometryField
+
+
+class SimplifiedGeometryField(GeometryField):
+    """Geometry with coordinates rounded to the precision given by the view (simplified geometries)"""
+
+    def to_representation(self, value):
+        self.precision = self.context.get("precision", self.precision)
+        return super().to_representation(value)
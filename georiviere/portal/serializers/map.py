@@ -1,6 +1,7 @@
 from django.urls import reverse
 
 from georiviere.portal.models import MapBaseLayer, MapGroupLayer, MapLayer
+from georiviere.portal.tiles import get_tile_layer
 
 from rest_framework.serializers import ModelSerializer, IntegerField, SerializerMethodField
 
@@ -17,6 +18,7 @@ class ControlLayerSerializer(ModelSerializer):
 class MapLayerSerializer(ModelSerializer):
     options = SerializerMethodField()
     geojson_url = SerializerMethodField()
+    tile_url = SerializerMethodField()
     json_schema_url = SerializerMethodField()
     url = SerializerMethodField()
     type = SerializerMethodField()
@@ -25,7 +27,8 @@ class MapLayerSerializer(ModelSerializer):
     class Meta:
         model = MapLayer
         fields = (
-            'id', 'label', 'default_active', 'options', 'geojson_url', 'json_schema_url', 'url', 'type', 'is_searchable'
+            'id', 'label', 'default_active', 'options', 'geojson_url', 'tile_url', 'json_schema_url', 'url', 'type',
+            'is_searchable'
         )
         ordering = ('order',)
 
@@ -53,6 +56,16 @@ class MapLayerSerializer(ModelSerializer):
             return reverse('api_portal:pois-category', kwargs=reverse_kwargs)
         return reverse(f'api_portal:{layer_type[0]}-list', kwargs=reverse_kwargs)
 
+    def get_tile_url(self, obj):
+        try:
+            get_tile_layer(obj.layer_type)
+        except KeyError:
+            return None
+        # TODO: Make lang dynamic
+        url = reverse('api_portal:tiles', kwargs={'lang': 'fr', 'portal_pk': obj.portal.pk,
+                                                  'layer_type': obj.layer_type, 'z': 0, 'x': 0, 'y': 0})
+        return url.replace('/0/0/0.pbf', '/{z}/{x}/{y}.pbf')
+
     def get_url(self, obj):
         layer_type = obj.layer_type.split('-')
         if layer_type[0] not in ['pois', 'streams', 'contributions', 'sensitivities', 'stations', ]:
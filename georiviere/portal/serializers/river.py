@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 
+from georiviere.portal.serializers.fields import SimplifiedGeometryField
 from georiviere.portal.serializers.mixins import SerializerAPIMixin
 from georiviere.river.models import Stream
 from georiviere.portal.serializers.main import AttachmentSerializer
@@ -47,7 +48,7 @@ class StreamMixin(SerializerAPIMixin, ModelSerializer):
 
 
 class StreamGeojsonSerializer(StreamMixin, GeoFeatureModelSerializer):
-    geometry = geo_serializers.GeometryField(
+    geometry = SimplifiedGeometryField(
         read_only=True, precision=7, source="geom_transformed"
     )
 
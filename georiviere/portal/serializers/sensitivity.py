@@ -1,7 +1,8 @@
 from geotrek.sensitivity.models import SensitiveArea, Species
 from rest_framework import serializers
-from rest_framework_gis.serializers import GeoFeatureModelSerializer, GeometryField
+from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
+from georiviere.portal.serializers.fields import SimplifiedGeometryField
 from georiviere.portal.serializers.main import AttachmentSerializer
 
 
@@ -25,7 +26,7 @@ class SensitivitySerializer(serializers.ModelSerializer):
 
 
 class SensitivityGeojsonSerializer(GeoFeatureModelSerializer, SensitivitySerializer):
-    geometry = GeometryField(read_only=True, precision=7, source='geom_transformed')
+    geometry = SimplifiedGeometryField(read_only=True, precision=7, source='geom_transformed')
 
     class Meta(SensitivitySerializer.Meta):
         geo_field = 'geometry'
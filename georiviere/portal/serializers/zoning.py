@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer, GeometryField
 
+from georiviere.portal.serializers.fields import SimplifiedGeometryField
 from georiviere.watershed.models import Watershed, WatershedType
 from geotrek.zoning.models import City, District
 
@@ -49,7 +50,7 @@ class WatershedTypeSerializer(serializers.ModelSerializer):
 
 class WatershedGeojsonSerializer(GeoFeatureModelSerializer):
     type = WatershedTypeSerializer(source='watershed_type')
-    geometry = GeometryField(read_only=True, precision=7, source='geom_transformed')
+    geometry = SimplifiedGeometryField(read_only=True, precision=7, source='geom_transformed')
 
     class Meta:
         model = Watershed
@@ -1,10 +1,56 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
 from django.utils.translation import gettext_lazy as _
+from geotrek.sensitivity.models import SensitiveArea, Species
 
+from georiviere.contribution.models import CustomContributionType
+from georiviere.main.models import Attachment
+from georiviere.observations.models import Station
+from georiviere.portal.cache import invalidate_data_version
 from georiviere.portal.models import MapBaseLayer, MapLayer, Portal
-from georiviere.valorization.models import POICategory
+from georiviere.river.models import Stream
+from georiviere.valorization.models import POI, POICategory, POIType
+from georiviere.watershed.models import Watershed, WatershedType
+
+# Models whose data is published in portal API, cached responses are invalidated when they change
+API_CACHED_MODELS = (Stream, POI, Station, Watershed, SensitiveArea)
+# Models rendered in data of another model in portal API
+API_CACHED_RELATED_MODELS = {
+    WatershedType: Watershed,
+    POICategory: POI,
+    POIType: POI,
+    Species: SensitiveArea,
+}
+
+
+@receiver(post_save, dispatch_uid="invalidate_api_cache_save")
+@receiver(post_delete, dispatch_uid="invalidate_api_cache_delete")
+def invalidate_api_cache(sender, instance, **kwargs):
+    if sender in API_CACHED_MODELS:
+        invalidate_data_version(sender)
+    elif sender is Attachment and instance.content_type.model_class() in API_CACHED_MODELS:
+        invalidate_data_version(instance.content_type.model_class())
+    elif sender in API_CACHED_RELATED_MODELS:
+        invalidate_data_version(API_CACHED_RELATED_MODELS[sender])
+
+
+@receiver(m2m_changed, sender=Stream.portals.through, dispatch_uid="invalidate_api_cache_stream_portals")
+@receiver(m2m_changed, sender=POI.portals.through, dispatch_uid="invalidate_api_cache_poi_portals")
+@receiver(m2m_changed, sender=WatershedType.portals.through, dispatch_uid="invalidate_api_cache_watershed_portals")
+@receiver(m2m_changed, sender=CustomContributionType.stations.through,
+          dispatch_uid="invalidate_api_cache_station_contribution_types")
+def invalidate_api_cache_m2m(sender, action, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if sender is Stream.portals.through:
+        invalidate_data_version(Stream)
+    elif sender is POI.portals.through:
+        invalidate_data_version(POI)
+    elif sender is WatershedType.portals.through:
+        invalidate_data_version(Watershed)
+    else:
+        invalidate_data_version(Station)
 
 
 @receiver(post_delete, sender=POICategory, dispatch_uid="delete_category_maplayer")
@@ -0,0 +1,45 @@
+from itertools import islice
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db.models import prefetch_related_objects
+
+from georiviere.main.renderers import GeoJSONRenderer
+
+
+def stream_geojson(queryset, serializer, chunk_size=500):
+    """
+    Yield a GeoJSON FeatureCollection of a queryset, chunk by chunk.
+    Rows are read through a server-side cursor and geometries are built by database (ST_AsGeoJSON),
+    properties are the ones of the GeoJSON serializer.
+    """
+    geo_field = serializer.fields[serializer.Meta.geo_field]
+    precision = serializer.context.get("precision", geo_field.precision)
+    queryset = queryset.annotate(
+        geojson=AsGeoJSON(geo_field.source, **({"precision": precision} if precision is not None else {}))
+    )
+    if geo_field.source in queryset.query.annotations:
+        # Geometry is only needed as GeoJSON
+        queryset.query.set_annotation_mask(set(queryset.query.annotation_select) - {geo_field.source})
+    else:
+        queryset = queryset.defer(geo_field.source)
+    lookups = queryset._prefetch_related_lookups
+    properties_fields = [field for name, field in serializer.fields.items() if name != serializer.Meta.geo_field]
+    renderer = GeoJSONRenderer()
+
+    yield b'{"type":"FeatureCollection","features":['
+    objects = queryset.iterator(chunk_size=chunk_size)
+    separator = b""
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            break
+        prefetch_related_objects(chunk, *lookups)
+        features = []
+        for obj in chunk:
+            features.append(b"".join([
+                b'{"type":"Feature","geometry":', (obj.geojson or "null").encode(),
+                b',"properties":', renderer.render(serializer.get_properties(obj, properties_fields)), b"}",
+            ]))
+        yield separator + b",".join(features)
+        separator = b","
+    yield b"]}"
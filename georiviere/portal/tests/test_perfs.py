@@ -0,0 +1,52 @@
+import logging
+import os
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.test import TestCase
+from django.urls import reverse
+from geotrek.authent.tests.factories import StructureFactory
+
+from georiviere.altimetry import deferred_altimetry
+from georiviere.portal.tests.factories import PortalFactory
+from georiviere.river.models import Stream
+from georiviere.utils.postgresql import session_setting
+
+logger = logging.getLogger(__name__)
+
+
+@skipUnless(os.getenv('BENCHMARK'), "Set BENCHMARK=1 to run benchmarks")
+class StreamGeojsonBenchmark(TestCase):
+    """Payload size and duration of streams GeoJSON for each zoom band"""
+    objects_number = int(os.getenv('BENCHMARK_OBJECTS', 1000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.portal = PortalFactory.create()
+        structure = StructureFactory.create()
+        with deferred_altimetry(), session_setting('georiviere.defer_topologies', 'on'):
+            streams = Stream.objects.bulk_create([
+                Stream(name=f'Stream {i}', structure=structure,
+                       geom=LineString([(700000 + j * 10, 6600000 + i * 100 + (j % 7)) for j in range(500)],
+                                       srid=settings.SRID))
+                for i in range(cls.objects_number)
+            ])
+        Stream.portals.through.objects.bulk_create([
+            Stream.portals.through(stream=stream, portal=cls.portal) for stream in streams
+        ])
+
+    def test_benchmark(self):
+        url = reverse("api_portal:streams-list",
+                      kwargs={"portal_pk": self.portal.pk, "lang": "fr", "format": "geojson"})
+        results = []
+        for label, params in [("full", {})] + [
+            (f"zoom <= {max_zoom}", {"zoom": max_zoom}) for max_zoom, tolerance in settings.API_SIMPLIFY_ZOOM_BANDS
+        ] + [("tolerance 20", {"tolerance": 20})]:
+            start = time.perf_counter()
+            response = self.client.get(url, params)
+            duration = time.perf_counter() - start
+            self.assertEqual(response.status_code, 200)
+            results.append(f"{label}: {len(response.content) / 1024:.0f} kB in {duration:.2f}s")
+        logger.info("%s streams: %s", self.objects_number, ", ".join(results))
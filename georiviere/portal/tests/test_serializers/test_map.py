@@ -17,15 +17,22 @@ class MapSerializerTest(TestCase):
     def test_map_layer_content(self):
         data = self.serializer_layer.data
         self.assertSetEqual(set(data.keys()), {'url', 'type', 'label', 'id', 'options', 'default_active', 'geojson_url',
-                                               'json_schema_url', 'is_searchable'})
+                                               'tile_url', 'json_schema_url', 'is_searchable'})
 
     def test_map_layer_content_poi_categories(self):
         category = POICategoryFactory.create()
         data = MapLayerSerializer(instance=self.portal.layers.filter(layer_type__startswith='pois').first()).data
 
         self.assertSetEqual(set(data.keys()), {'url', 'type', 'label', 'id', 'options', 'default_active', 'geojson_url',
-                                               'json_schema_url', 'is_searchable'})
+                                               'tile_url', 'json_schema_url', 'is_searchable'})
         self.assertEqual(data['geojson_url'], f'/api/portal/fr/{self.portal.pk}/pois/category/{category.pk}.geojson')
+        self.assertEqual(data['tile_url'], f'/api/portal/fr/{self.portal.pk}/tiles/pois-{category.pk}/{{z}}/{{x}}/{{y}}.pbf')
+
+    def test_map_layer_tile_url(self):
+        data = MapLayerSerializer(instance=self.portal.layers.get(layer_type='streams')).data
+        self.assertEqual(data['tile_url'], f'/api/portal/fr/{self.portal.pk}/tiles/streams/{{z}}/{{x}}/{{y}}.pbf')
+        data = MapLayerSerializer(instance=self.portal.layers.get(layer_type='cities')).data
+        self.assertIsNone(data['tile_url'])
 
     def test_map_base_layer_content(self):
         data = self.serializer_base_layer.data
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from georiviere.portal.cache import get_data_version
+from georiviere.portal.tests.factories import PortalFactory
+from georiviere.river.models import Stream
+from georiviere.river.tests.factories import StreamFactory
+from georiviere.valorization.models import POI
+from georiviere.valorization.tests.factories import POIFactory
+
+
+@override_settings(API_CACHE_ENABLED=True)
+class StreamCachedViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portal = PortalFactory.create()
+        cls.stream = StreamFactory.create(name="Stream 1")
+        cls.stream.portals.add(cls.portal)
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['fat'].clear()
+        # Transactions of tests are never committed
+        patcher = mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+        self.on_commit = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse(
+            "api_portal:streams-list",
+            kwargs={"portal_pk": self.portal.pk, "lang": "fr", "format": "geojson"},
+        )
+
+    def test_response_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response["Content-Type"], response["Content-Type"])
+        self.assertEqual(cached_response["ETag"], response["ETag"])
+
+    def test_cache_by_format_and_language(self):
+        response = self.client.get(self.url)
+        url = reverse(
+            "api_portal:streams-list",
+            kwargs={"portal_pk": self.portal.pk, "lang": "en", "format": "json"},
+        )
+        other_response = self.client.get(url)
+        self.assertNotEqual(response["ETag"], other_response["ETag"])
+        self.assertEqual(len(other_response.json()), 1)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_on_save(self):
+        version = get_data_version(Stream)
+        response = self.client.get(self.url)
+        self.stream.name = "Stream 2"
+        self.stream.save()
+        self.assertNotEqual(get_data_version(Stream), version)
+        new_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(new_response.status_code, 200)
+        self.assertEqual(new_response.json()["features"][0]["properties"]["name"], "Stream 2")
+
+    def test_invalidated_on_commit(self):
+        version = get_data_version(Stream)
+        self.on_commit.side_effect = None
+        self.stream.save()
+        self.assertEqual(get_data_version(Stream), version)
+        for call in self.on_commit.call_args_list:
+            call[0][0]()
+        self.assertNotEqual(get_data_version(Stream), version)
+
+    def test_invalidated_on_related_objects_changed(self):
+        poi = POIFactory.create()
+        version = get_data_version(POI)
+        poi.type.category.save()
+        self.assertNotEqual(get_data_version(POI), version)
+
+    def test_invalidated_on_portals_changed(self):
+        self.client.get(self.url)
+        self.stream.portals.remove(self.portal)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()["features"]), 0)
+
+    def test_invalidated_on_delete(self):
+        self.client.get(self.url)
+        self.stream.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()["features"]), 0)
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_cache_disabled(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
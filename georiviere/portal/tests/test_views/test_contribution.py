@@ -1,4 +1,5 @@
 from django.core import mail
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, override_settings
@@ -38,6 +39,22 @@ class ContributionViewPostTest(APITestCase):
 
         self.assertSetEqual(set(response.json().keys()), {'type', 'required', 'properties', 'allOf'})
 
+    @override_settings(API_CACHE_ENABLED=True)
+    def test_contribution_structure_etag(self):
+        caches['default'].clear()
+        url = reverse('api_portal:contributions-json_schema',
+                      kwargs={'portal_pk': self.portal.pk, 'lang': 'fr'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        NaturePollutionFactory.create(label="Qux")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
     def test_contribution_landscape_element(self):
         self.assertEqual(len(mail.outbox), 0)
         url = reverse('api_portal:contributions-list',
@@ -406,3 +423,19 @@ class CustomContributionTypeVIewSetAPITestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertNotIn(self.contribution_unvalidated.pk, [c['id'] for c in data])
+
+    def test_filter_values(self):
+        warm = CustomContributionFactory(custom_type=self.custom_contribution_type, validated=True,
+                                         portal=self.portal, data={"field_float": 12.5, "field_boolean": True})
+        cold = CustomContributionFactory(custom_type=self.custom_contribution_type, validated=True,
+                                         portal=self.portal, data={"field_float": 3, "field_boolean": False})
+        response = self.client.get(self.get_contribution_url(), {"field_float__gte": 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual([c['id'] for c in response.json()], [warm.pk])
+        response = self.client.get(self.get_contribution_url(), {"field_boolean": "false", "field_float__lt": 5})
+        self.assertListEqual([c['id'] for c in response.json()], [cold.pk])
+
+    def test_filter_values_invalid(self):
+        response = self.client.get(self.get_contribution_url(), {"field_float__gte": "warm"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("field_float__gte", response.json())
@@ -1,7 +1,14 @@
-from django.test import TestCase
+import json
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from georiviere.portal.tests.factories import PortalFactory
+from georiviere.main.tests.factories import AttachmentFactory
 from georiviere.river.tests.factories import StreamFactory
 
 
@@ -107,3 +114,85 @@ class StreamViewTest(TestCase):
             self.assertEqual(
                 data["flow"], "To be defined" if lang == "en" else "À définir"
             )
+
+
+class StreamSimplifiedViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portal = PortalFactory.create()
+        # 1 meter zigzag every 10 meters
+        cls.stream = StreamFactory.create(
+            geom=LineString([(700000 + i * 10, 6600000 + i % 2) for i in range(101)], srid=settings.SRID)
+        )
+        cls.stream.portals.add(cls.portal)
+        cls.url = reverse(
+            "api_portal:streams-list",
+            kwargs={"portal_pk": cls.portal.pk, "lang": "fr", "format": "geojson"},
+        )
+
+    def get_coordinates(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["features"][0]["geometry"]["coordinates"]
+
+    def test_full_resolution(self):
+        self.assertEqual(len(self.get_coordinates()), 101)
+        self.assertEqual(len(self.get_coordinates(zoom=18)), 101)
+
+    def test_zoom_bands(self):
+        coordinates = self.get_coordinates(zoom=5)
+        self.assertEqual(len(coordinates), 2)
+        # 4 decimals for 100 meters tolerance
+        self.assertEqual(coordinates[0], [round(coordinate, 4) for coordinate in coordinates[0]])
+        self.assertEqual(len(self.get_coordinates(zoom=13)), 2)
+        self.assertEqual(len(self.get_coordinates(zoom=14)), 101)
+
+    def test_tolerance(self):
+        self.assertEqual(len(self.get_coordinates(tolerance=2)), 2)
+        self.assertEqual(len(self.get_coordinates(tolerance=0.1)), 101)
+
+    def test_invalid_parameters(self):
+        for params in ({"zoom": "a"}, {"tolerance": "a"}, {"tolerance": -1}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_simplified_geometries_updated(self):
+        self.stream.geom = LineString((700000, 6600000), (701000, 6600000), srid=settings.SRID)
+        self.stream.save()
+        self.stream.refresh_from_db()
+        self.assertEqual(len(self.stream.geom_simplified_high.coords), 2)
+
+
+class StreamStreamingViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portal = PortalFactory.create()
+        for stream in StreamFactory.create_batch(5):
+            stream.portals.add(cls.portal)
+            AttachmentFactory.create(content_object=stream)
+        cls.url = reverse(
+            "api_portal:streams-list",
+            kwargs={"portal_pk": cls.portal.pk, "lang": "fr", "format": "geojson"},
+        )
+
+    def test_streamed_geojson_same_as_serialized(self):
+        expected = self.client.get(self.url).json()
+        with override_settings(API_GEOJSON_STREAMING=True):
+            response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), expected)
+
+    @override_settings(API_GEOJSON_STREAMING=True)
+    def test_attachments_prefetched_by_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"zoom": 5})
+            data = b"".join(response.streaming_content)
+        self.assertLess(len(queries), 5)
+        self.assertEqual(len(json.loads(data)["features"]), 5)
+
+    @override_settings(API_GEOJSON_STREAMING=True)
+    def test_paginated_not_streamed(self):
+        response = self.client.get(self.url, {"limit": 2})
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.json()["results"]["features"]), 2)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from georiviere.portal.tests.factories import PortalFactory
+from georiviere.portal.tiles import WEB_MERCATOR_SIZE
+from georiviere.river.tests.factories import StreamFactory
+
+
+class TileViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portal = PortalFactory.create()
+        cls.stream = StreamFactory.create()
+        cls.stream.portals.add(cls.portal)
+
+    def setUp(self):
+        caches['fat'].clear()
+
+    def get_tile_url(self, layer_type, z, point=None):
+        """ Returns url of tile containing the point at zoom z """
+        x = y = 0
+        if point is not None:
+            point = point.transform(3857, clone=True)
+            size = WEB_MERCATOR_SIZE / 2 ** z
+            x, y = int((point.x + WEB_MERCATOR_SIZE / 2) // size), int((WEB_MERCATOR_SIZE / 2 - point.y) // size)
+        return reverse('api_portal:tiles', kwargs={'lang': 'fr', 'portal_pk': self.portal.pk,
+                                                   'layer_type': layer_type, 'z': z, 'x': x, 'y': y})
+
+    def test_tile(self):
+        url = self.get_tile_url('streams', 12, Point(*self.stream.geom[0], srid=settings.SRID))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(self.stream.name.encode(), response.content)
+
+    def test_empty_tile(self):
+        response = self.client.get(self.get_tile_url('streams', 12, Point(-170, 80, srid=4326)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_other_portal(self):
+        self.stream.portals.clear()
+        url = self.get_tile_url('streams', 12, Point(*self.stream.geom[0], srid=settings.SRID))
+        self.assertNotIn(self.stream.name.encode(), self.client.get(url).content)
+
+    def test_unknown_layer(self):
+        for layer_type in ('cities', 'contributions-custom', 'pois-abc'):
+            response = self.client.get(self.get_tile_url(layer_type, 0))
+            self.assertEqual(response.status_code, 404)
+
+    def test_tile_out_of_bounds(self):
+        url = reverse('api_portal:tiles', kwargs={'lang': 'fr', 'portal_pk': self.portal.pk,
+                                                  'layer_type': 'streams', 'z': 1, 'x': 2, 'y': 0})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_all_layers(self):
+        for layer_type in ('streams', 'pois', 'pois-1', 'stations', 'watersheds', 'sensitivities'):
+            response = self.client.get(self.get_tile_url(layer_type, 0))
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(API_CACHE_ENABLED=True)
+    def test_tile_cached_until_stream_changes(self):
+        url = self.get_tile_url('streams', 12, Point(*self.stream.geom[0], srid=settings.SRID))
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.stream.name = "New name"
+        # Transactions of tests are never committed
+        with mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func()):
+            self.stream.save()
+        self.assertIn(b"New name", self.client.get(url).content)
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+from django.db.models import Case, F, When
+from geotrek.sensitivity.models import SensitiveArea
+
+from georiviere.functions import Buffer, GeometryType
+from georiviere.observations.models import Station
+from georiviere.portal.cache import get_data_version, get_response_cache
+from georiviere.river.models import Stream
+from georiviere.valorization.models import POI
+from georiviere.watershed.models import Watershed
+
+# Size of tiles in their own coordinates, and margin around tiles to draw geometries crossing tiles
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+# Size of the world in web mercator
+WEB_MERCATOR_SIZE = 2 * 20037508.342789244
+
+
+class TileLayer:
+    """Objects of a portal layer, drawn in vector tiles. Default layer draws objects published in the portal."""
+
+    def __init__(self, model, fields, geom_field='geom'):
+        self.model = model
+        self.fields = fields
+        self.geom_field = geom_field
+
+    def get_queryset(self, portal_pk, category_pk=None):
+        return self.model.objects.filter(portals__id=portal_pk)
+
+
+class POITileLayer(TileLayer):
+    def get_queryset(self, portal_pk, category_pk=None):
+        queryset = super().get_queryset(portal_pk)
+        if category_pk is not None:
+            queryset = queryset.filter(type__category_id=category_pk)
+        return queryset
+
+
+class StationTileLayer(TileLayer):
+    def get_queryset(self, portal_pk, category_pk=None):
+        # Stations are not published by portal, all portals get stations of the station API
+        return Station.objects.filter(
+            pk__in=Station.custom_contribution_types.through.objects.values('station_id')
+        )
+
+
+class WatershedTileLayer(TileLayer):
+    def get_queryset(self, portal_pk, category_pk=None):
+        return Watershed.objects.filter(watershed_type__portals__id=portal_pk)
+
+
+class SensitivityTileLayer(TileLayer):
+    def get_queryset(self, portal_pk, category_pk=None):
+        # Points are drawn as their species radius, as in sensitivities API
+        return SensitiveArea.objects.existing().filter(published=True).annotate(
+            species_name=F('species__name'),
+            geom_type=GeometryType(F('geom')),
+        ).annotate(area=Case(
+            When(geom_type='POINT', then=Buffer(F('geom'), F('species__radius'), 4)),
+            default=F('geom'),
+        ))
+
+
+TILE_LAYERS = {
+    'streams': TileLayer(Stream, ['id', 'name']),
+    'pois': POITileLayer(POI, ['id', 'name', 'type_id']),
+    'stations': StationTileLayer(Station, ['id', 'label']),
+    'watersheds': WatershedTileLayer(Watershed, ['id', 'name']),
+    'sensitivities': SensitivityTileLayer(SensitiveArea, ['id', 'species_name'], geom_field='area'),
+}
+
+
+def get_tile_layer(layer_type):
+    """Returns tile layer and category of a map layer type (`streams`, `pois-<category>`...),
+    raises KeyError if layer type is not drawn in tiles"""
+    name, _, category_pk = layer_type.partition('-')
+    if category_pk and (name != 'pois' or not category_pk.isdigit()):
+        raise KeyError(layer_type)
+    return TILE_LAYERS[name], int(category_pk) if category_pk else None
+
+
+def get_tile_bounds(z, x, y):
+    """Returns bounds of a tile in web mercator, and size of the tile"""
+    size = WEB_MERCATOR_SIZE / 2 ** z
+    xmin = -WEB_MERCATOR_SIZE / 2 + x * size
+    ymax = WEB_MERCATOR_SIZE / 2 - y * size
+    return (xmin, ymax - size, xmin + size, ymax), size
+
+
+def get_tile(layer_type, portal_pk, z, x, y):
+    """Returns a vector tile (ST_AsMVT) of a portal layer. Geometries are simplified according to zoom level.
+    Tiles are cached until objects of the layer change."""
+    layer, category_pk = get_tile_layer(layer_type)
+    if settings.API_CACHE_ENABLED:
+        cache = get_response_cache()
+        key = f"portal-tile-{layer_type}-{portal_pk}-{get_data_version(layer.model)}-{z}-{x}-{y}"
+        tile = cache.get(key)
+        if tile is not None:
+            return tile
+
+    bounds, size = get_tile_bounds(z, x, y)
+    margin = size * TILE_BUFFER / TILE_EXTENT
+    envelope = Polygon.from_bbox((bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin))
+    envelope.srid = 3857
+    queryset = layer.get_queryset(portal_pk, category_pk).filter(
+        **{f'{layer.geom_field}__bboverlaps': envelope}
+    ).values(*layer.fields, layer.geom_field)
+    sql, params = queryset.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    # Details smaller than a pixel of a 256 pixels tile are not drawn, tolerance is in web mercator meters
+    tolerance = size / 256 * settings.API_TILE_SIMPLIFY_PIXELS
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT ST_AsMVT(tile, %s, {TILE_EXTENT}, 'geom') FROM (
+                SELECT {', '.join(f'o.{qn(field)}' for field in layer.fields)},
+                       ST_AsMVTGeom(ST_Simplify(ST_Transform(o.{qn(layer.geom_field)}, 3857), %s, true),
+                                    ST_MakeEnvelope(%s, %s, %s, %s, 3857), {TILE_EXTENT}, {TILE_BUFFER}) AS geom
+                FROM ({sql}) o
+            ) tile
+            WHERE tile.geom IS NOT NULL
+        """, [layer_type, tolerance, *bounds, *params])
+        tile = bytes(cursor.fetchone()[0] or b'')
+
+    if settings.API_CACHE_ENABLED:
+        cache.set(key, tile)
+    return tile
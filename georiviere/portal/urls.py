@@ -13,6 +13,7 @@ from georiviere.portal.views.observations import StationViewSet
 from georiviere.portal.views.portal import PortalViewSet
 from georiviere.portal.views.river import StreamViewSet
 from georiviere.portal.views.sensitivity import SensitivityViewSet
+from georiviere.portal.views.tiles import TileView
 from georiviere.portal.views.valorization import POIViewSet
 from georiviere.portal.views.zoning import (
     CityViewSet,
@@ -96,6 +97,11 @@ if settings.API_SCHEMA:  # pragma: no cover
         ]
 _urlpatterns += [
     path("version", GeoriviereVersionAPIView.as_view(), name="version"),
+    path(
+        "<str:lang>/<int:portal_pk>/tiles/<str:layer_type>/<int:z>/<int:x>/<int:y>.pbf",
+        TileView.as_view(),
+        name="tiles",
+    ),
     path("", include(router.urls)),
 ]
 urlpatterns = [path("api/portal/", include(_urlpatterns))]
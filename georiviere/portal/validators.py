@@ -20,12 +20,18 @@ def validate_json_schema(value):
 
 def validate_json_schema_data(value, schema):
     """
-    Validate data according json schema
+    Validate data according json schema, or a validator already compiled from it
     """
     try:
         # TODO: check additional value properties and all of properties
         if value is not None and schema:
-            jsonschema.validators.validate(value, schema)
+            if isinstance(schema, dict):
+                jsonschema.validators.validate(value, schema)
+            else:
+                # Same error as jsonschema.validate, without checking the schema again
+                error = jsonschema.exceptions.best_match(schema.iter_errors(value))
+                if error is not None:
+                    raise error
     except jsonschema.exceptions.ValidationError as e:
         raise ValidationError(message=e.message)
     return value
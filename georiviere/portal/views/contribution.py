@@ -12,8 +12,9 @@ from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import F, Q
 from django.utils import translation
+from django.utils.cache import get_conditional_response, quote_etag
 from django.utils.translation import gettext_lazy as _
-from rest_framework import filters, viewsets, mixins, renderers, permissions, status
+from rest_framework import filters, viewsets, mixins, renderers, permissions, serializers, status
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
@@ -21,11 +22,13 @@ from rest_framework.permissions import AllowAny
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from georiviere.contribution.cache import get_json_schema_cache_key
 from georiviere.contribution.models import (
     Contribution,
     CustomContributionType,
     CustomContribution,
 )
+from georiviere.contribution.models.managers import VALUE_COLUMNS, VALUE_LOOKUPS
 from georiviere.main.models import Attachment, FileType
 from georiviere.main.renderers import GeoJSONRenderer
 from georiviere.portal.serializers.contribution import (
@@ -40,6 +43,16 @@ from georiviere.portal.views.mixins import GeoriviereAPIMixin
 
 logger = logging.getLogger(__name__)
 
+# Parsers of values given to filter custom contributions, by type of field
+VALUE_FIELDS = {
+    "string": serializers.CharField,
+    "integer": serializers.FloatField,
+    "float": serializers.FloatField,
+    "boolean": serializers.BooleanField,
+    "date": serializers.DateField,
+    "datetime": serializers.DateTimeField,
+}
+
 
 class ContributionViewSet(
     GeoriviereAPIMixin,
@@ -69,7 +82,15 @@ class ContributionViewSet(
     )
     def json_schema(self, request, *args, **kwargs):
         serializer = self.get_serializer({})
-        return Response(serializer.data)
+        if not settings.API_CACHE_ENABLED:
+            return Response(serializer.data)
+        # Schema changes with language and referential lists, as its cache key
+        etag = quote_etag(get_json_schema_cache_key(self.kwargs["lang"]))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(serializer.data)
+        response["ETag"] = etag
+        return response
 
     def get_serializer_context(self):
         """
@@ -260,11 +281,32 @@ class CustomContributionTypeViewSet(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def filter_values(self, queryset, custom_type):
+        """
+        Filter contributions by values of fields of their type, with `<key>` or `<key>__<lookup>`
+        parameters (lookups: gt, gte, lt, lte), e.g. `?temperature__gte=12`. Text fields are not filtered.
+        """
+        fields = {field.key: field for field in custom_type.fields.all() if field.value_type in VALUE_COLUMNS}
+        for param, value in self.request.query_params.items():
+            key, lookup = param, "exact"
+            if "__" in param and param.rsplit("__", 1)[1] in VALUE_LOOKUPS:
+                key, lookup = param.rsplit("__", 1)
+            if key not in fields:
+                continue
+            field = fields[key]
+            try:
+                value = VALUE_FIELDS[field.value_type]().run_validation(value)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({param: e.detail})
+            queryset = queryset.filter_value(field, lookup, value)
+        return queryset
+
     def list_contributions(self, request, *args, **kwargs):
         custom_type = self.get_object()
         context = self.get_serializer_context()
         context["custom_type"] = custom_type
         qs = CustomContribution.objects.with_type_values(custom_type).filter(validated=True).prefetch_related("attachments")
+        qs = self.filter_values(qs, custom_type)
 
         renderer, media_type = self.perform_content_negotiation(self.request)
         if getattr(renderer, "format") == "geojson":
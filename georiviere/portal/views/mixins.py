@@ -1,9 +1,20 @@
+import math
+
 from django.conf import settings
+from django.contrib.gis.db.models.functions import Transform
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
 from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from rest_framework import renderers, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import LimitOffsetPagination
 
+from georiviere.functions import SimplifyPreserveTopology
 from georiviere.main.renderers import GeoJSONRenderer
+from georiviere.portal.cache import get_data_version, get_response_cache, get_response_cache_key
+from georiviere.portal.streaming import stream_geojson
 
 
 class GeoriviereAPIMixin:
@@ -14,6 +25,10 @@ class GeoriviereAPIMixin:
     ) if settings.DEBUG else (CamelCaseJSONRenderer, GeoJSONRenderer)
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
     pagination_class = LimitOffsetPagination
+    # Responses are cached until data of this model changes, set to None to disable cache
+    cache_model = None
+    # Number of features read at once by streamed GeoJSON lists
+    streaming_chunk_size = 500
 
     def get_serializer_class(self):
         """Use specific Serializer for GeoJSON"""
@@ -24,6 +39,103 @@ class GeoriviereAPIMixin:
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context["lang"] = self.kwargs["lang"]
-        context["portal_pk"] = self.kwargs["portal_pk"]
+        context["lang"] = self.kwargs.get("lang")
+        context["portal_pk"] = self.kwargs.get("portal_pk")
+        band, tolerance = self.get_simplification()
+        if tolerance:
+            # Coordinates in degrees (API_SRID) are rounded to the tolerance (in meters)
+            context["precision"] = max(0, min(7, math.ceil(math.log10(111320 / tolerance))))
         return context
+
+    def get_simplification(self):
+        """
+        Returns zoom band (index in API_SIMPLIFY_ZOOM_BANDS) and tolerance asked with `zoom` or `tolerance`
+        (in meters) parameters. Geometries are not simplified at zoom levels above bands.
+        """
+        zoom = self.request.query_params.get("zoom")
+        tolerance = self.request.query_params.get("tolerance")
+        if zoom is not None:
+            try:
+                zoom = int(zoom)
+            except ValueError:
+                raise ValidationError({"zoom": "A valid integer is required."})
+            for band, (max_zoom, band_tolerance) in enumerate(settings.API_SIMPLIFY_ZOOM_BANDS):
+                if zoom <= max_zoom:
+                    return band, band_tolerance
+        elif tolerance is not None:
+            try:
+                tolerance = float(tolerance)
+            except ValueError:
+                raise ValidationError({"tolerance": "A valid number is required."})
+            if tolerance < 0:
+                raise ValidationError({"tolerance": "Ensure this value is greater than or equal to 0."})
+            return None, tolerance
+        return None, None
+
+    def get_geometry(self, geom=F("geom"), simplified_geom_fields=None):
+        """
+        Geometry in API_SRID, simplified according to `zoom` or `tolerance` parameters.
+        Precomputed geometries of zoom bands are used if `simplified_geom_fields` is given.
+        """
+        band, tolerance = self.get_simplification()
+        if band is not None and simplified_geom_fields:
+            return F(simplified_geom_fields[band])
+        if tolerance:
+            geom = SimplifyPreserveTopology(geom, tolerance)
+        return Transform(geom, settings.API_SRID)
+
+    def view_cache_key(self):
+        return f"{self.basename}-{self.kwargs.get('portal_pk', 'all')}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """
+        Return response of `handler` from cache. Cache key depends on portal, language, format,
+        full path and data version, so that any change of data makes a new response.
+        Clients with a valid copy (ETag / Last-Modified) get a 304.
+        """
+        if not settings.API_CACHE_ENABLED or self.cache_model is None:
+            return handler(request, *args, **kwargs)
+        version = get_data_version(self.cache_model)
+        key = get_response_cache_key(self.view_cache_key(), self.kwargs.get("lang"),
+                                     request.accepted_renderer.format, version, request.get_full_path())
+        etag = quote_etag(key)
+        last_modified = int(version)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache = get_response_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if not response.streaming:
+                    # Streamed responses are not kept in memory, so they are not cached
+                    response.add_post_render_callback(
+                        lambda rendered: cache.set(key, (rendered.content, rendered["Content-Type"]))
+                    )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def use_streaming(self, request):
+        """GeoJSON lists are streamed if API_GEOJSON_STREAMING is enabled, unless they are paginated"""
+        return (settings.API_GEOJSON_STREAMING and request.accepted_renderer.format == "geojson"
+                and (self.paginator is None or self.paginator.get_limit(request) is None))
+
+    def streaming_list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            stream_geojson(queryset, self.get_serializer(), self.streaming_chunk_size),
+            content_type=request.accepted_renderer.media_type,
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.use_streaming(request):
+            return self.cached_response(self.streaming_list, request, *args, **kwargs)
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
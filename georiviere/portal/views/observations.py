@@ -17,6 +17,7 @@ from georiviere.portal.views.mixins import GeoriviereAPIMixin
 
 
 class StationViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
+    cache_model = Station
     serializer_class = StationSerializer
     geojson_serializer_class = StationGeojsonSerializer
 
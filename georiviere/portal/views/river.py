@@ -15,6 +15,7 @@ from georiviere.river.models import Stream
 
 class StreamViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
     model = Stream
+    cache_model = Stream
     geojson_serializer_class = StreamGeojsonSerializer
     serializer_class = StreamSerializer
     filter_backends = [filters.OrderingFilter, SearchNoAccentFilter]
@@ -34,9 +35,9 @@ class StreamViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
             )
         )
         queryset = queryset.annotate(
-            geom_transformed=Transform(F("geom"), settings.API_SRID)
-        ).annotate(centroid=Centroid("geom_transformed"))
-        return queryset
+            geom_transformed=self.get_geometry(simplified_geom_fields=Stream.simplified_geom_fields)
+        ).annotate(centroid=Centroid(Transform(F("geom"), settings.API_SRID)))
+        return queryset.defer(*Stream.simplified_geom_fields)
 
     def view_cache_key(self):
         return f"stream-{self.kwargs['portal_pk']}"
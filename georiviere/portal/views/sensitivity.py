@@ -8,6 +8,7 @@ from georiviere.functions import Area, Buffer, GeometryType
 from georiviere.portal.serializers.sensitivity import SensitivityGeojsonSerializer, SensitivitySerializer
 from georiviere.main.models import Attachment
 from georiviere.main.renderers import GeoJSONRenderer
+from georiviere.portal.views.mixins import GeoriviereAPIMixin
 from geotrek.sensitivity.models import SensitiveArea
 
 from rest_framework import filters
@@ -16,8 +17,9 @@ from rest_framework.permissions import AllowAny
 from rest_framework.pagination import LimitOffsetPagination
 
 
-class SensitivityViewSet(viewsets.ReadOnlyModelViewSet):
+class SensitivityViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
     model = SensitiveArea
+    cache_model = SensitiveArea
     geojson_serializer_class = SensitivityGeojsonSerializer
     serializer_class = SensitivitySerializer
     permission_classes = [AllowAny, ]
@@ -45,16 +47,9 @@ class SensitivityViewSet(viewsets.ReadOnlyModelViewSet):
 
         queryset = queryset.annotate(geom_transformed=Case(
             When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-            default=Transform(F('geom'), settings.API_SRID)
+            default=self.get_geometry()
         ))
         queryset = queryset.order_by(Area('geom_transformed').desc(), 'pk')
         if self.format_kwarg == 'geojson':
             queryset = queryset.only('id', 'species', 'attachments', 'description')
         return queryset.defer('geom')
-
-    def get_serializer_class(self):
-        """ Use specific Serializer for GeoJSON """
-        renderer, media_type = self.perform_content_negotiation(self.request)
-        if getattr(renderer, 'format') == 'geojson':
-            return self.geojson_serializer_class
-        return self.serializer_class
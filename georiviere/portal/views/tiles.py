@@ -0,0 +1,21 @@
+from django.http import Http404
+from rest_framework import permissions, response
+from rest_framework.views import APIView
+
+from georiviere.main.renderers import MVTRenderer
+from georiviere.portal.tiles import get_tile
+
+
+class TileView(APIView):
+    """ Vector tiles of portal map layers """
+    permission_classes = [permissions.AllowAny, ]
+    renderer_classes = [MVTRenderer, ]
+
+    def get(self, request, lang, portal_pk, layer_type, z, x, y, *args, **kwargs):
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise Http404
+        try:
+            tile = get_tile(layer_type, portal_pk, z, x, y)
+        except KeyError:
+            raise Http404
+        return response.Response(tile)
@@ -17,6 +17,7 @@ from rest_framework.response import Response
 
 
 class POIViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
+    cache_model = POI
     geojson_serializer_class = POIGeojsonSerializer
     serializer_class = POISerializer
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -42,6 +43,9 @@ class POIViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
         url_name="category",
     )
     def category(self, request, *args, **kwargs):
+        return self.cached_response(self.category_response, request, *args, **kwargs)
+
+    def category_response(self, request, *args, **kwargs):
         category_pk = self.kwargs["category_pk"]
         category = get_object_or_404(POICategory.objects.all(), pk=category_pk)
         qs = self.filter_queryset(
@@ -6,6 +6,7 @@ from georiviere.portal.serializers.zoning import (CityGeojsonSerializer, Distric
                                                   WatershedGeojsonSerializer, CitySerializer,
                                                   DistrictSerializer, WatershedSerializer)
 from georiviere.main.renderers import GeoJSONRenderer
+from georiviere.portal.views.mixins import GeoriviereAPIMixin
 from geotrek.zoning.models import City, District
 from georiviere.watershed.models import Watershed
 
@@ -49,7 +50,8 @@ class DistrictViewSet(viewsets.ReadOnlyModelViewSet):
         return self.serializer_class
 
 
-class WatershedViewSet(viewsets.ReadOnlyModelViewSet):
+class WatershedViewSet(GeoriviereAPIMixin, viewsets.ReadOnlyModelViewSet):
+    cache_model = Watershed
     serializer_class = WatershedSerializer
     geojson_serializer_class = WatershedGeojsonSerializer
     permission_classes = [AllowAny, ]
@@ -58,11 +60,6 @@ class WatershedViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         portal_pk = self.kwargs['portal_pk']
         queryset = Watershed.objects.select_related('watershed_type').filter(watershed_type__portals__id=portal_pk)
-        return queryset.annotate(geom_transformed=Transform(F('geom'), settings.API_SRID))
-
-    def get_serializer_class(self):
-        """ Use specific Serializer for GeoJSON """
-        renderer, media_type = self.perform_content_negotiation(self.request)
-        if getattr(renderer, 'format') == 'geojson':
-            return self.geojson_serializer_class
-        return self.serializer_class
+        return queryset.annotate(
+            geom_transformed=self.get_geometry(simplified_geom_fields=Watershed.simplified_geom_fields)
+        ).defer(*Watershed.simplified_geom_fields)
@@ -1,3 +1,9 @@
 CREATE TRIGGER proceeding_proceeding_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON proceeding_proceeding
-FOR EACH ROW EXECUTE PROCEDURE elevation();
+AFTER INSERT ON proceeding_proceeding
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE TRIGGER proceeding_proceeding_10_elevation_update
+AFTER UPDATE ON proceeding_proceeding
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
\ No newline at end of file
@@ -54,19 +54,20 @@ class SnappedFieldMixin(object):
                 snaplist.append(snaplist[0])
             if geom.num_coords != len(snaplist):
                 raise ValueError("Snap list length != %s (%s)" % (geom.num_coords, snaplist))
-            paths = [Stream.objects.get(pk=pk) if pk is not None else None
-                     for pk in snaplist]
             if geom.geom_type == "Polygon":
                 coords = list(geom[0].coords)
             elif geom.geom_type == "Point":
                 coords = [list(geom.coords)]
             else:
                 coords = list(geom.coords)
-            for i, (vertex, path) in enumerate(zip(coords, paths)):
-                if path:
-                    # Snap vertex on path
-                    snap = path.snap(Point(*vertex, srid=geom.srid))
-                    coords[i] = snap.coords
+            # Snap vertices on their path, all at once
+            snapped = [(i, pk) for i, pk in enumerate(snaplist) if pk is not None]
+            results = Stream.objects.reference([Point(*coords[i], srid=geom.srid) for i, pk in snapped],
+                                               stream_ids=[int(pk) for i, pk in snapped])
+            for (i, pk), result in zip(snapped, results):
+                if result is None:
+                    raise Stream.DoesNotExist(f"Stream {pk} does not exist")
+                coords[i] = result['snapped'].coords
             if geom.geom_type == 'Polygon':
                 coords = [coord for coord in coords]
                 return Polygon(coords, srid=settings.SRID)
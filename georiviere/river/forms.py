@@ -1,6 +1,9 @@
 from crispy_forms.layout import Div, Field
 
 from django import forms
+from django.conf import settings
+from django.contrib.gis import forms as gis_forms
+from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.forms import CommonForm
 
@@ -43,3 +46,53 @@ class CutTopologyForm(forms.Form):
     topology = forms.ModelChoiceField(queryset=Topology.objects.all(), widget=forms.widgets.HiddenInput())
     lat = forms.FloatField(widget=forms.HiddenInput())
     lng = forms.FloatField(widget=forms.HiddenInput())
+
+
+class CutTopologiesForm(forms.Form):
+    stream = forms.ModelChoiceField(queryset=Stream.objects.all())
+    positions = forms.CharField(required=False, help_text=_("Comma separated positions on the stream, from 0 to 1"))
+    geom = gis_forms.GeometryField(required=False, srid=settings.SRID,
+                                   help_text=_("Points or lines of a reference segmentation"))
+    tolerance = forms.FloatField(required=False, min_value=0,
+                                 help_text=_("Maximum distance of reference segmentation to the stream"))
+    topology_types = forms.MultipleChoiceField(required=False, choices=(('status', _("Status")),
+                                                                        ('morphology', _("Morphology"))))
+
+    def clean_positions(self):
+        positions = self.cleaned_data['positions']
+        try:
+            positions = [float(position) for position in positions.split(',') if position.strip()]
+        except ValueError:
+            raise forms.ValidationError(_("Positions must be numbers separated by commas"))
+        if any(not 0 <= position <= 1 for position in positions):
+            raise forms.ValidationError(_("Positions must be between 0 and 1"))
+        return positions
+
+    def clean_geom(self):
+        geom = self.cleaned_data['geom']
+        if geom and geom.dims > 1:
+            raise forms.ValidationError(_("Reference segmentation must be points or lines"))
+        return geom
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('positions') and not cleaned_data.get('geom'):
+            raise forms.ValidationError(_("Give positions or a reference segmentation"))
+        return cleaned_data
+
+
+class DistanceToSourceForm(forms.Form):
+    lng_distance = forms.FloatField()
+    lat_distance = forms.FloatField()
+    radius = forms.FloatField(required=False, min_value=0, help_text=_("Maximum distance of the point to streams"))
+
+
+class ReferencePointsForm(forms.Form):
+    geom = gis_forms.GeometryField(srid=settings.SRID, help_text=_("Points to reference on streams"))
+    radius = forms.FloatField(required=False, min_value=0, help_text=_("Maximum distance of points to streams"))
+
+    def clean_geom(self):
+        geom = self.cleaned_data['geom']
+        if geom.geom_type not in ('Point', 'MultiPoint'):
+            raise forms.ValidationError(_("Geometry must be points"))
+        return geom
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.gis.gdal import DataSource
+from django.core.management import BaseCommand, CommandError
+
+from georiviere.river.models import Stream, Topology
+
+
+class Command(BaseCommand):
+    help = "Cut statuses and morphologies of a stream at many positions, or at points of a reference segmentation layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('stream', type=int, help="Id of the stream to cut.")
+        parser.add_argument('--positions', '-p', action='store', dest='positions', default='',
+                            help="Comma separated positions on the stream, from 0 to 1.")
+        parser.add_argument('--layer', '-l', action='store', dest='layer',
+                            help="File of a reference segmentation: points, or lines cut at their ends.")
+        parser.add_argument('--tolerance', '-t', action='store', dest='tolerance', type=float,
+                            default=settings.SNAP_DISTANCE,
+                            help=f"Maximum distance of the reference segmentation to the stream. "
+                                 f"Default is {settings.SNAP_DISTANCE}.")
+        parser.add_argument('--type', action='append', dest='topology_types', choices=('status', 'morphology'),
+                            help="Type of objects to cut, can be repeated. Default is status and morphology.")
+
+    def handle(self, *args, **options):
+        try:
+            stream = Stream.objects.get(pk=options.get('stream'))
+        except Stream.DoesNotExist:
+            raise CommandError(f"Stream {options.get('stream')} does not exist")
+        try:
+            positions = [float(position) for position in options.get('positions').split(',') if position.strip()]
+        except ValueError:
+            raise CommandError("Positions must be numbers separated by commas")
+
+        if options.get('layer'):
+            layer = DataSource(options.get('layer'))[0]
+            source_srid = layer.srs.srid if layer.srs and layer.srs.srid else settings.SRID
+            geoms = []
+            for feat in layer:
+                geom = feat.geom.geos
+                geom.srid = source_srid
+                geom.transform(settings.SRID)
+                geoms.append(geom)
+            positions += Topology.objects.locate(stream.pk, geoms, options.get('tolerance'))
+
+        if not positions:
+            raise CommandError("No position to cut the stream at")
+        created = Topology.objects.cut(stream.pk, positions, options.get('topology_types') or ('status', 'morphology'))
+        for topology_type, objects in created.items():
+            self.stdout.write(f"{topology_type.capitalize()}: {len(objects)} cut, "
+                              f"{sum(len(copies) for copies in objects.values())} created")
+        self.stdout.write(self.style.SUCCESS(f"Successfully cut topologies of stream {stream}"))
@@ -1,11 +1,86 @@
+import csv
+import io
+import time
 from itertools import islice
+from multiprocessing import Pool
 
+from django.conf import settings
 from django.contrib.gis.gdal import DataSource
 from django.contrib.gis.geos import Point
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections, transaction
 from django.utils.translation import gettext as _
 
+from georiviere.altimetry import deferred_altimetry, drape
+from georiviere.main.managers import refresh_spatial_relations
+from georiviere.main.signals import refresh_stream_topologies_spatial_relations
 from georiviere.river.models import Stream
+from georiviere.utils.postgresql import session_setting
+
+# Features are copied in this table before being inserted in streams.
+# Its rows keep the id of their stream once inserted, it is used as checkpoint to resume an import:
+# it is a regular table, an unlogged table would be emptied by a crash of the database server.
+STAGING_TABLE = 'river_stream_import'
+COPY_SIZE = 10000
+
+
+def get_stream_defaults():
+    """Returns columns and values of a new stream, except name and geometries"""
+    stream = Stream(name='')
+    fields = [field for field in Stream._meta.concrete_fields
+              if not field.primary_key and field.name not in ('name', 'geom', 'source_location')]
+    return [field.column for field in fields], [field.get_db_prep_save(field.pre_save(stream, True), connection)
+                                                for field in fields]
+
+
+def import_tile(tile, batch_size):
+    """Insert staged features of a tile as streams, drape them and create their topologies, batch by batch.
+    Returns the number of features and the duration of each stage."""
+    columns, values = get_stream_defaults()
+    qn = connection.ops.quote_name
+    stats = {'insert': [0, 0.0], 'altimetry': [0, 0.0], 'topologies': [0, 0.0], 'relations': [0, 0.0]}
+    while True:
+        with transaction.atomic(), deferred_altimetry(), session_setting('georiviere.defer_topologies', 'on'):
+            with connection.cursor() as cursor:
+                start = time.perf_counter()
+                cursor.execute(f"""
+                    WITH batch AS (
+                        SELECT fid, name, geom, nextval(pg_get_serial_sequence(%s, 'id')) AS stream_id
+                        FROM (SELECT fid, name, geom FROM {STAGING_TABLE}
+                              WHERE tile = %s AND stream_id IS NULL ORDER BY fid LIMIT %s) b
+                    ),
+                    streams AS (
+                        INSERT INTO {qn(Stream._meta.db_table)} (id, name, geom, source_location,
+                                                                 {', '.join(qn(column) for column in columns)})
+                        SELECT stream_id, name, geom, ST_StartPoint(geom), {', '.join(['%s'] * len(values))}
+                        FROM batch
+                    )
+                    UPDATE {STAGING_TABLE} s SET stream_id = b.stream_id
+                    FROM batch b WHERE s.fid = b.fid
+                    RETURNING s.stream_id
+                """, [Stream._meta.db_table, tile, batch_size] + values)
+                pks = [row[0] for row in cursor.fetchall()]
+                stats['insert'][0] += len(pks)
+                stats['insert'][1] += time.perf_counter() - start
+                if not pks:
+                    break
+
+                start = time.perf_counter()
+                drape(Stream, pks)
+                stats['altimetry'][0] += len(pks)
+                stats['altimetry'][1] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                cursor.execute("SELECT create_stream_topologies(%s)", [pks])
+                stats['topologies'][0] += len(pks)
+                stats['topologies'][1] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                refresh_spatial_relations(Stream, pks)
+                refresh_stream_topologies_spatial_relations(pks)
+                stats['relations'][0] += len(pks)
+                stats['relations'][1] += time.perf_counter() - start
+    return stats
 
 
 class Command(BaseCommand):
@@ -17,10 +92,18 @@ class Command(BaseCommand):
                             help="Attribute name in file to use as river name")
         parser.add_argument('--flush', '-f', action='store_true', dest='flush', default=False,
                             help="Flush rivers before import.")
-        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', default=50,
+        parser.add_argument('--batch-size', '-bs', action='store', dest='batch_size', type=int, default=50,
                             help="Size of batch to use for bulk_create. Default is 50.")
         parser.add_argument('--default-name-attribute', '-nd', action='store', dest='default_name', default=_('River'),
                             help="Default name to use if attribute name specified is empty")
+        parser.add_argument('--fast', action='store_true', dest='fast', default=False,
+                            help="Copy features in a staging table, then create streams, altimetry and topologies "
+                                 "set-wise.")
+        parser.add_argument('--jobs', '-j', action='store', dest='jobs', type=int, default=1,
+                            help="Number of processes used with --fast, features are split by spatial tiles. "
+                                 "Default is 1.")
+        parser.add_argument('--resume', '-r', action='store_true', dest='resume', default=False,
+                            help="Resume an interrupted --fast import.")
 
     def handle(self, *args, **options):
         file_path = options.get('file_path')
@@ -38,6 +121,9 @@ class Command(BaseCommand):
             Stream.objects.truncate()
             self.stdout.write(self.style.SUCCESS("done!"))
 
+        if options.get('fast'):
+            return self.handle_fast(layer, name_column, default_name, batch_size, options)
+
         objs = (Stream(geom=feat.geom.geos,
                        source_location=Point(feat.geom.geos[0]),
                        name=feat.get(name_column) or default_name) for feat in layer if feat.geom.geos.geom_typeid == 1)
@@ -49,9 +135,89 @@ class Command(BaseCommand):
                 break
             self.stdout.write(f"{count} / {total_count}", ending="")
             try:
-                Stream.objects.bulk_create(batch, batch_size)
+                streams = Stream.objects.bulk_create(batch, batch_size)
+                # No signal is sent by bulk_create
+                pks = [stream.pk for stream in streams]
+                refresh_spatial_relations(Stream, pks)
+                refresh_stream_topologies_spatial_relations(pks)
                 self.stdout.write(self.style.SUCCESS(" ok!"))
             except Exception:
                 self.stdout.write(self.style.ERROR(" error!"))
 
         self.stdout.write(self.style.SUCCESS(f"Successfully import {total_count} rivers and associated morphologies / status"))
+
+    def write_rate(self, stage, count, duration):
+        self.stdout.write(f"{stage}: {count} features in {duration:.1f}s ({count / duration if duration else 0:.0f} features/s)")
+
+    def staging_table_exists(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [STAGING_TABLE])
+            return cursor.fetchone()[0]
+
+    def copy_features(self, layer, name_column, default_name, jobs):
+        """Copy LineString features in the staging table and split them in spatial tiles"""
+        source_srid = layer.srs.srid if layer.srs and layer.srs.srid else settings.SRID
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {STAGING_TABLE} "
+                           f"(fid integer PRIMARY KEY, name text, geom geometry, tile integer, stream_id integer)")
+            features = ((feat.fid, feat.get(name_column) or default_name, feat.geom.hex)
+                        for feat in layer if feat.geom.geos.geom_typeid == 1)
+            while True:
+                rows = list(islice(features, COPY_SIZE))
+                if not rows:
+                    break
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {STAGING_TABLE} (fid, name, geom) FROM STDIN WITH (FORMAT csv)", buffer)
+            # Tiles follow geohash order, so that each process works on a compact area
+            cursor.execute(f"""
+                UPDATE {STAGING_TABLE} s SET geom = t.geom, tile = t.tile
+                FROM (SELECT fid, geom,
+                             ntile(%(jobs)s) OVER (ORDER BY ST_GeoHash(ST_Transform(ST_StartPoint(geom), 4326))) AS tile
+                      FROM (SELECT fid, ST_Force2D(ST_Transform(ST_SetSRID(geom, %(source_srid)s), %(srid)s)) AS geom
+                            FROM {STAGING_TABLE}) g) t
+                WHERE s.fid = t.fid
+            """, {'jobs': jobs, 'source_srid': source_srid, 'srid': settings.SRID})
+            cursor.execute(f"SELECT count(*) FROM {STAGING_TABLE}")
+            return cursor.fetchone()[0]
+
+    def handle_fast(self, layer, name_column, default_name, batch_size, options):
+        jobs = max(options.get('jobs'), 1)
+        start = time.perf_counter()
+        if options.get('resume'):
+            if not self.staging_table_exists():
+                raise CommandError("No interrupted import to resume.")
+            self.stdout.write("Resume interrupted import")
+        else:
+            if self.staging_table_exists():
+                raise CommandError("An interrupted import exists, resume it with --resume "
+                                   f"or delete it with: DROP TABLE {STAGING_TABLE};")
+            count = self.copy_features(layer, name_column, default_name, jobs)
+            self.write_rate("Copy", count, time.perf_counter() - start)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT DISTINCT tile FROM {STAGING_TABLE} WHERE stream_id IS NULL ORDER BY tile")
+            tiles = [row[0] for row in cursor.fetchall()]
+
+        import_start = time.perf_counter()
+        if jobs == 1:
+            results = [import_tile(tile, batch_size) for tile in tiles]
+        else:
+            # Processes open their own database connection
+            connections.close_all()
+            with Pool(jobs) as pool:
+                results = pool.starmap(import_tile, [(tile, batch_size) for tile in tiles])
+        import_duration = time.perf_counter() - import_start
+
+        for stage in ('insert', 'altimetry', 'topologies', 'relations'):
+            count = sum(result[stage][0] for result in results)
+            # Stages run in parallel in each process
+            self.write_rate(stage.capitalize(), count, sum(result[stage][1] for result in results) / min(jobs, len(tiles) or 1))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+        total = sum(result['insert'][0] for result in results)
+        self.write_rate("Total", total, time.perf_counter() - start)
+        self.stdout.write(self.style.SUCCESS(f"Successfully import {total} rivers and associated morphologies / status "
+                                             f"in {import_duration:.1f}s"))
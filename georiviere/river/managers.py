@@ -1,6 +1,303 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.postgres.fields import DecimalRangeField
+from django.db import connection, models, transaction
+from django.db.models import Func
+from django.db.models.query import ModelIterable
+from psycopg2.extras import NumericRange
+
+from georiviere.altimetry import deferred_altimetry
+from georiviere.main.managers import DISTANCE_SQL, LOCATE_SQL, refresh_spatial_relations
+from georiviere.main.models import DistanceToSource, DistanceToSourceJob
 from georiviere.utils.mixins.managers import TruncateManagerMixin
+from georiviere.utils.postgresql import session_setting
 
 
 class RiverManager(TruncateManagerMixin, models.Manager):
-    pass
+    def nearest(self, point, count=1, radius=None, stream_ids=None):
+        """
+        Returns the streams closest to a point, closest first, in one query using the spatial index (KNN).
+        Streams farther than radius are ignored. Each stream has `distance` to the point, `position` (from 0 to 1)
+        and `snapped` point of the stream closest to the point, and `distance_to_source` of the point.
+        """
+        if point.srid != settings.SRID:
+            point = point.transform(settings.SRID, clone=True)
+        qn = connection.ops.quote_name
+        streams = list(self.raw(f"""
+            SELECT s.id, s.name, s.geom, s.source_location,
+                   ST_Distance(s.geom, o.geom) AS distance,
+                   l.locate_object AS position,
+                   ST_X(ST_ClosestPoint(s.geom, o.geom)) AS snapped_x,
+                   ST_Y(ST_ClosestPoint(s.geom, o.geom)) AS snapped_y,
+                   {DISTANCE_SQL} AS distance_to_source
+            FROM (SELECT %(point)s::geometry AS geom) o
+            CROSS JOIN LATERAL (
+                SELECT id, name, geom, source_location FROM {qn(self.model._meta.db_table)}
+                WHERE (%(radius)s::float IS NULL OR ST_DWithin(geom, o.geom, %(radius)s))
+                AND (%(stream_ids)s::integer[] IS NULL OR id = ANY(%(stream_ids)s::integer[]))
+                ORDER BY geom <-> o.geom
+                LIMIT %(count)s
+            ) s,
+            {LOCATE_SQL}
+            ORDER BY distance
+        """, {'point': point.ewkb.hex(), 'radius': radius, 'count': count,
+              'stream_ids': list(stream_ids) if stream_ids is not None else None}))
+        for stream in streams:
+            stream.snapped = Point(stream.snapped_x, stream.snapped_y, srid=settings.SRID)
+        return streams
+
+    def reference(self, points, radius=None, stream_ids=None):
+        """
+        Linear referencing of many points in one query: returns, in the order of points, a dict with `stream` id
+        of the nearest stream, `snapped` point, `position` (from 0 to 1) on the stream, `distance` to the stream
+        and `distance_to_source`, or None if no stream is within radius.
+        stream_ids, in the order of points, gives the stream to reference each point on (None for the nearest).
+        """
+        points = [point if point.srid == settings.SRID else point.transform(settings.SRID, clone=True)
+                  for point in points]
+        if not points:
+            return []
+        stream_ids = list(stream_ids) if stream_ids is not None else [None] * len(points)
+        results = self._reference(
+            "SELECT ord, geom, stream_id "
+            "FROM unnest(%s::geometry[], %s::integer[]) WITH ORDINALITY AS p(geom, stream_id, ord)",
+            [[point.ewkb.hex() for point in points], stream_ids], radius)
+        return [results.get(i) for i in range(1, len(points) + 1)]
+
+    def reference_objects(self, queryset, radius=None):
+        """
+        Linear referencing of objects of a queryset on their nearest stream in one query,
+        returns {object pk: result of `reference`}
+        """
+        sql, params = queryset.values('pk', 'geom').query.sql_with_params()
+        return self._reference(f"SELECT ord, geom, NULL::integer AS stream_id FROM ({sql}) AS q(ord, geom)",
+                               list(params), radius)
+
+    def _reference(self, objects_sql, params, radius):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH o AS ({objects_sql})
+                SELECT o.ord, s.id, ST_Distance(s.geom, o.geom), l.locate_object,
+                       ST_X(ST_ClosestPoint(s.geom, o.geom)), ST_Y(ST_ClosestPoint(s.geom, o.geom)),
+                       {DISTANCE_SQL}
+                FROM o
+                CROSS JOIN LATERAL (
+                    SELECT id, geom, source_location FROM {qn(self.model._meta.db_table)}
+                    WHERE (o.stream_id IS NULL OR id = o.stream_id)
+                    AND (%s::float IS NULL OR ST_DWithin(geom, o.geom, %s))
+                    ORDER BY geom <-> o.geom
+                    LIMIT 1
+                ) s,
+                {LOCATE_SQL}
+            """, params + [radius, radius])
+            return {
+                ord: {
+                    'stream': stream_id,
+                    'snapped': Point(x, y, srid=settings.SRID),
+                    'position': position,
+                    'distance': distance,
+                    'distance_to_source': distance_to_source,
+                }
+                for ord, stream_id, distance, position, x, y, distance_to_source in cursor.fetchall()
+            }
+
+
+class TopologyInterval(Func):
+    """Positions of a topology on its stream as a numrange, bounds included.
+    Same expression as river_topology_interval_idx index."""
+    function = 'numrange'
+    template = "%(function)s(%(expressions)s::numeric, '[]')"
+    arg_joiner = '::numeric, '
+    output_field = DecimalRangeField()
+
+    def __init__(self, start_position='start_position', end_position='end_position', **extra):
+        super().__init__(start_position, end_position, **extra)
+
+
+class TopologyManager(models.Manager):
+    def overlapping(self, stream_id, start_position, end_position):
+        """Topologies of a stream overlapping an interval of positions, bounds included"""
+        return self.annotate(interval=TopologyInterval()).filter(
+            stream_id=stream_id, interval__overlap=NumericRange(start_position, end_position, '[]')
+        )
+
+    def resolve_overlaps(self, topology_ids, topology_type):
+        """
+        Returns {topology id: [objects of topology_type ('status', 'morphology') overlapping it]} for many topologies,
+        in two queries. Objects are ordered by position on their stream.
+        """
+        topology_ids = list(topology_ids)
+        if not topology_ids:
+            return {}
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT t.id, o.id
+                FROM {self.model._meta.db_table} t
+                JOIN {self.model._meta.db_table} o ON o.stream_id = t.stream_id
+                AND numrange(o.start_position::numeric, o.end_position::numeric, '[]')
+                    && numrange(t.start_position::numeric, t.end_position::numeric, '[]')
+                WHERE t.id = ANY(%s)
+            """, [topology_ids])
+            pairs = cursor.fetchall()
+        model = self.model._meta.get_field(topology_type).related_model
+        objects = {
+            obj.topology_id: obj
+            for obj in model.objects.filter(topology_id__in={pair[1] for pair in pairs}).select_related('topology')
+        }
+        overlaps = {topology_id: [] for topology_id in topology_ids}
+        for topology_id, overlapping_id in pairs:
+            if overlapping_id in objects:
+                overlaps[topology_id].append(objects[overlapping_id])
+        for overlapping in overlaps.values():
+            overlapping.sort(key=lambda obj: (obj.topology.start_position, obj.topology.end_position))
+        return overlaps
+
+    def locate(self, stream_id, geoms, tolerance=settings.SNAP_DISTANCE):
+        """
+        Returns positions on a stream of points and of line ends of a reference segmentation layer,
+        ignoring geometries farther than tolerance from the stream
+        """
+        from georiviere.river.models import Stream
+
+        if not geoms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT DISTINCT ST_LineLocatePoint(s.geom, d.geom)
+                FROM {Stream._meta.db_table} s,
+                     unnest(%s::geometry[]) g,
+                     ST_Dump(g) part,
+                     ST_DumpPoints(CASE WHEN ST_Dimension(part.geom) = 0 THEN part.geom
+                                        ELSE ST_Boundary(part.geom) END) d
+                WHERE s.id = %s AND ST_DWithin(s.geom, d.geom, %s)
+                ORDER BY 1
+            """, [[geom.ewkb.hex() for geom in geoms], stream_id, tolerance])
+            return [row[0] for row in cursor.fetchall()]
+
+    def cut(self, stream_id, positions, topology_types=('status', 'morphology'), topology_ids=None):
+        """
+        Cut objects of topology types ('status', 'morphology') of a stream at many positions, in one transaction.
+        Each cut object keeps its last segment, a copy of the object is created on each other segment.
+        Geometries and altimetry are sliced set-wise from the stream, the DEM is not sampled again.
+        Returns {topology type: {cut object id: [ids of created objects]}}.
+        """
+        positions = sorted({float(position) for position in positions if 0 < position < 1})
+        result = {}
+        with transaction.atomic(), deferred_altimetry(), session_setting('georiviere.defer_topologies', 'on'):
+            for topology_type in topology_types:
+                model = self.model._meta.get_field(topology_type).related_model
+                result[topology_type] = self._cut(model, stream_id, positions, topology_ids)
+        return result
+
+    def _cut(self, model, stream_id, positions, topology_ids=None):
+        from georiviere.river.models import Stream
+
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        topology_table = qn(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT o.id, t.id, t.start_position, t.qualified, array_agg(p ORDER BY p)
+                FROM {topology_table} t
+                JOIN {table} o ON o.topology_id = t.id
+                JOIN unnest(%s::float8[]) p ON p > t.start_position AND p < t.end_position
+                WHERE t.stream_id = %s AND (%s::integer[] IS NULL OR t.id = ANY(%s::integer[]))
+                GROUP BY o.id, t.id
+            """, [positions, stream_id, topology_ids, topology_ids])
+            cuts = cursor.fetchall()
+            if not cuts:
+                return {}
+
+            # Cut objects keep their last segment
+            cursor.execute(f"""
+                UPDATE {topology_table} t SET start_position = v.start_position
+                FROM unnest(%s::integer[], %s::float8[]) v(id, start_position)
+                WHERE t.id = v.id
+            """, [[cut[1] for cut in cuts], [cut[4][-1] for cut in cuts]])
+
+            topologies = self.bulk_create([
+                self.model(stream_id=stream_id, start_position=start, end_position=end, qualified=qualified)
+                for object_id, topology_id, start_position, qualified, cut_positions in cuts
+                for start, end in zip([start_position] + cut_positions[:-1], cut_positions)
+            ])
+            object_ids = [object_id for object_id, topology_id, start_position, qualified, cut_positions in cuts
+                          for i in range(len(cut_positions))]
+
+            # Copies of cut objects, with geometries of their segment
+            columns = [qn(field.column) for field in model._meta.concrete_fields
+                       if not field.primary_key and field.name not in ('topology', 'geom', 'geom_3d',
+                                                                       'date_insert', 'date_update')]
+            cursor.execute(f"""
+                INSERT INTO {table} (topology_id, geom, date_insert, date_update, {', '.join(columns)})
+                SELECT v.topology_id, ST_LineSubstring(s.geom, t.start_position, t.end_position), NOW(), NOW(),
+                       {', '.join(f'o.{column}' for column in columns)}
+                FROM unnest(%s::integer[], %s::integer[]) v(object_id, topology_id)
+                JOIN {table} o ON o.id = v.object_id
+                JOIN {topology_table} t ON t.id = v.topology_id
+                JOIN {qn(Stream._meta.db_table)} s ON s.id = t.stream_id
+                RETURNING id, topology_id
+            """, [object_ids, [topology.pk for topology in topologies]])
+            created = dict(cursor.fetchall())
+            copies = [(object_id, created[topology.pk]) for object_id, topology in zip(object_ids, topologies)]
+
+            for field in model._meta.many_to_many:
+                through = field.remote_field.through
+                cursor.execute(f"""
+                    INSERT INTO {qn(through._meta.db_table)} ({qn(field.m2m_column_name())},
+                                                             {qn(field.m2m_reverse_name())})
+                    SELECT v.copy_id, m.{qn(field.m2m_reverse_name())}
+                    FROM unnest(%s::integer[], %s::integer[]) v(object_id, copy_id)
+                    JOIN {qn(through._meta.db_table)} m ON m.{qn(field.m2m_column_name())} = v.object_id
+                """, [[copy[0] for copy in copies], [copy[1] for copy in copies]])
+
+            # Geometries and altimetry are sliced from the stream, already draped
+            cursor.execute("SELECT slice_topologies(%s)",
+                           [[cut[1] for cut in cuts] + [topology.pk for topology in topologies]])
+            cursor.execute(f"UPDATE {table} SET date_update = NOW() WHERE id = ANY(%s)", [[cut[0] for cut in cuts]])
+
+        pks = [cut[0] for cut in cuts] + [copy[1] for copy in copies]
+        # Objects are written in bulk, no signal is sent
+        if settings.DISTANCE_TO_SOURCE_SYNCHRONOUS:
+            DistanceToSource.objects.refresh_for_objects(model, pks)
+        else:
+            DistanceToSourceJob.objects.enqueue_objects(model, pks)
+        refresh_spatial_relations(model, pks)
+
+        result = {cut[0]: [] for cut in cuts}
+        for object_id, copy_id in copies:
+            result[object_id].append(copy_id)
+        return result
+
+
+class TopologyObjectQuerySet(models.QuerySet):
+    """QuerySet of objects on a topology (status, morphology)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._overlapping_types = ()
+        self._overlapping_done = False
+
+    def with_overlapping(self, *topology_types):
+        """Resolve objects of other topology types overlapping each object in two queries by type (see get_topology),
+        e.g. for list exports"""
+        clone = self._chain()
+        clone._overlapping_types = clone._overlapping_types + topology_types
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._overlapping_types = self._overlapping_types
+        return clone
+
+    def _fetch_all(self):
+        super()._fetch_all()
+        if self._overlapping_types and not self._overlapping_done and self._iterable_class is ModelIterable:
+            from georiviere.river.models import Topology
+
+            for topology_type in self._overlapping_types:
+                overlaps = Topology.objects.resolve_overlaps({obj.topology_id for obj in self._result_cache},
+                                                             topology_type)
+                for obj in self._result_cache:
+                    obj.__dict__.setdefault('_overlapping_topologies', {})[topology_type] = overlaps[obj.topology_id]
+            self._overlapping_done = True
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 15:00
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('river', '0020_stream_geom_simplified'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        # Same expression as river.managers.TopologyInterval, used by overlap queries
+        migrations.RunSQL(
+            "CREATE INDEX river_topology_interval_idx ON river_topology USING gist "
+            "(stream_id, numrange(start_position::numeric, end_position::numeric, '[]'));",
+            "DROP INDEX river_topology_interval_idx;",
+        ),
+    ]
@@ -2,7 +2,6 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
-from django.db.models import Q
 from django.template.defaultfilters import slugify
 from django.utils.translation import gettext_lazy as _
 
@@ -19,13 +18,12 @@ from mapentity.models import MapEntityMixin
 from georiviere.main.models import AddPropertyBufferMixin
 from georiviere.altimetry import AltimetryMixin
 from georiviere.finances_administration.models import AdministrativeFile
-from georiviere.functions import ClosestPoint
 from georiviere.knowledge.models import Knowledge, FollowUp
-from georiviere.main.models import DistanceToSource
+from georiviere.main.models import DistanceToSource, SimplifiedGeometryMixin
 from georiviere.observations.models import Station
 from georiviere.proceeding.models import Proceeding
 from georiviere.maintenance.models import Intervention
-from georiviere.river.managers import RiverManager
+from georiviere.river.managers import RiverManager, TopologyManager
 from georiviere.studies.models import Study
 from georiviere.watershed.mixins import WatershedPropertiesMixin
 
@@ -36,15 +34,11 @@ class TopologyMixin(object):
     structure_verbose_name = _("Structure")
 
     def get_topology(self, topology_type):
-        start_position = self.topology.start_position
-        end_position = self.topology.end_position
-        topologies = self.topology.stream.topologies.filter(
-            Q(start_position__lte=start_position, end_position__gte=start_position) | Q(
-                start_position__lte=end_position,
-                end_position__gte=end_position),
-            **{f'{topology_type}__isnull': False})
-        final_topologies = [getattr(topology, topology_type) for topology in topologies]
-        return final_topologies
+        """Returns objects of a topology type ('status', 'morphology') overlapping this object on its stream"""
+        overlapping = getattr(self, '_overlapping_topologies', {})
+        if topology_type in overlapping:
+            return overlapping[topology_type]
+        return Topology.objects.resolve_overlaps([self.topology_id], topology_type)[self.topology_id]
 
 
 class ClassificationWaterPolicy(StructureOrNoneRelated):
@@ -59,7 +53,7 @@ class ClassificationWaterPolicy(StructureOrNoneRelated):
 
 
 class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesMixin, ZoningPropertiesMixin,
-             MapEntityMixin, AltimetryMixin, StructureRelated):
+             MapEntityMixin, AltimetryMixin, SimplifiedGeometryMixin, StructureRelated):
     """Model for stream"""
 
     class FlowChoices(models.IntegerChoices):
@@ -133,6 +127,12 @@ class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesM
                 dates_to_check.append(getattr(self, prop).latest('date_update').get_date_update())
         if all([is_file_uptodate(path, date) for date in dates_to_check]):
             return False
+        self.capture_map_image_with_other_objects(rooturl, properties)
+        return True
+
+    def capture_map_image_with_other_objects(self, rooturl, properties):
+        """Capture map image of the stream with other objects, whether it is up-to-date or not"""
+        path = self.get_map_image_path_with_other_objects(properties)
         url = smart_urljoin(rooturl, self.get_detail_url())
         extent = self.get_map_image_extent(3857)
         length = max(extent[2] - extent[0], extent[3] - extent[1])
@@ -144,7 +144,6 @@ class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesM
         size = math.ceil(length * 1.1 * 256 * 2 ** zoom / CIRCUM)
         printcontext = self.get_printcontext_with_other_objects(properties)
         capture_map_image(url, path, size=size, waitfor=self.capture_map_image_waitfor, printcontext=printcontext)
-        return True
 
     @property
     def areas_ordered_area_type(self):
@@ -171,9 +170,9 @@ class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesM
                                                                  self)
 
     def get_topologies(self, value):
-        topologies = self.topologies.filter(**{f'{value}__isnull': False})
-        topologies = [getattr(topology, value) for topology in topologies]
-        return topologies
+        model = Topology._meta.get_field(value).related_model
+        return model.objects.filter(topology__stream=self).select_related('topology') \
+            .order_by('topology__start_position', 'topology__end_position')
 
     def get_map_image_extent(self, srid=settings.API_SRID):
         extent = list(super().get_map_image_extent(srid))
@@ -193,8 +192,7 @@ class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesM
             raise ValueError("Cannot compute snap on unsaved stream")
         if point.srid != self.geom.srid:
             point.transform(self.geom.srid)
-        return self._meta.model.objects.filter(pk=self.pk).annotate(
-            closest_point=ClosestPoint('geom', point)).first().closest_point
+        return self._meta.model.objects.nearest(point, stream_ids=[self.pk])[0].snapped
 
     def distance_to_source(self, element):
         """Returns distance from element to stream source"""
@@ -204,6 +202,12 @@ class Stream(AddPropertyBufferMixin, TimeStampedModelMixin, WatershedPropertiesM
         except DistanceToSource.DoesNotExist:
             return None
 
+    def distances_to_source(self, elements):
+        """Returns distances from many elements, of any models, to stream source, in one query"""
+        distances = DistanceToSource.objects.get_distances([self], elements)
+        return [distances.get((self.pk, ContentType.objects.get_for_model(element).pk, element.pk))
+                for element in elements]
+
 
 class Topology(models.Model):
     stream = models.ForeignKey(Stream, verbose_name=_("Stream"),
@@ -212,6 +216,8 @@ class Topology(models.Model):
     end_position = models.FloatField(verbose_name=_("End position"), db_index=True, default=1)
     qualified = models.BooleanField(verbose_name=_("Qualified"), null=False, default=False)
 
+    objects = TopologyManager()
+
     def __str__(self):
         if hasattr(self, 'status'):
             return _("Status {}").format(self.status)
@@ -1,39 +1,129 @@
 CREATE TRIGGER river_stream_10_elevation
-BEFORE INSERT OR UPDATE OF geom ON river_stream
-FOR EACH ROW EXECUTE PROCEDURE elevation();
+AFTER INSERT ON river_stream
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
 
-CREATE FUNCTION update_topology_geom() RETURNS trigger SECURITY DEFINER AS $$
+CREATE TRIGGER river_stream_10_elevation_update
+AFTER UPDATE ON river_stream
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE elevation();
+
+CREATE FUNCTION slice_elevation_infos(line geometry, start_position float, end_position float)
+RETURNS TABLE (draped geometry, length float, slope float, min_elevation float, max_elevation float,
+               positive_gain float, negative_gain float) AS $$
+    -- Altimetry of a part of a draped line, without sampling the DEM again
+    SELECT d.draped,
+           ST_3DLength(d.draped),
+           CASE WHEN ST_Length(d.draped) > 0
+                THEN (ST_ZMax(d.draped) - ST_ZMin(d.draped)) / ST_Length(d.draped) ELSE 0 END,
+           ST_ZMin(d.draped),
+           ST_ZMax(d.draped),
+           g.positive_gain,
+           g.negative_gain
+    FROM (SELECT ST_LineSubstring(line, start_position, end_position) AS draped) d,
+         LATERAL (SELECT SUM(GREATEST(z.dz, 0)) AS positive_gain, SUM(LEAST(z.dz, 0)) AS negative_gain
+                  FROM (SELECT ST_Z(p.geom) - lag(ST_Z(p.geom)) OVER (ORDER BY p.path) AS dz
+                        FROM ST_DumpPoints(d.draped) p) z) g
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION slice_topologies(topology_ids integer[]) RETURNS void SECURITY DEFINER AS $$
 DECLARE
-    stream_geom geometry;
+    sliced_altimetry text := current_setting('georiviere.sliced_altimetry', true);
 BEGIN
-    SELECT r.geom FROM river_stream r WHERE NEW.stream_id = r.id INTO stream_geom;
-    UPDATE description_morphology
-    SET geom = ST_LINESUBSTRING(stream_geom, NEW.start_position, NEW.end_position)
-    WHERE topology_id = NEW.id;
-    UPDATE description_status
-    SET geom = ST_LINESUBSTRING(stream_geom, NEW.start_position, NEW.end_position)
-    WHERE topology_id = NEW.id;
-    RETURN NEW;
+    -- Geometries and altimetry of morphologies and status are sliced from their stream, already draped.
+    -- Altimetry of streams being deferred, it stays deferred (NULL geom_3d) on their morphologies and status.
+    PERFORM set_config('georiviere.sliced_altimetry', 'on', true);
+
+    UPDATE description_morphology o
+    SET geom = ST_LineSubstring(s.geom, t.start_position, t.end_position),
+        geom_3d = a.draped,
+        length = COALESCE(a.length, o.length),
+        slope = COALESCE(a.slope, o.slope),
+        min_elevation = COALESCE(a.min_elevation, o.min_elevation),
+        max_elevation = COALESCE(a.max_elevation, o.max_elevation),
+        ascent = COALESCE(a.positive_gain, o.ascent),
+        descent = COALESCE(a.negative_gain, o.descent)
+    FROM river_topology t
+    JOIN river_stream s ON s.id = t.stream_id,
+    LATERAL slice_elevation_infos(s.geom_3d, t.start_position, t.end_position) a
+    WHERE o.topology_id = t.id AND t.id = ANY(topology_ids);
+
+    UPDATE description_status o
+    SET geom = ST_LineSubstring(s.geom, t.start_position, t.end_position),
+        geom_3d = a.draped,
+        length = COALESCE(a.length, o.length),
+        slope = COALESCE(a.slope, o.slope),
+        min_elevation = COALESCE(a.min_elevation, o.min_elevation),
+        max_elevation = COALESCE(a.max_elevation, o.max_elevation),
+        ascent = COALESCE(a.positive_gain, o.ascent),
+        descent = COALESCE(a.negative_gain, o.descent)
+    FROM river_topology t
+    JOIN river_stream s ON s.id = t.stream_id,
+    LATERAL slice_elevation_infos(s.geom_3d, t.start_position, t.end_position) a
+    WHERE o.topology_id = t.id AND t.id = ANY(topology_ids);
+
+    -- Callers may be slicing themselves (create_stream_topologies())
+    PERFORM set_config('georiviere.sliced_altimetry', COALESCE(NULLIF(sliced_altimetry, ''), 'off'), true);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION update_topology_geom() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    -- Geometries are sliced set-wise by the caller (Topology.objects.cut(), mass imports),
+    -- or taken from the stream with its altimetry (create_stream_topologies())
+    IF current_setting('georiviere.defer_topologies', true) = 'on'
+       OR current_setting('georiviere.sliced_altimetry', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM slice_topologies(ARRAY[NEW.id]);
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER core_path_10_elevation_iu_tgr
-BEFORE INSERT OR UPDATE ON river_topology
+AFTER INSERT OR UPDATE ON river_topology
 FOR EACH ROW EXECUTE PROCEDURE update_topology_geom();
 
-CREATE FUNCTION create_topologies() RETURNS trigger SECURITY DEFINER AS $$
+CREATE FUNCTION create_stream_topologies(stream_ids integer[]) RETURNS void SECURITY DEFINER AS $$
 DECLARE
-    topology_morphology integer;
-    topology_status integer;
+    sliced_altimetry text := current_setting('georiviere.sliced_altimetry', true);
+BEGIN
+    -- Morphology and status cover the whole stream, they share its altimetry.
+    -- Streams not draped yet are sliced when draped, see update_topologies().
+    PERFORM set_config('georiviere.sliced_altimetry', 'on', true);
+    WITH topologies AS (
+        INSERT INTO river_topology (stream_id, start_position, end_position, qualified)
+        SELECT id, 0, 1, FALSE FROM river_stream WHERE id = ANY(stream_ids)
+        RETURNING id, stream_id
+    )
+    INSERT INTO description_morphology (topology_id, geom, geom_3d, length, slope, min_elevation, max_elevation,
+                                        ascent, descent, description, date_insert, date_update)
+    SELECT t.id, s.geom, s.geom_3d, s.length, s.slope, s.min_elevation, s.max_elevation,
+           s.ascent, s.descent, '', NOW(), NOW()
+    FROM topologies t JOIN river_stream s ON s.id = t.stream_id;
+
+    WITH topologies AS (
+        INSERT INTO river_topology (stream_id, start_position, end_position, qualified)
+        SELECT id, 0, 1, FALSE FROM river_stream WHERE id = ANY(stream_ids)
+        RETURNING id, stream_id
+    )
+    INSERT INTO description_status (topology_id, geom, geom_3d, length, slope, min_elevation, max_elevation,
+                                    ascent, descent, regulation, referencial, description, date_insert, date_update)
+    SELECT t.id, s.geom, s.geom_3d, s.length, s.slope, s.min_elevation, s.max_elevation,
+           s.ascent, s.descent, FALSE, FALSE, '', NOW(), NOW()
+    FROM topologies t JOIN river_stream s ON s.id = t.stream_id;
+
+    PERFORM set_config('georiviere.sliced_altimetry', COALESCE(NULLIF(sliced_altimetry, ''), 'off'), true);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION create_topologies() RETURNS trigger SECURITY DEFINER AS $$
 BEGIN
-    INSERT INTO river_topology (stream_id, start_position, end_position, qualified)
-    VALUES (NEW.id, 0, 1, FALSE)  RETURNING id INTO topology_morphology;
-    INSERT INTO description_morphology (topology_id, geom, description, date_insert, date_update)
-                                                VALUES (topology_morphology, NEW.geom, '', NOW(), NOW());
-    INSERT INTO river_topology (stream_id, start_position, end_position, qualified)
-    VALUES (NEW.id, 0, 1, FALSE)  RETURNING id INTO topology_status;
-    INSERT INTO description_status (topology_id, geom, regulation, referencial, description, date_insert, date_update)
-                                               VALUES (topology_status, NEW.geom, FALSE, FALSE, '', NOW(), NOW());
+    -- Topologies are created set-wise with create_stream_topologies() during mass imports
+    IF current_setting('georiviere.defer_topologies', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+    PERFORM create_stream_topologies(ARRAY[NEW.id]);
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -43,20 +133,33 @@ AFTER INSERT ON river_stream
 FOR EACH ROW EXECUTE PROCEDURE create_topologies();
 
 CREATE FUNCTION update_topologies() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    ids integer[];
 BEGIN
-    UPDATE description_morphology m
-    SET geom = ST_LINESUBSTRING(NEW.geom, t.start_position, t.end_position)
-    FROM river_topology t
-    WHERE m.topology_id = t.id AND t.stream_id = NEW.id;
-
-    UPDATE description_status s
-    SET geom = ST_LINESUBSTRING(NEW.geom, t.start_position, t.end_position)
-    FROM river_topology t
-    WHERE s.topology_id = t.id AND t.stream_id = NEW.id;
-    RETURN NEW;
+    -- Statement level trigger, after elevation triggers (alphabetical order): streams are draped.
+    -- Draping a stream updates its geom_3d, which fires this trigger again from the nested update,
+    -- topologies are sliced from it then. They are sliced on geometry change only if altimetry is deferred.
+    SELECT array_agg(t.id)
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    JOIN river_stream s ON s.id = n.id
+    JOIN river_topology t ON t.stream_id = n.id
+    WHERE n.geom_3d IS DISTINCT FROM o.geom_3d
+       OR (n.geom IS DISTINCT FROM o.geom AND s.geom_3d IS NULL)
+    INTO ids;
+    IF ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+    PERFORM slice_topologies(ids);
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER river_change_geom_update_topology_tgr
-BEFORE UPDATE OF geom ON river_stream
-FOR EACH ROW EXECUTE PROCEDURE update_topologies();
+CREATE TRIGGER river_stream_30_update_topologies
+AFTER UPDATE ON river_stream
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE update_topologies();
+
+CREATE TRIGGER river_stream_20_simplify
+BEFORE INSERT OR UPDATE OF geom ON river_stream
+FOR EACH ROW EXECUTE PROCEDURE simplify_geom();
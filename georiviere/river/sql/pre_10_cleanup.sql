@@ -1,3 +1,6 @@
 DROP FUNCTION IF EXISTS update_topology_geom() CASCADE;
 DROP FUNCTION IF EXISTS update_topologies() CASCADE;
 DROP FUNCTION IF EXISTS create_topologies() CASCADE;
+DROP FUNCTION IF EXISTS create_stream_topologies(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS slice_topologies(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS slice_elevation_infos(geometry, float, float) CASCADE;
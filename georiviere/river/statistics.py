@@ -0,0 +1,77 @@
+from django.db import connection
+
+from georiviere.description.models import Morphology, Status
+from georiviere.river.models import Stream, Topology
+
+
+def get_morphology_statistics_fields():
+    """Morphology attributes whose values are counted in statistics (referential foreign keys)"""
+    return [field for field in Morphology._meta.concrete_fields
+            if field.many_to_one and field.related_model is not Topology]
+
+
+def get_stream_statistics(streams):
+    """
+    Lengths and percentages of streams by status type and by value of each morphology attribute,
+    for one stream or many (e.g. streams of a watershed), in one grouped query.
+    Lengths follow positions of topologies on their stream.
+    Returns {'length': length of streams, 'status_types': [...], 'morphology': {attribute: [...]}},
+    with {'id', 'label', 'length', 'percentage'} for each status type or attribute value.
+    """
+    qn = connection.ops.quote_name
+    streams_sql, params = streams.values('pk').query.sql_with_params()
+    status_types = Status._meta.get_field('status_types')
+    status_type_model = status_types.related_model
+    fields = get_morphology_statistics_fields()
+    labels = ', '.join(f'l{i}.label' for i in range(len(fields)))
+    label_joins = '\n'.join(
+        f'LEFT JOIN {qn(field.related_model._meta.db_table)} l{i} ON l{i}.id = o.{qn(field.column)}'
+        for i, field in enumerate(fields)
+    )
+    # One grouping set by attribute, GROUPING() tells which attribute a row is about
+    attribute = ' '.join(f"WHEN GROUPING(o.{qn(field.column)}) = 0 THEN '{field.name}'" for field in fields)
+    grouping_sets = ', '.join(f'(o.{qn(field.column)}, l{i}.label)' for i, field in enumerate(fields))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH stream AS (
+                SELECT id, ST_Length(geom) AS length FROM {qn(Stream._meta.db_table)} WHERE id IN ({streams_sql})
+            ),
+            topology AS (
+                SELECT t.id, (t.end_position - t.start_position) * s.length AS length
+                FROM {qn(Topology._meta.db_table)} t JOIN stream s ON s.id = t.stream_id
+            )
+            SELECT 'status_types', st.id, st.label, SUM(t.length)
+            FROM {qn(Status._meta.db_table)} o
+            JOIN topology t ON t.id = o.topology_id
+            JOIN {qn(status_types.remote_field.through._meta.db_table)} m
+              ON m.{qn(status_types.m2m_column_name())} = o.id
+            JOIN {qn(status_type_model._meta.db_table)} st ON st.id = m.{qn(status_types.m2m_reverse_name())}
+            GROUP BY st.id, st.label
+            UNION ALL
+            SELECT CASE {attribute} END,
+                   COALESCE({', '.join(f'o.{qn(field.column)}' for field in fields)}),
+                   COALESCE({labels}),
+                   SUM(t.length)
+            FROM {qn(Morphology._meta.db_table)} o
+            JOIN topology t ON t.id = o.topology_id
+            {label_joins}
+            GROUP BY GROUPING SETS ({grouping_sets})
+            UNION ALL
+            SELECT 'length', NULL, NULL, SUM(length) FROM stream
+        """, params)
+        rows = cursor.fetchall()
+
+    total = next(length for group, pk, label, length in rows if group == 'length') or 0
+    statistics = {'length': round(total, 1), 'status_types': [], 'morphology': {field.name: [] for field in fields}}
+    for group, pk, label, length in sorted(rows, key=lambda row: (row[2] is None, row[2] or '')):
+        if group == 'length':
+            continue
+        values = statistics['status_types'] if group == 'status_types' else statistics['morphology'][group]
+        values.append({
+            'id': pk,
+            'label': label,
+            'length': round(length, 1),
+            'percentage': round(length / total * 100, 2) if total else 0,
+        })
+    return statistics
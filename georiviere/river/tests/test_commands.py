@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from georiviere.description.models import Morphology, Status
+from georiviere.river.management.commands.load_rivers import STAGING_TABLE
+from georiviere.river.models import Stream
+
+TEST_DATA_PATH = settings.PROJECT_DIR / 'river' / 'tests' / 'data'
+
+
+class LoadRiversTest(TestCase):
+    def test_load_rivers(self):
+        output = StringIO()
+        call_command('load_rivers', TEST_DATA_PATH / 'streams.geojson', stdout=output)
+        self.assertEqual(Stream.objects.count(), 3)
+        self.assertEqual(Morphology.objects.count(), 3)
+        self.assertEqual(Status.objects.count(), 3)
+
+    def test_load_rivers_fast(self):
+        output = StringIO()
+        call_command('load_rivers', TEST_DATA_PATH / 'streams.geojson', '--fast', stdout=output)
+        self.assertIn('features/s', output.getvalue())
+        self.assertEqual(Stream.objects.count(), 3)
+        self.assertEqual(Stream.objects.filter(name='River').count(), 1)
+        stream = Stream.objects.get(name='Le Doubs')
+        self.assertEqual(stream.source_location.coords, (900000, 6650000))
+        self.assertIsNotNone(stream.geom_3d)
+        self.assertEqual(Morphology.objects.filter(topology__stream=stream).count(), 1)
+        self.assertEqual(Status.objects.filter(topology__stream=stream).count(), 1)
+        self.assertTrue(Status.objects.get(topology__stream=stream).geom.equals_exact(stream.geom, 0.001))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [STAGING_TABLE])
+            self.assertIsNone(cursor.fetchone()[0])
+
+    def test_load_rivers_fast_resume(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {STAGING_TABLE} "
+                           f"(fid integer PRIMARY KEY, name text, geom geometry, tile integer, stream_id integer)")
+            cursor.execute(f"INSERT INTO {STAGING_TABLE} VALUES "
+                           f"(1, 'Resumed', ST_GeomFromText('LINESTRING(900000 6650000, 901000 6651000)', %s), 1, NULL)",
+                           [settings.SRID])
+        with self.assertRaisesRegex(CommandError, "An interrupted import exists"):
+            call_command('load_rivers', TEST_DATA_PATH / 'streams.geojson', '--fast', stdout=StringIO())
+        call_command('load_rivers', TEST_DATA_PATH / 'streams.geojson', '--fast', '--resume', stdout=StringIO())
+        self.assertEqual(list(Stream.objects.values_list('name', flat=True)), ['Resumed'])
+        self.assertEqual(Morphology.objects.count(), 1)
+
+    def test_load_rivers_fast_resume_without_import(self):
+        with self.assertRaisesRegex(CommandError, "No interrupted import to resume"):
+            call_command('load_rivers', TEST_DATA_PATH / 'streams.geojson', '--fast', '--resume', stdout=StringIO())
+
+
+class CutTopologiesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = Stream.objects.create(
+            name='Stream', geom=LineString((900000, 6650000), (901000, 6650000), srid=settings.SRID)
+        )
+
+    def test_cut_topologies_positions(self):
+        output = StringIO()
+        call_command('cut_topologies', self.stream.pk, '--positions', '0.25,0.5', stdout=output)
+        self.assertIn('Status: 1 cut, 2 created', output.getvalue())
+        self.assertIn('Morphology: 1 cut, 2 created', output.getvalue())
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 3)
+
+    def test_cut_topologies_layer(self):
+        output = StringIO()
+        call_command('cut_topologies', self.stream.pk, '--layer', TEST_DATA_PATH / 'segmentation.geojson',
+                     '--type', 'status', stdout=output)
+        self.assertIn('Status: 1 cut, 3 created', output.getvalue())
+        self.assertEqual(Morphology.objects.filter(topology__stream=self.stream).count(), 1)
+
+    def test_cut_topologies_nothing(self):
+        with self.assertRaisesRegex(CommandError, "No position"):
+            call_command('cut_topologies', self.stream.pk, stdout=StringIO())
+        with self.assertRaisesRegex(CommandError, "does not exist"):
+            call_command('cut_topologies', 0, '--positions', '0.5', stdout=StringIO())
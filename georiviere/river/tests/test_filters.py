@@ -1,9 +1,13 @@
-from django.contrib.gis.geos import LineString
+from django.contrib.gis.geos import LineString, MultiPolygon, Polygon
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from geotrek.zoning.tests.factories import CityFactory, DistrictFactory
 
 from georiviere.portal.tests.factories import PortalFactory
 from georiviere.river.filters import StreamFilterSet
 from georiviere.river.tests.factories import StreamFactory
+from georiviere.watershed.tests.factories import WatershedFactory
 
 
 class ZoningFilterTest(TestCase):
@@ -25,3 +29,28 @@ class ZoningFilterTest(TestCase):
         filter = StreamFilterSet(data={'portals': [self.portal_2, ]})
 
         self.assertEqual(len(filter.qs), 0)
+
+
+class AreaFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((10000, 10000), (20000, 20000)))
+        cls.other_stream = StreamFactory.create(geom=LineString((60000, 60000), (70000, 70000)))
+        area = MultiPolygon(Polygon.from_bbox((0, 0, 30000, 30000)))
+        cls.watershed = WatershedFactory.create(geom=area)
+        cls.city = CityFactory.create(geom=area)
+        cls.district = DistrictFactory.create(geom=area)
+
+    def test_filter_areas(self):
+        for data in ({'watershed': [self.watershed.pk]}, {'city': [self.city.pk]}, {'district': [self.district.pk]}):
+            with CaptureQueriesContext(connection) as queries:
+                qs = list(StreamFilterSet(data=data).qs)
+            self.assertListEqual(qs, [self.stream])
+            # Streams are joined with memberships, geometries are not intersected
+            self.assertNotIn('ST_Intersects', queries[-1]['sql'])
+
+    def test_filter_follows_geometry_changes(self):
+        self.other_stream.geom = LineString((10000, 20000), (20000, 10000))
+        self.other_stream.save()
+        qs = StreamFilterSet(data={'watershed': [self.watershed.pk]}).qs
+        self.assertSetEqual(set(qs), {self.stream, self.other_stream})
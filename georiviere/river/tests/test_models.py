@@ -3,11 +3,14 @@ from unittest import mock
 
 from django.conf import settings
 from django.contrib.gis.geos import Point, LineString
+from django.db import connection, DataError
 from django.test import TestCase, RequestFactory
 
 from georiviere.finances_administration.tests.factories import AdministrativeFileFactory
-from georiviere.description.tests.factories import MorphologyFactory, StatusFactory, UsageFactory
-from georiviere.river.models import DistanceToSource, Stream
+from georiviere.description.tests.factories import MorphologyFactory, StatusFactory, StatusTypeFactory, UsageFactory
+from georiviere.description.models import Morphology, Status
+from georiviere.observations.tests.factories import StationFactory
+from georiviere.river.models import DistanceToSource, Stream, Topology
 from georiviere.river.tests.factories import TopologyFactory, StreamFactory, ClassificationWaterPolicyFactory
 
 
@@ -62,6 +65,114 @@ class TopologyTest(TestCase):
         self.assertEqual(str(lonely_topology), "Topology {}".format(lonely_topology.pk))
 
 
+class TopologyOverlapTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0)))
+        # Stream status is cut in 3 segments, its morphology covers the whole stream and one segment inside
+        cls.status_1 = cls.stream.statuses.get()
+        Topology.objects.filter(pk=cls.status_1.topology_id).update(end_position=0.3)
+        cls.status_2 = StatusFactory.create(topology__stream=cls.stream, topology__start_position=0.3,
+                                            topology__end_position=0.6)
+        cls.status_3 = StatusFactory.create(topology__stream=cls.stream, topology__start_position=0.6,
+                                            topology__end_position=1)
+        cls.morphology_1 = cls.stream.morphologies.get()
+        cls.morphology_2 = MorphologyFactory.create(topology__stream=cls.stream, topology__start_position=0.4,
+                                                    topology__end_position=0.5)
+
+    def test_stream_topologies(self):
+        with self.assertNumQueries(1):
+            self.assertListEqual(list(self.stream.statuses), [self.status_1, self.status_2, self.status_3])
+
+    def test_overlapping(self):
+        topologies = Topology.objects.overlapping(self.stream.pk, 0.35, 0.45)
+        self.assertSetEqual(set(topologies), {self.status_2.topology, self.morphology_1.topology,
+                                              self.morphology_2.topology})
+
+    def test_get_topology(self):
+        with self.assertNumQueries(2):
+            self.assertListEqual(self.morphology_2.status, [self.status_2])
+        # Segments inside the status are found too
+        self.assertListEqual(self.status_2.morphologies, [self.morphology_1, self.morphology_2])
+        self.assertListEqual(self.status_3.morphologies, [self.morphology_1])
+
+    def test_resolve_overlaps(self):
+        topology_ids = [self.status_1.topology_id, self.status_2.topology_id, self.status_3.topology_id]
+        with self.assertNumQueries(2):
+            overlaps = Topology.objects.resolve_overlaps(topology_ids, 'morphology')
+        self.assertDictEqual(overlaps, {
+            self.status_1.topology_id: [self.morphology_1],
+            self.status_2.topology_id: [self.morphology_1, self.morphology_2],
+            self.status_3.topology_id: [self.morphology_1],
+        })
+
+    def test_with_overlapping(self):
+        with self.assertNumQueries(3):
+            statuses = list(Status.objects.filter(topology__stream=self.stream).with_overlapping('morphology')
+                            .order_by('topology__start_position'))
+            self.assertListEqual([status.morphologies for status in statuses],
+                                 [[self.morphology_1], [self.morphology_1, self.morphology_2], [self.morphology_1]])
+
+
+class TopologyCutTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0)))
+        cls.status = cls.stream.statuses.get()
+        cls.status_type = StatusTypeFactory.create()
+        cls.status.status_types.add(cls.status_type)
+        cls.morphology = cls.stream.morphologies.get()
+
+    def test_cut(self):
+        created = Topology.objects.cut(self.stream.pk, [0.75, 0.25, 0.5, 1])
+        self.assertEqual(len(created['status'][self.status.pk]), 3)
+        self.assertEqual(len(created['morphology'][self.morphology.pk]), 3)
+        statuses = list(self.stream.statuses)
+        self.assertListEqual([(status.topology.start_position, status.topology.end_position) for status in statuses],
+                             [(0, 0.25), (0.25, 0.5), (0.5, 0.75), (0.75, 1)])
+        # Cut object keeps its last segment
+        self.assertEqual(statuses[-1], self.status)
+        for status in statuses:
+            self.assertAlmostEqual(status.geom.length, 250)
+            self.assertIsNotNone(status.geom_3d)
+            self.assertListEqual(list(status.status_types.all()), [self.status_type])
+        self.assertEqual(Morphology.objects.filter(topology__stream=self.stream).count(), 4)
+
+    def test_cut_topology_types(self):
+        created = Topology.objects.cut(self.stream.pk, [0.5], ['morphology'])
+        self.assertListEqual(list(created), ['morphology'])
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 1)
+        self.assertEqual(Morphology.objects.filter(topology__stream=self.stream).count(), 2)
+
+    def test_cut_segments_only(self):
+        Topology.objects.cut(self.stream.pk, [0.5])
+        created = Topology.objects.cut(self.stream.pk, [0.25, 0.5])
+        # 0.5 is already a limit of segments
+        self.assertListEqual(list(created['status'].values()), [[Status.objects.get(topology__end_position=0.25).pk]])
+
+    def test_cut_error(self):
+        def failing_cut(*args, **kwargs):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 / 0")
+
+        with mock.patch.object(Topology.objects, '_cut', side_effect=failing_cut):
+            with self.assertRaises(DataError):
+                Topology.objects.cut(self.stream.pk, [0.5])
+        # Settings of the cut are rolled back with it
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('georiviere.defer_altimetry', true), "
+                           "current_setting('georiviere.defer_topologies', true)")
+            self.assertNotIn('on', cursor.fetchone())
+
+    def test_locate(self):
+        positions = Topology.objects.locate(self.stream.pk, [
+            Point(250, 10, srid=settings.SRID),
+            LineString((500, -5), (750, 5), srid=settings.SRID),
+            Point(250, 1000, srid=settings.SRID),
+        ], tolerance=20)
+        self.assertListEqual([round(position, 2) for position in positions], [0.25, 0.5, 0.75])
+
+
 class StreamSourceLocationTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -113,3 +224,60 @@ class SnapTest(TestCase):
         snap = p.snap(Point(3, 46.5, srid=4326))
         self.assertEqual(snap.x, 700000)
         self.assertEqual(snap.y, 6600000)
+
+
+class NearestTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0)), source_location=Point(0, 0))
+        cls.stream_2 = StreamFactory.create(geom=LineString((0, 100), (1000, 100)), source_location=Point(1000, 100))
+
+    def test_nearest(self):
+        with self.assertNumQueries(1):
+            streams = Stream.objects.nearest(Point(250, 10, srid=settings.SRID))
+        self.assertEqual(len(streams), 1)
+        self.assertEqual(streams[0], self.stream)
+        self.assertAlmostEqual(streams[0].distance, 10)
+        self.assertAlmostEqual(streams[0].position, 0.25)
+        self.assertEqual((streams[0].snapped.x, streams[0].snapped.y), (250, 0))
+        self.assertAlmostEqual(streams[0].distance_to_source, 260)
+
+    def test_nearest_count(self):
+        streams = Stream.objects.nearest(Point(250, 80, srid=settings.SRID), count=2)
+        self.assertListEqual(streams, [self.stream_2, self.stream])
+        self.assertAlmostEqual(streams[0].distance_to_source, 770)
+
+    def test_nearest_radius(self):
+        self.assertEqual(len(Stream.objects.nearest(Point(250, 200, srid=settings.SRID), radius=50)), 0)
+        self.assertEqual(len(Stream.objects.nearest(Point(250, 200, srid=settings.SRID), count=2, radius=150)), 1)
+
+    def test_nearest_stream_ids(self):
+        streams = Stream.objects.nearest(Point(250, 10, srid=settings.SRID), stream_ids=[self.stream_2.pk])
+        self.assertEqual(streams[0], self.stream_2)
+
+    def test_reference(self):
+        with self.assertNumQueries(1):
+            results = Stream.objects.reference([Point(250, 10, srid=settings.SRID), Point(250, 80, srid=settings.SRID),
+                                                Point(250, 500, srid=settings.SRID)], radius=100)
+        self.assertEqual(results[0]['stream'], self.stream.pk)
+        self.assertEqual((results[0]['snapped'].x, results[0]['snapped'].y), (250, 0))
+        self.assertAlmostEqual(results[0]['position'], 0.25)
+        self.assertAlmostEqual(results[0]['distance'], 10)
+        self.assertAlmostEqual(results[0]['distance_to_source'], 260)
+        self.assertEqual(results[1]['stream'], self.stream_2.pk)
+        self.assertAlmostEqual(results[1]['distance_to_source'], 770)
+        self.assertIsNone(results[2])
+
+    def test_reference_on_stream(self):
+        results = Stream.objects.reference([Point(250, 10, srid=settings.SRID)], stream_ids=[self.stream_2.pk])
+        self.assertEqual(results[0]['stream'], self.stream_2.pk)
+        self.assertEqual((results[0]['snapped'].x, results[0]['snapped'].y), (250, 100))
+
+    def test_reference_objects(self):
+        station = StationFactory.create(geom=Point(250, 80, srid=settings.SRID))
+        station_2 = StationFactory.create(geom=Point(500, 10, srid=settings.SRID))
+        with self.assertNumQueries(1):
+            results = Stream.objects.reference_objects(type(station).objects.all())
+        self.assertEqual(results[station.pk]['stream'], self.stream_2.pk)
+        self.assertEqual(results[station_2.pk]['stream'], self.stream.pk)
+        self.assertAlmostEqual(results[station_2.pk]['position'], 0.5)
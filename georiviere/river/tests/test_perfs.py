@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import Distance, Length, LineLocatePoint
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+from django.db.models import Case, F, FloatField, When
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from geotrek.authent.tests.factories import StructureFactory
+
+from georiviere.altimetry import deferred_altimetry
+from georiviere.functions import ClosestPoint, LineSubString
+from georiviere.main.managers import get_distance_to_source_models
+from georiviere.main.models import DistanceToSource
+from georiviere.observations.models import Station
+from georiviere.river.models import Stream
+from georiviere.river.tests.factories import StreamFactory
+from georiviere.utils.postgresql import session_setting
+
+logger = logging.getLogger(__name__)
+
+
+def create_stations(count, structure):
+    """Bulk create stations along the x axis (no signal sent)"""
+    return Station.objects.bulk_create([
+        Station(code=f'BENCH{i}', label=f'Station {i}', structure=structure,
+                geom=Point(10000 + i * 10, 10000 + (i % 2) * 100, srid=settings.SRID))
+        for i in range(count)
+    ])
+
+
+def legacy_generate_distance_to_source(stream):
+    """Previous per-object implementation, kept as reference for benchmark"""
+    for model in get_distance_to_source_models():
+        area = stream.geom.buffer(settings.BASE_INTERSECTION_MARGIN)
+        for obj in model.objects.annotate(
+            locate_source=LineLocatePoint(stream.geom, stream.source_location),
+            locate_object=LineLocatePoint(stream.geom, ClosestPoint(stream.geom, F('geom'))),
+            locate=Length(LineSubString(stream.geom,
+                                        Case(When(locate_source__gte=F('locate_object'), then=F('locate_object')),
+                                             default=F('locate_source')),
+                                        Case(When(locate_source__gte=F('locate_object'), then=F('locate_source')),
+                                             default=F('locate_object'))))
+            + Distance(F('geom'), stream.geom, output_field=FloatField())
+            + Distance(stream.geom, stream.source_location, output_field=FloatField())
+        ).filter(geom__intersects=area):
+            DistanceToSource.objects.update_or_create(
+                object_id=obj.pk,
+                content_type=ContentType.objects.get_for_model(model),
+                stream=stream,
+                defaults={"distance": obj.locate.m}
+            )
+
+
+class StreamDistanceToSourceQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.structure = StructureFactory.create()
+        cls.stream = StreamFactory.create(geom=LineString((10000, 10000), (70000, 10000), srid=settings.SRID))
+
+    def count_queries_on_save(self):
+        with CaptureQueriesContext(connection) as context:
+            self.stream.save()
+        return len(context.captured_queries)
+
+    def test_queries_number_does_not_depend_on_objects_number(self):
+        create_stations(10, self.structure)
+        self.stream.save()
+        queries_number = self.count_queries_on_save()
+        Station.objects.all().delete()
+        create_stations(100, self.structure)
+        self.assertEqual(self.count_queries_on_save(), queries_number)
+
+    def test_distances_are_upserted_and_cleaned(self):
+        station = Station.objects.create(code='STATION', label='Station', structure=self.structure,
+                                         geom=Point(20000, 10000, srid=settings.SRID))
+        self.stream.save()
+        distance = DistanceToSource.objects.get(stream=self.stream, object_id=station.pk)
+        self.assertAlmostEqual(distance.distance, 10000)
+        self.stream.geom = LineString((0, 0), (10000, 0), srid=settings.SRID)
+        self.stream.source_location = Point(0, 0, srid=settings.SRID)
+        self.stream.save()
+        self.assertFalse(DistanceToSource.objects.filter(stream=self.stream, object_id=station.pk).exists())
+
+
+@skipUnless(os.getenv('BENCHMARK'), "Set BENCHMARK=1 to run benchmarks")
+class StreamDistanceToSourceBenchmark(TestCase):
+    """Compare set-based distance to source computation with the previous per-object one"""
+    objects_number = int(os.getenv('BENCHMARK_OBJECTS', 5000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(
+            geom=LineString((10000, 10000), (10000 + cls.objects_number * 10, 10000), srid=settings.SRID)
+        )
+        create_stations(cls.objects_number, StructureFactory.create())
+
+    def test_benchmark(self):
+        start = time.perf_counter()
+        legacy_generate_distance_to_source(self.stream)
+        legacy_duration = time.perf_counter() - start
+        DistanceToSource.objects.all().delete()
+
+        start = time.perf_counter()
+        DistanceToSource.objects.refresh_for_stream(self.stream)
+        duration = time.perf_counter() - start
+
+        logger.info("%s objects: per-object %.2fs, set-based %.2fs", self.objects_number, legacy_duration, duration)
+        self.assertEqual(DistanceToSource.objects.filter(stream=self.stream).count(), self.objects_number)
+
+
+# Previous row level trigger function, kept as reference for benchmark
+LEGACY_ELEVATION_SQL = f"""
+    CREATE FUNCTION legacy_elevation() RETURNS trigger SECURITY DEFINER AS $$
+    DECLARE
+        elevation elevation_infos;
+    BEGIN
+        SELECT * FROM ft_elevation_infos(NEW.geom, {settings.ALTIMETRIC_PROFILE_STEP}) INTO elevation;
+        NEW.geom_3d := elevation.draped;
+        NEW.length := ST_3DLength(elevation.draped);
+        NEW.slope := elevation.slope;
+        NEW.min_elevation := elevation.min_elevation;
+        NEW.max_elevation := elevation.max_elevation;
+        NEW.ascent := elevation.positive_gain;
+        NEW.descent := elevation.negative_gain;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+@skipUnless(os.getenv('BENCHMARK'), "Set BENCHMARK=1 to run benchmarks")
+class AltimetryBenchmark(TestCase):
+    """Compare the previous row level elevation trigger with the statement level one, on a bulk update"""
+    objects_number = int(os.getenv('BENCHMARK_OBJECTS', 10000))
+
+    @classmethod
+    def setUpTestData(cls):
+        structure = StructureFactory.create()
+        with deferred_altimetry(), session_setting('georiviere.defer_topologies', 'on'):
+            cls.pks = [stream.pk for stream in Stream.objects.bulk_create([
+                Stream(name=f'Stream {i}', structure=structure,
+                       geom=LineString((10000, 10000 + i * 10), (11000, 10000 + i * 10), srid=settings.SRID),
+                       source_location=Point(10000, 10000 + i * 10, srid=settings.SRID))
+                for i in range(cls.objects_number)
+            ])]
+
+    def update(self, set_sql):
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"UPDATE river_stream SET {set_sql} WHERE id = ANY(%s)", [self.pks])
+        return time.perf_counter() - start
+
+    def test_benchmark(self):
+        # Previous trigger replaces the statement level one, changes are rolled back with the test
+        with connection.cursor() as cursor:
+            cursor.execute(LEGACY_ELEVATION_SQL)
+            cursor.execute("ALTER TABLE river_stream DISABLE TRIGGER river_stream_10_elevation_update")
+            cursor.execute("CREATE TRIGGER river_stream_10_legacy_elevation BEFORE UPDATE OF geom ON river_stream "
+                           "FOR EACH ROW EXECUTE PROCEDURE legacy_elevation()")
+        row_duration = self.update("geom = ST_Translate(geom, 0, 1)")
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER river_stream_10_legacy_elevation ON river_stream")
+            cursor.execute("ALTER TABLE river_stream ENABLE TRIGGER river_stream_10_elevation_update")
+
+        duration = self.update("geom = ST_Translate(geom, 0, 1)")
+        unchanged_duration = self.update("name = name || ''")
+
+        logger.info("%s lines: row trigger %.2fs, statement trigger %.2fs, update without geometry change %.2fs",
+                    self.objects_number, row_duration, duration, unchanged_duration)
+        self.assertFalse(Stream.objects.filter(geom_3d__isnull=True).exists())
@@ -1,6 +1,11 @@
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.db import connection
 from django.test import TestCase
 
+from georiviere.altimetry import deferred_altimetry
 from georiviere.description.models import Morphology, Status
+from georiviere.river.models import Topology
 from georiviere.river.tests.factories import StreamFactory
 
 
@@ -19,6 +24,27 @@ class SignalRiverTest(TestCase):
         self.assertTrue(morphology.geom.equals_exact(stream.geom, 0.001))
         self.assertTrue(status.geom.equals_exact(stream.geom, 0.001))
 
+    def test_create_stream_topologies_not_draped(self):
+        # Record objects draped against the DEM, changes are rolled back with the test transaction
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMPORARY TABLE draped (relation regclass, ids integer[]);
+                ALTER FUNCTION drape_objects(regclass, integer[]) RENAME TO drape_objects_recorded;
+                CREATE FUNCTION drape_objects(relation regclass, ids integer[]) RETURNS void AS $$
+                    INSERT INTO draped VALUES (relation, ids);
+                    SELECT drape_objects_recorded(relation, ids);
+                $$ LANGUAGE sql;
+            """)
+        stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0), srid=settings.SRID))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT relation::text FROM draped")
+            self.assertListEqual([row[0] for row in cursor.fetchall()], ['river_stream'])
+        stream.refresh_from_db()
+        # Morphology and status take the altimetry of their stream
+        for obj in (Morphology.objects.get(topology__stream=stream), Status.objects.get(topology__stream=stream)):
+            self.assertTrue(obj.geom_3d.equals_exact(stream.geom_3d, 0.001))
+            self.assertAlmostEqual(obj.max_elevation, stream.max_elevation)
+
     def test_update_stream_move_topologies(self):
         stream = StreamFactory.create()
         stream_2 = StreamFactory.create()
@@ -41,3 +67,28 @@ class SignalRiverTest(TestCase):
             f"{stream_1_morpho_geom.ewkt} - {stream_2_morpho_geom.ewkt}",
         )
         self.assertEqual(status[0], status[1])
+
+    def test_update_stream_slice_topologies_altimetry(self):
+        stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0), srid=settings.SRID))
+        Topology.objects.cut(stream.pk, [0.5])
+        stream.geom = LineString((0, 0), (2000, 0), srid=settings.SRID)
+        stream.save()
+        stream.refresh_from_db()
+
+        for status, (start, end) in zip(stream.statuses, ((0, 1000), (1000, 2000))):
+            self.assertTrue(status.geom.equals_exact(LineString((start, 0), (end, 0)), 0.001))
+            # Altimetry is sliced from the stream one
+            self.assertEqual(status.geom_3d.coords[0][0], start)
+            self.assertEqual(status.geom_3d.coords[-1][0], end)
+            self.assertAlmostEqual(status.length, 1000)
+            self.assertLessEqual(status.max_elevation, stream.max_elevation)
+
+    def test_update_stream_deferred_altimetry_slice_topologies(self):
+        stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0), srid=settings.SRID))
+        with deferred_altimetry():
+            stream.geom = LineString((0, 0), (2000, 0), srid=settings.SRID)
+            stream.save()
+
+        morphology = Morphology.objects.get(topology__stream=stream)
+        self.assertTrue(morphology.geom.equals_exact(LineString((0, 0), (2000, 0)), 0.001))
+        self.assertIsNone(morphology.geom_3d)
@@ -0,0 +1,76 @@
+from django.contrib.gis.geos import LineString, MultiPolygon, Polygon
+from django.test import TestCase
+from django.urls import reverse
+from mapentity.tests.factories import SuperUserFactory
+
+from georiviere.description.models import Morphology
+from georiviere.description.tests.factories import FlowTypeFactory, StatusFactory, StatusTypeFactory
+from georiviere.river.models import Stream, Topology
+from georiviere.river.statistics import get_stream_statistics
+from georiviere.river.tests.factories import StreamFactory
+from georiviere.watershed.tests.factories import WatershedFactory
+
+
+class StreamStatisticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stream = StreamFactory.create(geom=LineString((0, 0), (1000, 0)))
+        cls.stream_2 = StreamFactory.create(geom=LineString((0, 100), (3000, 100)))
+        cls.status_type = StatusTypeFactory.create(label="Natural")
+        cls.status_type_2 = StatusTypeFactory.create(label="Protected")
+        status = cls.stream.statuses.get()
+        Topology.objects.filter(pk=status.topology_id).update(end_position=0.5)
+        status.status_types.add(cls.status_type)
+        StatusFactory.create(topology__stream=cls.stream, topology__start_position=0.5, topology__end_position=0.75)
+        status = StatusFactory.create(topology__stream=cls.stream, topology__start_position=0.75,
+                                      topology__end_position=1)
+        status.status_types.add(cls.status_type, cls.status_type_2)
+        cls.stream_2.statuses.get().status_types.add(cls.status_type_2)
+        cls.flow_type = FlowTypeFactory.create(label="Fast")
+        Morphology.objects.filter(topology__stream=cls.stream).update(main_flow=cls.flow_type)
+
+    def test_one_stream(self):
+        with self.assertNumQueries(1):
+            statistics = get_stream_statistics(Stream.objects.filter(pk=self.stream.pk))
+        self.assertEqual(statistics['length'], 1000)
+        self.assertListEqual(statistics['status_types'], [
+            {'id': self.status_type.pk, 'label': "Natural", 'length': 750, 'percentage': 75},
+            {'id': self.status_type_2.pk, 'label': "Protected", 'length': 250, 'percentage': 25},
+        ])
+        self.assertListEqual(statistics['morphology']['main_flow'], [
+            {'id': self.flow_type.pk, 'label': "Fast", 'length': 1000, 'percentage': 100},
+        ])
+        # Morphology attributes not completed
+        self.assertListEqual(statistics['morphology']['plan_layout'], [
+            {'id': None, 'label': None, 'length': 1000, 'percentage': 100},
+        ])
+
+    def test_many_streams(self):
+        statistics = get_stream_statistics(Stream.objects.all())
+        self.assertEqual(statistics['length'], 4000)
+        self.assertListEqual(statistics['status_types'], [
+            {'id': self.status_type.pk, 'label': "Natural", 'length': 750, 'percentage': 18.75},
+            {'id': self.status_type_2.pk, 'label': "Protected", 'length': 3250, 'percentage': 81.25},
+        ])
+        self.assertListEqual(statistics['morphology']['main_flow'], [
+            {'id': self.flow_type.pk, 'label': "Fast", 'length': 1000, 'percentage': 25},
+            {'id': None, 'label': None, 'length': 3000, 'percentage': 75},
+        ])
+
+    def test_no_stream(self):
+        statistics = get_stream_statistics(Stream.objects.none())
+        self.assertEqual(statistics['length'], 0)
+        self.assertListEqual(statistics['status_types'], [])
+
+    def test_stream_api(self):
+        self.client.force_login(SuperUserFactory.create())
+        response = self.client.get(reverse('river:stream-statistics', kwargs={'lang': 'fr', 'pk': self.stream.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status_types'][0]['percentage'], 75)
+
+    def test_watershed_api(self):
+        watershed = WatershedFactory.create(geom=MultiPolygon(Polygon.from_bbox((-10, -10, 1010, 10))))
+        self.client.force_login(SuperUserFactory.create())
+        response = self.client.get(reverse('watershed:watershed_statistics', kwargs={'pk': watershed.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['length'], 1000)
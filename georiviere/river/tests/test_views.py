@@ -3,6 +3,7 @@ from mapentity.tests.factories import SuperUserFactory
 from unittest import mock
 
 from django.conf import settings
+from django.contrib.auth.models import Permission
 from django.contrib.gis.geos import GEOSGeometry, Point, MultiPolygon, Polygon
 from django.test import override_settings, TestCase
 from django.urls import reverse
@@ -15,6 +16,7 @@ from geotrek.zoning.tests.factories import CityFactory, DistrictFactory, Restric
 from georiviere.tests import CommonRiverTest
 from georiviere.description.tests.factories import StatusOnStreamFactory, StatusTypeFactory, StatusFactory, UsageFactory
 from georiviere.description.models import Morphology, Status
+from georiviere.main.models import MapImage
 from georiviere.knowledge.tests.factories import FollowUpKnowledgeFactory, FollowUpFactory, KnowledgeFactory
 from georiviere.maintenance.tests.factories import InterventionFactory
 from georiviere.studies.tests.factories import StudyFactory
@@ -169,6 +171,63 @@ class CutTopologyTestCase(TestCase):
         self.assertEqual(str([msg for msg in response.context['messages']][0]), 'Topology could not be cut')
 
 
+class CutTopologiesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.super_user = SuperUserFactory()
+
+    def setUp(self):
+        self.geom = GEOSGeometry('SRID=4326;LINESTRING(3 40, 4 40, 5 40)')
+        self.stream = StreamFactory.create(geom=self.geom.transform(2154, clone=True))
+
+    def test_cut_topologies_positions(self):
+        self.client.force_login(self.super_user)
+        response = self.client.post(reverse('river:cut_topologies'),
+                                    data={'stream': self.stream.pk, 'positions': '0.2, 0.4,0.6'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': {'cut': 1, 'created': 3}, 'morphology': {'cut': 1, 'created': 3}})
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 4)
+        self.assertEqual(Morphology.objects.filter(topology__stream=self.stream).count(), 4)
+
+    def test_cut_topologies_reference_segmentation(self):
+        self.client.force_login(self.super_user)
+        response = self.client.post(reverse('river:cut_topologies'),
+                                    data={'stream': self.stream.pk, 'topology_types': ['status'],
+                                          'geom': '{"type": "Point", "coordinates": [4, 40]}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': {'cut': 1, 'created': 1}})
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 2)
+        self.assertEqual(Morphology.objects.filter(topology__stream=self.stream).count(), 1)
+
+    def test_cut_topologies_invalid(self):
+        self.client.force_login(self.super_user)
+        response = self.client.post(reverse('river:cut_topologies'),
+                                    data={'stream': self.stream.pk, 'positions': '0.2;0.4'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('positions', response.json())
+        response = self.client.post(reverse('river:cut_topologies'), data={'stream': self.stream.pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cut_topologies_permission(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('river:cut_topologies'),
+                                    data={'stream': self.stream.pk, 'positions': '0.5'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 1)
+
+    def test_cut_topologies_other_structure(self):
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['change_status', 'change_morphology']))
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('river:cut_topologies'),
+                                    data={'stream': self.stream.pk, 'positions': '0.5'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Status.objects.filter(topology__stream=self.stream).count(), 1)
+        stream = StreamFactory.create(geom=self.geom.transform(2154, clone=True), structure=self.user.profile.structure)
+        response = self.client.post(reverse('river:cut_topologies'), data={'stream': stream.pk, 'positions': '0.5'})
+        self.assertEqual(response.status_code, 200)
+
+
 class DistanceToSourceTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -191,6 +250,40 @@ class DistanceToSourceTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {'distance': 257535.0})
 
+    def test_distance_to_source_invalid(self):
+        response = self.client.get(reverse('river:distance_to_source'),
+                                   data={'lng_distance': 3, 'lat_distance': 40, 'radius': 'far'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('radius', response.json())
+
+
+class ReferencePointsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.stream = StreamFactory.create(geom=GEOSGeometry('SRID=4326;LINESTRING(3 40, 1 40)').transform(2154, clone=True))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_reference_points(self):
+        response = self.client.post(reverse('river:reference_points'),
+                                    data={'geom': '{"type": "MultiPoint", "coordinates": [[2, 40.001], [2, 45]]}',
+                                          'radius': 5000})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['stream'], self.stream.pk)
+        self.assertAlmostEqual(results[0]['position'], 0.5, places=2)
+        self.assertAlmostEqual(results[0]['snapped'][0], 2, places=2)
+        self.assertIsNone(results[1])
+
+    def test_reference_points_invalid(self):
+        response = self.client.post(reverse('river:reference_points'),
+                                    data={'geom': '{"type": "LineString", "coordinates": [[2, 40], [2, 45]]}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('geom', response.json())
+
 
 class StreamDocumentReportTestCase(TestCase):
     @classmethod
@@ -248,6 +341,23 @@ class StreamDocumentReportTestCase(TestCase):
         self.assertEqual(os.path.join(settings.MEDIA_ROOT, 'maps', f'knowledge-{self.knowledge.pk}.png'),
                          response.context['map_path_knowledge'][self.knowledge.pk])
 
+    @override_settings(MAP_IMAGE_SYNCHRONOUS=False)
+    @mock.patch('georiviere.river.models.Stream.prepare_map_image_with_other_objects')
+    @mock.patch('mapentity.models.MapEntityMixin.prepare_map_image')
+    def test_document_report_stream_queues_map_images(self, mock_prepare_map_image, mocked_prepare_map_image_wo):
+        self.client.force_login(self.super_user)
+        response = self.client.get(reverse('river:stream_printable', kwargs={'lang': "fr",
+                                                                             'pk': self.stream.pk,
+                                                                             'slug': self.stream.slug}))
+        self.assertEqual(response.status_code, 200)
+        # Images are not captured yet, they are captured in background
+        self.assertIsNone(response.context['map_path_usage'])
+        self.assertIsNone(response.context['map_path_knowledge'][self.knowledge.pk])
+        mocked_prepare_map_image_wo.assert_not_called()
+        # Stream map, captured by mapentity
+        mock_prepare_map_image.assert_called_once()
+        self.assertEqual(MapImage.objects.filter(date_queued__isnull=False).count(), 5)
+
     @mock.patch('georiviere.river.models.Stream.prepare_map_image_with_other_objects')
     @mock.patch('mapentity.models.MapEntityMixin.prepare_map_image')
     def test_document_report_stream_failed_no_permissions(self, mock_prepare_map_image, mocked_prepare_map_image_wo):
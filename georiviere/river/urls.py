@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from django.urls import path, register_converter, converters
 from geotrek.altimetry.urls import AltimetryEntityOptions
 
-from georiviere.river.views import (CutTopologyView, DistanceToSourceView, StreamDocumentReport, StreamViewSet)
+from georiviere.river.views import (CutTopologiesView, CutTopologyView, DistanceToSourceView, ReferencePointsView,
+                                    StreamDocumentReport, StreamViewSet)
 from georiviere.river.models import Stream
 from mapentity.registry import registry
 
@@ -44,7 +45,9 @@ router.register(r'api/(?P<lang>[a-z]{2})/streams', StreamViewSet, basename='stre
 
 urlpatterns = [
     path('cut_topology/', CutTopologyView.as_view(), name='cut_topology'),
+    path('cut_topologies/', CutTopologiesView.as_view(), name='cut_topologies'),
     path('distance_to_source', DistanceToSourceView.as_view(), name='distance_to_source'),
+    path('reference_points/', ReferencePointsView.as_view(), name='reference_points'),
 ]
 
 urlpatterns += router.urls
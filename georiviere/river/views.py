@@ -1,11 +1,9 @@
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Length, LineLocatePoint, Transform
+from django.contrib.gis.db.models.functions import LineLocatePoint, Transform
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum, F, FloatField, Case, Min, When
 from django.db.utils import InternalError
 from django.http import JsonResponse
 from django.http.response import HttpResponseRedirect
@@ -19,13 +17,13 @@ from rest_framework.renderers import JSONRenderer
 
 from geotrek.authent.decorators import same_structure_required
 
-from georiviere.functions import ClosestPoint, LineSubString
-from .forms import CutTopologyForm, StreamForm
+from .forms import CutTopologiesForm, CutTopologyForm, DistanceToSourceForm, ReferencePointsForm, StreamForm
 from .models import Stream, Topology
 from .filters import StreamFilterSet
 from .serializers import StreamSerializer, StreamGeojsonSerializer
+from .statistics import get_stream_statistics
 from georiviere.main.mixins.views import DocumentReportMixin
-from georiviere.description.models import Status, StatusType
+from georiviere.main.models import MapImage
 from georiviere.knowledge.models import Knowledge
 from georiviere.knowledge.serializers import FollowUpSerializer, FollowUpGeojsonSerializer
 from georiviere.description.serializers import UsageSerializer, UsageAPIGeojsonSerializer
@@ -71,6 +69,11 @@ class StreamViewSet(viewsets.ModelViewSet):
         original_class = super().get_serializer_class()
         return self.transform_serializer_geojson(original_class)
 
+    @action(detail=True, url_name="statistics", methods=['get'], renderer_classes=[JSONRenderer])
+    def statistics(self, request, *args, **kwargs):
+        stream = self.get_object()
+        return Response(get_stream_statistics(Stream.objects.filter(pk=stream.pk)))
+
     @action(detail=True, url_name="usages", methods=['get'],
             renderer_classes=[GeoJSONRenderer],
             serializer_class=UsageSerializer, geojson_serializer_class=UsageAPIGeojsonSerializer)
@@ -112,33 +115,20 @@ class StreamViewSet(viewsets.ModelViewSet):
 class StreamDocumentReport(DocumentReportMixin, mapentity_views.MapEntityDocumentWeasyprint):
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        topologies = Topology.objects.filter(stream=self.get_object())
-        status_types = {}
-        for status_type in StatusType.objects.filter(status__in=Status.objects.filter(
-                topology__in=topologies.filter(status__isnull=False).values_list('pk', flat=True)).values_list('pk',
-                                                                                                               flat=True)):
-            infos = status_type.status.annotate(length_2d=Length('geom')).aggregate(sum_length=Sum('length_2d'),
-                                                                                    percentage=Sum(
-                                                                                        F('topology__end_position') - F(
-                                                                                            'topology__start_position')) * 100)
-            status_types[status_type.label] = infos
-        context['status_types'] = status_types
+        statistics = get_stream_statistics(Stream.objects.filter(pk=self.get_object().pk))
+        context['status_types'] = {values['label']: values for values in statistics['status_types']}
 
+        # Images are captured in background (process_map_images), last captured ones are used
         rooturl = self.request.build_absolute_uri('/')
-        self.get_object().prepare_map_image_with_other_objects(rooturl, ["usages"])
-        self.get_object().prepare_map_image_with_other_objects(rooturl, ["studies"])
-        self.get_object().prepare_map_image_with_other_objects(rooturl, ["followups"])
-        self.get_object().prepare_map_image_with_other_objects(rooturl, ["interventions"])
-
-        context['map_path_usage'] = self.get_object().get_map_image_path_with_other_objects(["usages"])
-        context['map_path_study'] = self.get_object().get_map_image_path_with_other_objects(["studies"])
-        context['map_path_other_followups'] = self.get_object().get_map_image_path_with_other_objects(["followups"])
-        context['map_path_other_interventions'] = self.get_object().get_map_image_path_with_other_objects(["interventions"])
+        stream = self.get_object()
+        context['map_path_usage'] = MapImage.objects.get_path(stream, rooturl, ["usages"])
+        context['map_path_study'] = MapImage.objects.get_path(stream, rooturl, ["studies"])
+        context['map_path_other_followups'] = MapImage.objects.get_path(stream, rooturl, ["followups"])
+        context['map_path_other_interventions'] = MapImage.objects.get_path(stream, rooturl, ["interventions"])
 
         context['map_path_knowledge'] = {}
-        for knowledge in self.get_object().knowledges:
-            knowledge.prepare_map_image(rooturl)
-            context['map_path_knowledge'][knowledge.pk] = knowledge.get_map_image_path()
+        for knowledge in stream.knowledges:
+            context['map_path_knowledge'][knowledge.pk] = MapImage.objects.get_path(knowledge, rooturl)
 
         context['MAIL'] = settings.MAIL_DOCUMENT_REPORT
         context['PHONE_NUMBER'] = settings.PHONE_NUMBER_DOCUMENT_REPORT
@@ -147,11 +137,15 @@ class StreamDocumentReport(DocumentReportMixin, mapentity_views.MapEntityDocumen
         return context
 
     def get_object(self, queryset=None):
+        if queryset is None and hasattr(self, '_object'):
+            return self._object
         obj = super().get_object(queryset)
         if not self.request.user.is_authenticated:
             raise PermissionDenied
         if not self.request.user.has_perm('%s.read_%s' % (obj._meta.app_label, obj._meta.model_name)):
             raise PermissionDenied
+        if queryset is None:
+            self._object = obj
         return obj
 
 
@@ -179,6 +173,7 @@ class StreamDetail(mapentity_views.MapEntityDetail):
     def get_context_data(self, *args, **kwargs):
         context = super(StreamDetail, self).get_context_data(*args, **kwargs)
         context['can_edit'] = self.get_object().same_structure(self.request.user)
+        context['statistics'] = get_stream_statistics(Stream.objects.filter(pk=self.object.pk))
         return context
 
 
@@ -246,56 +241,72 @@ class CutTopologyView(LoginRequiredMixin, FormView):
         except InternalError:
             messages.error(self.request, _("Topology could not be cut"))
             return HttpResponseRedirect(instance.__class__.get_detail_url(instance))
-        old_start_position = topology.start_position
-        old_end_position = topology.end_position
-        final_position = (old_end_position - old_start_position) * locate_point + old_start_position
-        topology.start_position = final_position
-        topology.save()
-
-        new_topology = Topology.objects.create(start_position=old_start_position, end_position=final_position,
-                                               stream=topology.stream)
-
-        duplicate_instance = instance
-        duplicate_instance.pk = None
-        duplicate_instance.topology = new_topology
-        duplicate_instance.save()
-        new_topology.save()
+        final_position = (topology.end_position - topology.start_position) * locate_point + topology.start_position
+        topology_type = instance._meta.model_name
+        created = Topology.objects.cut(topology.stream_id, [final_position], [topology_type], [topology.pk])
+        duplicate_instance = instance.__class__.objects.get(pk=created[topology_type][instance.pk][0])
 
         messages.success(self.request, _("Topology has been cut"))
         return HttpResponseRedirect(duplicate_instance.get_detail_url())
 
 
+class CutTopologiesView(LoginRequiredMixin, FormView):
+    """Cut statuses and morphologies of a stream at many positions, or at points of a reference segmentation layer"""
+    form_class = CutTopologiesForm
+    http_method_names = ['post']
+
+    def form_valid(self, form):
+        topology_types = form.cleaned_data['topology_types'] or ['status', 'morphology']
+        for topology_type in topology_types:
+            model = Topology._meta.get_field(topology_type).related_model
+            if not self.request.user.has_perm(f'{model._meta.app_label}.change_{model._meta.model_name}'):
+                raise PermissionDenied
+        stream = form.cleaned_data['stream']
+        if not stream.same_structure(self.request.user):
+            raise PermissionDenied
+        positions = form.cleaned_data['positions']
+        if form.cleaned_data['geom']:
+            positions += Topology.objects.locate(stream.pk, [form.cleaned_data['geom']],
+                                                 form.cleaned_data['tolerance'] or settings.SNAP_DISTANCE)
+        created = Topology.objects.cut(stream.pk, positions, topology_types)
+        return JsonResponse({
+            topology_type: {'cut': len(objects), 'created': sum(len(copies) for copies in objects.values())}
+            for topology_type, objects in created.items()
+        })
+
+    def form_invalid(self, form):
+        return JsonResponse(form.errors, status=400)
+
+
 class DistanceToSourceView(LoginRequiredMixin, View):
     http_method_names = ['get']
 
     def get(self, request, *args, **kwargs):
-        geom_point = Point(x=float(request.GET['lng_distance']),
-                           y=float(request.GET['lat_distance']),
+        form = DistanceToSourceForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse(form.errors, status=400)
+        geom_point = Point(x=form.cleaned_data['lng_distance'],
+                           y=form.cleaned_data['lat_distance'],
                            srid=4326).transform(settings.SRID, clone=True)
-        streams = Stream.objects.annotate(distance=Distance(
-            F('geom'), geom_point, output_field=FloatField()))
-        stream_min_distance = streams.aggregate(
-            min_distance=Min(F('distance'))
-        )['min_distance']
-        streams = streams.annotate(locate_source=LineLocatePoint(F('geom'),
-                                                                 F('source_location')),
-                                   locate_point=LineLocatePoint(F('geom'),
-                                                                ClosestPoint(F('geom'),
-                                                                             geom_point)),
-                                   locate=Length(LineSubString(
-                                       F('geom'),
-                                       Case(
-                                           When(locate_source__gte=F('locate_point'),
-                                                then=F('locate_point')),
-                                           default=F('locate_source')
-                                       ),
-                                       Case(
-                                           When(locate_source__gte=F('locate_point'),
-                                                then=F('locate_source')),
-                                           default=F('locate_point')
-                                       ))) + F('distance') + Distance(F('geom'),
-                                                                      F('source_location'),
-                                                                      output_field=FloatField())
-                                   ).filter(distance=stream_min_distance)
-
-        return JsonResponse({"distance": round(streams.first().locate.m, 1) if streams else 0})
+        streams = Stream.objects.nearest(geom_point, radius=form.cleaned_data['radius'])
+        return JsonResponse({"distance": round(streams[0].distance_to_source, 1) if streams else 0})
+
+
+class ReferencePointsView(LoginRequiredMixin, FormView):
+    """Nearest stream, snapped point, position and distance to source of many points, in one query"""
+    form_class = ReferencePointsForm
+    http_method_names = ['post']
+
+    def form_valid(self, form):
+        geom = form.cleaned_data['geom']
+        points = [geom] if geom.geom_type == 'Point' else list(geom)
+        for point in points:
+            point.srid = geom.srid
+        results = Stream.objects.reference(points, radius=form.cleaned_data['radius'])
+        for result in results:
+            if result:
+                result['snapped'] = result['snapped'].transform(settings.API_SRID, clone=True).coords
+        return JsonResponse({'results': results})
+
+    def form_invalid(self, form):
+        return JsonResponse(form.errors, status=400)
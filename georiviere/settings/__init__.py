@@ -275,6 +275,14 @@ ALTIMETRIC_AREA_MARGIN = 0.15
 
 BASE_INTERSECTION_MARGIN = 250
 
+# Distances to source of objects are computed by `process_distance_to_source` command,
+# set to True to compute them when objects are saved
+DISTANCE_TO_SOURCE_SYNCHRONOUS = False
+
+# Map images of document reports are captured by `process_map_images` command, reports use the last captured ones,
+# set to True to capture them when reports are generated
+MAP_IMAGE_SYNCHRONOUS = False
+
 HIDDEN_FORM_FIELDS = {}
 COLUMNS_LISTS = {}
 
@@ -470,6 +478,20 @@ THUMBNAIL_ALIASES = {
 API_SCHEMA = config("API_SCHEMA", default=False, cast=bool)
 API_SWAGGER = config("API_SWAGGER", default=False, cast=bool)  # NEED API_SCHEMA
 API_REDOC = config("API_REDOC", default=False, cast=bool)  # NEED API_SCHEMA
+# Portal API responses are cached in this cache backend until published data changes
+API_CACHE_ENABLED = config("API_CACHE_ENABLED", default=True, cast=bool)
+API_CACHE_BACKEND = 'fat'
+# Portal GeoJSON lists are streamed, with a flat memory usage whatever the number of features, but are not cached
+API_GEOJSON_STREAMING = config("API_GEOJSON_STREAMING", default=False, cast=bool)
+# Details of vector tiles geometries smaller than this number of pixels are simplified
+API_TILE_SIMPLIFY_PIXELS = 1
+# Portal API geometries asked with `zoom` parameter are simplified by zoom bands: (maximum zoom, tolerance in meters).
+# Simplified geometries of streams and watersheds are stored for these 3 bands, run migrate after any change.
+API_SIMPLIFY_ZOOM_BANDS = (
+    (8, 100),
+    (11, 20),
+    (13, 5),
+)
 
 SSL_ENABLED = config("SSL_ENABLED", default=False, cast=bool)
 
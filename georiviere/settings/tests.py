@@ -13,6 +13,10 @@ CACHES['fat'] = {
     'LOCATION': 'fat',
 }
 
+DISTANCE_TO_SOURCE_SYNCHRONOUS = True
+MAP_IMAGE_SYNCHRONOUS = True
+API_CACHE_ENABLED = False
+
 # recreate TMP_DIR for tests, and it as base dir forl all files
 TMP_DIR = os.path.join(TMP_DIR, 'tests')
 if os.path.exists(TMP_DIR):
@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+
+@contextmanager
+def session_setting(name, value):
+    """
+    Set a PostgreSQL setting within the block, read by SQL functions with current_setting().
+    The setting is local to the transaction of the block, it is rolled back with it on errors.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting(%s, true), set_config(%s, %s, true)", [name, name, value])
+            previous = cursor.fetchone()[0]
+        yield
+        # Enclosing transaction goes on without the setting
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config(%s, %s, true)", [name, previous or ''])
@@ -1,14 +1,44 @@
+from django.contrib.contenttypes.models import ContentType
 from django_filters import FilterSet
 from django.utils.translation import gettext_lazy as _
 
 
 from .models import Watershed
+from georiviere.main.managers import get_area_membership_models
+from georiviere.main.models import CityMembership, DistrictMembership, WatershedMembership
 from geotrek.zoning.filters import IntersectionFilter
+from geotrek.zoning.models import City, District
 
 
-class IntersectionFilterWatershed(IntersectionFilter):
+class MembershipFilter(IntersectionFilter):
+    """Filter objects in selected areas with their memberships, instead of intersecting geometries"""
+    membership_model = None
+
+    def filter(self, qs, values):
+        if not values or qs.model not in get_area_membership_models():
+            return super().filter(qs, values)
+        memberships = self.membership_model.objects.filter(content_type=ContentType.objects.get_for_model(qs.model),
+                                                           area__in=values)
+        return qs.filter(pk__in=memberships.values('object_id'))
+
+
+class IntersectionFilterWatershed(MembershipFilter):
     model = Watershed
+    membership_model = WatershedMembership
+
+
+class IntersectionFilterCity(MembershipFilter):
+    model = City
+    membership_model = CityMembership
+
+
+class IntersectionFilterDistrict(MembershipFilter):
+    model = District
+    membership_model = DistrictMembership
 
 
 class WatershedFilterSet(FilterSet):
     watershed = IntersectionFilterWatershed(label=_('Watershed'), required=False)
+    # Replace filters of geotrek ZoningFilterSet, which comes after this filterset
+    city = IntersectionFilterCity(label=_('City'), required=False)
+    district = IntersectionFilterDistrict(label=_('District'), required=False)
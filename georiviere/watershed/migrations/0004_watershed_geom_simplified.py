@@ -0,0 +1,40 @@
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+def simplify_geometries(apps, schema_editor):
+    bands = [tolerance for max_zoom, tolerance in settings.API_SIMPLIFY_ZOOM_BANDS]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE watershed_watershed
+            SET geom_simplified_low = ST_Transform(ST_SimplifyPreserveTopology(geom, %(low)s), %(srid)s),
+                geom_simplified_medium = ST_Transform(ST_SimplifyPreserveTopology(geom, %(medium)s), %(srid)s),
+                geom_simplified_high = ST_Transform(ST_SimplifyPreserveTopology(geom, %(high)s), %(srid)s)
+        """, {'low': bands[0], 'medium': bands[1], 'high': bands[2], 'srid': settings.API_SRID})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('watershed', '0003_auto_20230809_1248'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watershed',
+            name='geom_simplified_high',
+            field=django.contrib.gis.db.models.fields.GeometryField(editable=False, null=True, srid=settings.API_SRID),
+        ),
+        migrations.AddField(
+            model_name='watershed',
+            name='geom_simplified_low',
+            field=django.contrib.gis.db.models.fields.GeometryField(editable=False, null=True, srid=settings.API_SRID),
+        ),
+        migrations.AddField(
+            model_name='watershed',
+            name='geom_simplified_medium',
+            field=django.contrib.gis.db.models.fields.GeometryField(editable=False, null=True, srid=settings.API_SRID),
+        ),
+        migrations.RunPython(simplify_geometries, migrations.RunPython.noop),
+    ]
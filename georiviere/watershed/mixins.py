@@ -1,19 +1,38 @@
+from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 from .models import Watershed
 from geotrek.common.utils import intersecting, uniquify
+from geotrek.zoning.models import City, District
 
 
 class WatershedPropertiesMixin:
+    """Watersheds of objects. Cities and districts of geotrek ZoningPropertiesMixin are also read from memberships,
+    this mixin comes before it."""
     watersheds_verbose_name = _("Watersheds")
 
     @property
     def zoning_property(self):
         return self
 
+    def get_areas(self, area_model):
+        """Areas intersecting the object, read from memberships if its geometry is stored"""
+        if self.pk is None or 'geom' not in [field.name for field in self._meta.concrete_fields]:
+            return uniquify(intersecting(area_model, self.zoning_property, distance=0))
+        return area_model.objects.filter(memberships__content_type=ContentType.objects.get_for_model(self),
+                                         memberships__object_id=self.pk)
+
     @property
     def watersheds(self):
-        return uniquify(intersecting(Watershed, self.zoning_property, distance=0))
+        return self.get_areas(Watershed)
 
     @property
     def watersheds_ordered_watershed_type(self):
         return sorted(self.watersheds, key=lambda x: x.watershed_type.name)
+
+    @property
+    def cities(self):
+        return self.get_areas(City)
+
+    @property
+    def districts(self):
+        return self.get_areas(District)
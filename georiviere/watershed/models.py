@@ -5,6 +5,8 @@ from django.contrib.gis.db import models
 
 from django.utils.translation import gettext_lazy as _
 
+from georiviere.main.models import SimplifiedGeometryMixin
+
 
 class WatershedType(models.Model):
     name = models.CharField(max_length=200, verbose_name=_("Name"))
@@ -21,7 +23,7 @@ class WatershedType(models.Model):
         return self.name
 
 
-class Watershed(models.Model):
+class Watershed(SimplifiedGeometryMixin, models.Model):
     name = models.CharField(max_length=250, verbose_name=_("Name"))
     geom = models.MultiPolygonField(srid=settings.SRID, spatial_index=True)
     eid = models.CharField(verbose_name=_("External id"), max_length=1024, blank=True, null=True, default=None,
@@ -0,0 +1,3 @@
+CREATE TRIGGER watershed_watershed_20_simplify
+BEFORE INSERT OR UPDATE OF geom ON watershed_watershed
+FOR EACH ROW EXECUTE PROCEDURE simplify_geom();
@@ -7,4 +7,6 @@ urlpatterns = [
     path('api/watershed/watershed.geojson', views.WatershedGeoJSONLayer.as_view(), name="watershed_layer"),
     path('api/watershed/type/<int:type_pk>/watershed.geojson', views.WatershedTypesGeoJSONLayer.as_view(),
          name="watershed_type_layer"),
+    path('api/watershed/<int:pk>/statistics.json', views.WatershedStatisticsView.as_view(),
+         name="watershed_statistics"),
 ]
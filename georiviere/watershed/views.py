@@ -1,7 +1,14 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.contenttypes.models import ContentType
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.views.generic.base import View
 from djgeojson.views import GeoJSONLayerView
 
 from geotrek.zoning.views import LandLayerMixin
+from georiviere.main.models import WatershedMembership
+from georiviere.river.models import Stream
+from georiviere.river.statistics import get_stream_statistics
 from .models import Watershed, WatershedType
 
 
@@ -18,3 +25,14 @@ class WatershedTypesGeoJSONLayer(LandLayerMixin, GeoJSONLayerView):
         qs = super().get_queryset().select_related('watershed_type')
         get_object_or_404(WatershedType, pk=type_pk)
         return qs.filter(watershed_type=type_pk)
+
+
+class WatershedStatisticsView(LoginRequiredMixin, View):
+    """Lengths and percentages of streams of a watershed by status type and morphology attribute"""
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        watershed = get_object_or_404(Watershed, pk=self.kwargs['pk'])
+        memberships = WatershedMembership.objects.filter(content_type=ContentType.objects.get_for_model(Stream),
+                                                         area=watershed)
+        return JsonResponse(get_stream_statistics(Stream.objects.filter(pk__in=memberships.values('object_id'))))